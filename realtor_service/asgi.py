@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'realtor_service.settings')
 
 application = get_asgi_application()
+
+# Фоновая запись буферизованных счётчиков просмотров (realty/view_counts.py)
+from realty.view_counts import start_view_count_flusher  # noqa: E402
+
+start_view_count_flusher()
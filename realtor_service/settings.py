@@ -43,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'realty.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'realty.middleware.StaticMediaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'realty.middleware.PrimaryStickinessMiddleware',
+    'realty.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +60,8 @@ ROOT_URLCONF = 'realtor_service.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Бэкенд Django с замером времени отрисовки для Server-Timing
+        'BACKEND': 'realty.timing.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,6 +92,24 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения каталога (realty/routers.py): алиасы из DATABASES.
+# Пример:
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.postgresql',
+#     'NAME': 'realtorservice_db',
+#     'HOST': 'replica.local',
+#     ...
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ['realty.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи запросы посетителя идут только в основную БД
+# (должно быть больше типичного отставания реплик)
+PRIMARY_STICKY_SECONDS = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -137,9 +160,80 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+# Каталог для collectstatic. Без DEBUG статика собирается с хешем содержимого
+# в именах и заранее сжатыми вариантами .gz/.br (realty/storage.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Фотографии объектов: один файл на одинаковое содержимое (см. realty/storage.py)
+    'images': {
+        'BACKEND': 'realty.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'realty.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Статику из STATIC_ROOT (при DEBUG - из STATICFILES_DIRS) и файлы из MEDIA_ROOT
+# отдаёт StaticMediaMiddleware (realty/fileserving.py) - и под WSGI, и под ASGI. Файлы с хешем в имени
+# кешируются браузером на год; остальные - на указанное число секунд
+SERVE_STATIC_MEDIA = True
+STATIC_MAX_AGE = 60 * 60
+MEDIA_MAX_AGE = 24 * 60 * 60
 
 # settings.py
 
 LOGIN_REDIRECT_URL = '/' # Куда перенаправлять после успешного входа
 LOGOUT_REDIRECT_URL = '/' # Куда перенаправлять после выхода
-LOGIN_URL = '/login/' # URL-адрес страницы входа
\ No newline at end of file
+LOGIN_URL = '/login/' # URL-адрес страницы входа
+
+# Каталог объектов
+
+# Страницы каталога кешируются в кеше по умолчанию (CACHES). Без настройки это
+# LocMemCache - отдельный кеш в каждом процессе; при нескольких процессах
+# укажите общий бэкенд, например Redis или Memcached.
+
+# Время жизни закешированных страниц главной и каталога (секунды)
+CATALOG_CACHE_TIMEOUT = 600
+
+# Время жизни кеша фасетных счётчиков каталога (секунды)
+FACETS_CACHE_TIMEOUT = 300
+
+# Время жизни закешированного HTML карточек объектов (секунды)
+PROPERTY_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Контроль числа SQL-запросов в представлениях (realty/querybudget.py):
+# превышение бюджета и N+1 пишутся в лог realty.querybudget,
+# в строгом режиме - вызывают исключение
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_STRICT = False
+
+# Геокодер для определения координат объектов по адресу (realty/geo.py) - путь
+# к классу с методом geocode(address) -> (широта, долгота). Без геокодера
+# координаты вводятся вручную. Заглушка StubGeocoder выдумывает координаты по
+# хешу адреса (вокруг Москвы) - только для разработки и тестов
+GEOCODER = 'realty.geo.StubGeocoder' if DEBUG else None
+
+# Счётчики просмотров (realty/view_counts.py) копятся в памяти процесса и
+# записываются в БД фоновым потоком раз в VIEW_COUNT_FLUSH_INTERVAL секунд
+# (0 - без потока, только при переполнении буфера и завершении процесса)
+# или сразу, когда в буфере набирается VIEW_COUNT_MAX_PENDING объектов
+VIEW_COUNT_FLUSH_INTERVAL = 10
+VIEW_COUNT_MAX_PENDING = 1000
+
+# Время SQL, шаблонов и Python для каждого запроса (realty/timing.py): в
+# заголовке Server-Timing (виден в инструментах разработчика браузера; если
+# раскрывать его посетителям нежелательно - SERVER_TIMING_HEADER = False)
+# и в журнале realty.timing
+SERVER_TIMING_ENABLED = True
+SERVER_TIMING_HEADER = True
+# Профиль каждого N-го (в среднем) запроса; 0 - профилирование выключено.
+# SERVER_TIMING_PROFILERS - 'cprofile' и/или 'tracemalloc'
+SERVER_TIMING_PROFILE_RATE = 0
+SERVER_TIMING_PROFILERS = ('cprofile', 'tracemalloc')
+SERVER_TIMING_PROFILE_DIR = BASE_DIR / 'profiles'
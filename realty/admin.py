@@ -1,24 +1,69 @@
 from django.contrib import admin
-from .models import Client, Realtor, Property
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.models import User
+from .gallery import gallery_changed
+from .images import IMAGE_FIELDS, generate_image_variants, generate_property_variants
+from .models import Client, Realtor, Property, PropertyImage, RealtorPortfolioSummary
+from .pagination import EstimatedCountPaginator
+from .search import search_properties
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Общие настройки списков больших таблиц: приблизительное число записей
+    вместо COUNT(*) и без второго подсчёта всей таблицы при фильтрации.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class UserProfileAdmin(ScalableAdmin):
+    """Профили клиента и риелтора: пользователь выбирается автодополнением."""
+    ordering = ['-pk']
+    autocomplete_fields = ['user']
+
+    def get_queryset(self, request):
+        # __str__ выводит имя пользователя - и в списке, и в автодополнении
+        return super().get_queryset(request).select_related('user')
+
+
+# Поиск по началу строки ('^' - istartswith) использует индексы по
+# UPPER(...) из миграций 0010 и 0014 на PostgreSQL; поиск по вхождению читал бы всю таблицу
+admin.site.unregister(User)
+
+@admin.register(User)
+class UserAdmin(ScalableAdmin, BaseUserAdmin):
+    """Пользователи: через этот поиск идёт и автодополнение в профилях клиента и риелтора."""
+    search_fields = ['^username', '^email', '^first_name', '^last_name']
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(UserProfileAdmin):
     list_display = ['user', 'phone', 'created_at']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'phone']
+    search_fields = ['^user__username', '^user__last_name', '^user__first_name', '^phone']
     list_filter = ['created_at']
 
 @admin.register(Realtor)
-class RealtorAdmin(admin.ModelAdmin):
+class RealtorAdmin(UserProfileAdmin):
     list_display = ['user', 'license_number', 'phone', 'experience_years']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'license_number']
+    search_fields = ['^user__username', '^user__last_name', '^user__first_name', '^license_number']
     list_filter = ['experience_years', 'created_at']
 
+class PropertyImageInline(admin.TabularInline):
+    """Галерея объекта: фотографии и порядок показа"""
+    model = PropertyImage
+    fields = ['image', 'position']
+    extra = 1
+
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(ScalableAdmin):
     list_display = ['title', 'property_type', 'status', 'price', 'realtor', 'created_at']
+    list_select_related = ['realtor__user']
     list_filter = ['property_type', 'status', 'is_featured', 'created_at']
-    search_fields = ['title', 'address', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    # Поле для формы поиска; сам поиск - полнотекстовый (get_search_results)
+    search_fields = ['title']
+    autocomplete_fields = ['realtor', 'client']
+    inlines = [PropertyImageInline]
+    readonly_fields = ['created_at', 'updated_at', 'view_count']
     fieldsets = (
         ('Основная информация', {
             'fields': ('title', 'description', 'property_type', 'status')
@@ -26,13 +71,53 @@ class PropertyAdmin(admin.ModelAdmin):
         ('Детали объекта', {
             'fields': ('address', 'price', 'area', 'bedrooms', 'bathrooms')
         }),
+        ('Расположение', {
+            # Пустые координаты определяет геокодер (realty/geo.py), если он настроен
+            'fields': ('latitude', 'longitude')
+        }),
         ('Участники', {
             'fields': ('realtor', 'client')
         }),
         ('Изображения', {
-            'fields': ('main_image', 'image1', 'image2', 'image3', 'is_featured')
+            'fields': ('main_image', 'is_featured')
         }),
         ('Даты', {
-            'fields': ('created_at', 'updated_at')
+            'fields': ('created_at', 'updated_at', 'view_count')
         }),
-    )
\ No newline at end of file
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по search_vector (GIN-индекс) вместо ILIKE по title, address и description."""
+        return search_properties(queryset, search_term, rank=False), False
+
+    def save_model(self, request, obj, form, change):
+        # Как в PropertyForm.clean: новый адрес без новых координат - прежние
+        # координаты устарели (geo_cell пересчитывается при сохранении)
+        if 'address' in form.changed_data and not {'latitude', 'longitude'} & set(form.changed_data):
+            obj.latitude = obj.longitude = None
+        super().save_model(request, obj, form, change)
+        # Уменьшенные варианты фото, как при сохранении через PropertyForm; с ними
+        # меняется разметка карточки - новая дата изменения сбрасывает её кеш
+        changed = [name for name in IMAGE_FIELDS if name in form.changed_data]
+        if changed and generate_property_variants(obj, changed):
+            gallery_changed([obj.pk])
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is PropertyImage:
+            images = [image.image for image in formset.new_objects]
+            images += [image.image for image, changed in formset.changed_objects if 'image' in changed]
+            if generate_image_variants(images):
+                gallery_changed([form.instance.pk])
+
+@admin.register(RealtorPortfolioSummary)
+class RealtorPortfolioSummaryAdmin(admin.ModelAdmin):
+    list_display = ['realtor', 'listing_count', 'for_sale_count', 'sold_count', 'total_price', 'updated_at']
+    list_select_related = ['realtor__user']
+
+    # Сводки обновляются сигналами и командой rebuild_portfolio_summaries
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,213 @@
+"""JSON API каталога (только чтение).
+
+Поддерживает:
+- выбор полей (``fields=id,title,price``) - из БД читаются только нужные столбцы;
+- курсорную пагинацию (``cursor``, ``limit``) с теми же сортировками, что и каталог;
+  объекты, как и в HTML-каталоге, читаются из PropertyCard с её индексами;
+- сильные ETag: тег строится из версии каталога и строки запроса без обращения
+  к БД, поэтому повторный запрос с If-None-Match получает 304 почти бесплатно.
+  ETag ставится только на успешные ответы: ошибку 400 клиент не должен
+  сохранять с валидатором, на который сервер потом ответит 304.
+  Порядок сортировки popular меняют и записи счётчиков просмотров, которые
+  версию каталога не увеличивают, поэтому её тег включает и их поколение.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from .cache import get_catalog_version, get_view_counts_version, normalize_querystring, pin_primary_if_changed
+from .filters import DEFAULT_SORT, SORT_ORDERINGS, apply_filters
+from .forms import PropertyFilterForm
+from .models import PropertyCard, Realtor
+from .pagination import InvalidCursor, KeysetPaginator
+
+# Публичные поля -> пути в ORM (объекты - столбцы PropertyCard)
+PROPERTY_FIELDS = {
+    'id': 'property_id',
+    'title': 'title',
+    'description': 'description',
+    'property_type': 'property_type',
+    'status': 'status',
+    'address': 'address',
+    'price': 'price',
+    'area': 'area',
+    'bedrooms': 'bedrooms',
+    'bathrooms': 'bathrooms',
+    'is_featured': 'is_featured',
+    'realtor': 'realtor_id',
+    'main_image': 'main_image',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+PROPERTY_DEFAULT_FIELDS = ('id', 'title', 'property_type', 'status', 'price', 'area', 'main_image')
+
+REALTOR_FIELDS = {
+    'id': 'id',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'phone': 'phone',
+    'license_number': 'license_number',
+    'experience_years': 'experience_years',
+    'bio': 'bio',
+    'photo': 'photo',
+}
+REALTOR_DEFAULT_FIELDS = ('id', 'first_name', 'last_name', 'experience_years', 'photo')
+REALTOR_ORDERING = ('pk',)
+
+# Поля-файлы, которые отдаются как URL: поле -> модель
+FILE_FIELDS = {'main_image': PropertyCard, 'photo': Realtor}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    """Некорректный запрос к API (ответ 400)."""
+
+
+def api_etag(request, *args, **kwargs):
+    """Сильный ETag ответа: версия каталога + путь + нормализованная строка запроса."""
+    raw = f'{get_catalog_version()}:{request.path}?{normalize_querystring(request.GET)}'
+    if request.GET.get('sort') == 'popular':
+        raw = f'{get_view_counts_version()}:{raw}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(view_func):
+    """GET-представление API с ETag/If-None-Match и ошибками в формате JSON."""
+    @require_GET
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        etag = quote_etag(api_etag(request, *args, **kwargs))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            # Ответ получит ETag новой версии - данные не должны быть с отстающей реплики
+            pin_primary_if_changed()
+            try:
+                response = view_func(request, *args, **kwargs)
+            except ApiError as exc:
+                return _json({'error': str(exc)}, status=400)
+            except Http404:
+                return _json({'error': 'Не найдено'}, status=404)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
+    return wrapper
+
+
+def get_fields(request, available, default):
+    """Запрошенные поля (параметр fields) с проверкой допустимости."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('Параметр limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(row, fields, available):
+    data = {}
+    for name in fields:
+        value = row[available[name]]
+        if name in FILE_FIELDS:
+            storage = FILE_FIELDS[name]._meta.get_field(name).storage
+            value = storage.url(value) if value else None
+        data[name] = value
+    return data
+
+
+def paginated_response(request, queryset, fields, available, ordering):
+    """Страница результатов values() с курсорами next/previous."""
+    paginator = KeysetPaginator(queryset, get_limit(request), ordering)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor as exc:
+        raise ApiError(str(exc))
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+    return _json({
+        'results': [serialize(row, fields, available) for row in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    })
+
+
+def _columns(fields, available, ordering=()):
+    """Столбцы для values(): выбранные поля плюс поля сортировки для курсора."""
+    columns = [available[name] for name in fields]
+    for name in ordering:
+        name = name.lstrip('-')
+        column = available['id'] if name == 'pk' else name
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+@api_view
+def property_list_api(request):
+    """Список объектов с фильтрами каталога, выбором полей и курсорной пагинацией."""
+    fields = get_fields(request, PROPERTY_FIELDS, PROPERTY_DEFAULT_FIELDS)
+    sort = request.GET.get('sort')
+    ordering = SORT_ORDERINGS.get(sort) or SORT_ORDERINGS[DEFAULT_SORT]
+
+    filters = PropertyFilterForm(request.GET).get_filters()
+    queryset = apply_filters(PropertyCard.objects.all(), filters)
+    queryset = queryset.values(*_columns(fields, PROPERTY_FIELDS, ordering))
+    return paginated_response(request, queryset, fields, PROPERTY_FIELDS, ordering)
+
+
+@api_view
+def property_detail_api(request, pk):
+    """Один объект с выбором полей."""
+    fields = get_fields(request, PROPERTY_FIELDS, PROPERTY_FIELDS)
+    row = get_object_or_404(PropertyCard.objects.values(*_columns(fields, PROPERTY_FIELDS)), pk=pk)
+    return _json(serialize(row, fields, PROPERTY_FIELDS))
+
+
+@api_view
+def realtor_list_api(request):
+    """Список риелторов (фильтр experience_min - минимальный опыт в годах)."""
+    fields = get_fields(request, REALTOR_FIELDS, REALTOR_DEFAULT_FIELDS)
+    queryset = Realtor.objects.all()
+    experience_min = request.GET.get('experience_min')
+    if experience_min:
+        if not experience_min.isdigit():
+            raise ApiError('Параметр experience_min должен быть числом')
+        queryset = queryset.filter(experience_years__gte=int(experience_min))
+    queryset = queryset.values(*_columns(fields, REALTOR_FIELDS, REALTOR_ORDERING))
+    return paginated_response(request, queryset, fields, REALTOR_FIELDS, REALTOR_ORDERING)
+
+
+@api_view
+def realtor_detail_api(request, pk):
+    """Один риелтор с выбором полей."""
+    fields = get_fields(request, REALTOR_FIELDS, REALTOR_FIELDS)
+    row = get_object_or_404(Realtor.objects.values(*_columns(fields, REALTOR_FIELDS)), pk=pk)
+    return _json(serialize(row, fields, REALTOR_FIELDS))
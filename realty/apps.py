@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RealtyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'realty'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - регистрация обработчиков сигналов
@@ -0,0 +1,120 @@
+"""Асинхронные (ASGI) версии публичных страниц каталога.
+
+Страницы те же, что в views.py, и отрисовываются теми же шаблонами, но
+запросы к БД выполняются через асинхронный ORM (aget, acount, async for).
+Фильтры, сортировка и контекст боковой панели берутся из PropertyListView,
+чтобы синхронный и асинхронный каталоги не расходились.
+
+Шаблоны обращаются к request.user и связанным моделям, поэтому отрисовка
+выполняется в синхронном потоке через sync_to_async.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.shortcuts import render
+
+from .cache import cache_catalog_page
+from .conditional import (
+    detail_validators, detail_validators_query, not_modified_response, private_response, set_validators,
+)
+from .gallery import aattach_gallery, gallery_slides
+from .models import PropertyCard, Realtor
+from .pagination import InvalidCursor, KeysetPaginator
+from .view_counts import arecord_view
+from .views import PropertyListView
+
+arender = sync_to_async(render)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+@cache_catalog_page
+async def home(request):
+    """Главная страница"""
+    # Запросы независимы и ожидаются одновременно. Синхронная часть ORM в
+    # Django пока выполняется в одном потоке на запрос, поэтому выигрыш
+    # проявляется в основном при асинхронных драйверах БД и пулах соединений.
+    featured_properties, realtors = await asyncio.gather(
+        _alist(PropertyCard.objects.filter(is_featured=True).order_by('-created_at')[:3]),
+        _alist(Realtor.objects.select_related('user')[:3]),
+    )
+    context = {
+        'featured_properties': featured_properties,
+        'realtors': realtors,
+    }
+    return await arender(request, 'realty/home.html', context)
+
+
+async def _apaginate(view, queryset):
+    """Постраничная или курсорная пагинация, как в PropertyListView.paginate_queryset."""
+    per_page = view.paginate_by
+    if view.uses_cursor_pagination():
+        paginator = KeysetPaginator(queryset, per_page, view.get_ordering_fields())
+        try:
+            page = await paginator.apage(view.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Некорректный курсор страницы')
+        return paginator, page
+
+    paginator = Paginator(queryset, per_page)
+    # Количество считается асинхронно и подставляется в cached_property
+    paginator.count = await queryset.acount()
+    page_number = view.request.GET.get(view.page_kwarg) or 1
+    if page_number == 'last':
+        page_number = paginator.num_pages
+    try:
+        page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise Http404(f'Неверная страница ({page_number}): {exc}')
+    page.object_list = await _alist(page.object_list)
+    return paginator, page
+
+
+@cache_catalog_page
+async def property_list(request):
+    """Список всех объектов недвижимости"""
+    view = PropertyListView()
+    view.setup(request)
+    queryset = view.get_queryset()
+    paginator, page = await _apaginate(view, queryset)
+
+    context = {
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': page.object_list,
+        'properties': page.object_list,
+    }
+    context.update(await sync_to_async(view.get_catalog_context)())
+    return await arender(request, view.template_name, context)
+
+
+async def _render_detail(request, pk):
+    try:
+        property_obj = await PropertyCard.objects.aget(pk=pk)
+    except PropertyCard.DoesNotExist:
+        raise Http404('Объект не найден')
+    await aattach_gallery([property_obj])
+    context = {'property': property_obj, 'object': property_obj, 'slides': gallery_slides(property_obj)}
+    return await arender(request, 'realty/property_detail.html', context)
+
+
+async def property_detail(request, pk):
+    """Детальная информация об объекте (с ответом 304, как в PropertyDetailView)"""
+    user = await request.auser()
+    if user.is_authenticated:
+        response = await _render_detail(request, pk)
+        await arecord_view(pk)
+        return private_response(response)
+    etag, last_modified = detail_validators(pk, await detail_validators_query(pk).afirst())
+    response = await sync_to_async(not_modified_response)(request, etag, last_modified)
+    if response is None:
+        response = await _render_detail(request, pk)
+    await arecord_view(pk)
+    return set_validators(response, etag, last_modified)
+
@@ -0,0 +1,69 @@
+"""Вспомогательные функции для команд нагрузочных замеров (benchmark_*).
+
+Замеры выполняются внутри процесса через тестовые клиенты Django, без
+сетевого сервера: они сравнивают стоимость путей обработки запроса друг с
+другом, а не пропускную способность конкретного веб-сервера.
+"""
+
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, percent):
+    """Перцентиль (метод ближайшего ранга) списка значений."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Сводка замера: число запросов, запросов в секунду и задержки в мс."""
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_threaded(request_func, total, concurrency):
+    """
+    Выполняет request_func() total раз в concurrency потоках.
+    request_func возвращает True при успешном ответе.
+    """
+    def timed(_index):
+        started = time.perf_counter()
+        ok = request_func()
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        # Последовательно в текущем потоке (и на его подключении к БД)
+        results = [timed(index) for index in range(total)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ok in results], elapsed, sum(1 for _l, ok in results if not ok))
+
+
+async def run_concurrent(request_coro, total, concurrency):
+    """Асинхронный аналог run_threaded: не больше concurrency запросов одновременно."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await request_coro()
+            return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ok in results], elapsed, sum(1 for _l, ok in results if not ok))
@@ -0,0 +1,197 @@
+"""Кеширование страниц каталога с инвалидацией по версии каталога.
+
+Версия каталога - число в кеше, которое увеличивается сигналами при любом
+изменении Property или Realtor (см. realty/signals.py). Версия входит в ключи
+кеша, поэтому после изменения старые записи просто перестают запрашиваться и
+со временем вытесняются; очищать весь кеш не нужно. Работает с любым
+бэкендом кеша. При LocMemCache версия своя в каждом процессе, поэтому
+для нескольких процессов нужен общий бэкенд (Redis, Memcached, БД).
+
+Реплики БД (realty/routers.py) могут отставать: страница, прочитанная с
+реплики сразу после изменения, была бы сохранена под новой версией со
+старыми данными. Поэтому в течение PRIMARY_STICKY_SECONDS после изменения
+каталога промахи кеша страниц и фасетов читают основную БД.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .routers import pin_primary
+
+CATALOG_VERSION_KEY = 'realty:catalog-version'
+# Есть, пока реплики могут не видеть последнего изменения каталога
+CATALOG_CHANGED_KEY = 'realty:catalog-changed'
+# Поколение счётчиков просмотров: меняет порядок сортировки «Популярные»,
+# но не версию каталога (см. realty/view_counts.py)
+VIEW_COUNTS_VERSION_KEY = 'realty:view-counts-version'
+# v2: страница хранится вместе с заголовками ответа
+PAGE_CACHE_PREFIX = 'realty:page:v2'
+
+
+def _initial_version():
+    # Начальная версия - текущее время в миллисекундах: если ключ версии будет
+    # вытеснен из кеша, новая версия окажется больше всех прежних.
+    return time.time_ns() // 1_000_000
+
+
+def get_catalog_version():
+    """Текущая версия каталога."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога, делая недействительными все закешированные страницы."""
+    # До новой версии: кто её увидит, увидит и отметку об изменении
+    cache.set(CATALOG_CHANGED_KEY, True, getattr(settings, 'PRIMARY_STICKY_SECONDS', 15))
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        version = _initial_version()
+        cache.set(CATALOG_VERSION_KEY, version, None)
+        return version
+
+
+def get_view_counts_version():
+    """Текущее поколение счётчиков просмотров."""
+    version = cache.get(VIEW_COUNTS_VERSION_KEY)
+    if version is None:
+        cache.add(VIEW_COUNTS_VERSION_KEY, _initial_version(), None)
+        version = cache.get(VIEW_COUNTS_VERSION_KEY)
+    return version
+
+
+def bump_view_counts_version():
+    """Вызывается после записи буфера просмотров в БД."""
+    try:
+        return cache.incr(VIEW_COUNTS_VERSION_KEY)
+    except ValueError:
+        version = _initial_version()
+        cache.set(VIEW_COUNTS_VERSION_KEY, version, None)
+        return version
+
+
+def pin_primary_if_changed():
+    """
+    Перед заполнением кеша: если каталог изменился недавно (реплики могут
+    отставать), оставшиеся чтения запроса идут в основную БД.
+    """
+    if cache.get(CATALOG_CHANGED_KEY):
+        pin_primary()
+
+
+def normalize_querystring(query_dict):
+    """Строка запроса с отсортированными параметрами и без пустых значений."""
+    params = sorted(
+        (key, value)
+        for key, values in query_dict.lists()
+        for value in values
+        if value != ''
+    )
+    return '&'.join(f'{key}={value}' for key, value in params)
+
+
+def page_cache_key(request):
+    raw = f'{request.path}?{normalize_querystring(request.GET)}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{PAGE_CACHE_PREFIX}:{get_catalog_version()}:{digest}'
+
+
+def _is_cacheable_request(request, user):
+    # Кешируются только анонимные GET-запросы без ожидающих flash-сообщений:
+    # для авторизованных страница содержит имя пользователя и ссылки кабинета.
+    return (
+        request.method in ('GET', 'HEAD')
+        and not user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Страница с CSRF-токеном привязана к конкретному посетителю
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _cache_entry(response):
+    """Тело и заголовки ответа (Content-Type, Vary, Cache-Control и т.п.) для кеша."""
+    return response.content, list(response.items())
+
+
+def _cached_response(entry):
+    """Ответ из закешированной записи - с теми же заголовками, что и исходный."""
+    content, headers = entry
+    response = HttpResponse(content)
+    for header, value in headers:
+        response[header] = value
+    return response
+
+
+def _page_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600)
+
+
+def cache_catalog_page(view_func):
+    """
+    Кеширует ответы публичных страниц каталога для анонимных посетителей
+    на CATALOG_CACHE_TIMEOUT секунд (или до изменения каталога).
+    Поддерживает как синхронные, так и асинхронные представления.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request, await request.auser()):
+                return await view_func(request, *args, **kwargs)
+
+            key = await sync_to_async(page_cache_key)(request)
+            cached = await cache.aget(key)
+            if cached is not None:
+                return _cached_response(cached)
+
+            if await cache.aget(CATALOG_CHANGED_KEY):
+                pin_primary()
+            # Асинхронные представления возвращают уже отрисованный ответ
+            response = await view_func(request, *args, **kwargs)
+            if _is_cacheable_response(request, response):
+                await cache.aset(key, _cache_entry(response), _page_timeout())
+            return response
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not _is_cacheable_request(request, request.user):
+            return view_func(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return _cached_response(cached)
+
+        pin_primary_if_changed()
+        response = view_func(request, *args, **kwargs)
+
+        def store(rendered):
+            if _is_cacheable_response(request, rendered):
+                cache.set(key, _cache_entry(rendered), _page_timeout())
+
+        if getattr(response, 'is_rendered', True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        return response
+
+    return wrapper
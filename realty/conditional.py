@@ -0,0 +1,82 @@
+"""Условные GET-запросы (ETag / Last-Modified) к детальной странице объекта.
+
+Содержимое страницы определяется карточкой объекта (PropertyCard.updated_at
+меняется при каждом сохранении объекта) и профилем риелтора
+(PropertyCard.realtor_updated_at - копия Realtor.updated_at). Перед
+отрисовкой представление читает только эти два поля одним запросом
+values_list и, если клиент прислал актуальный ETag или If-Modified-Since,
+отвечает 304 без загрузки карточки и без отрисовки шаблона.
+
+Условные ответы - только для анонимных посетителей. Страница вошедшего
+пользователя зависит и от сессии: форма выхода содержит CSRF-токен, меню -
+роль пользователя, и после повторного входа или смены роли сохранённая
+браузером копия устарела бы без изменения объекта. Такие страницы
+отрисовываются всегда и помечаются private (private_response).
+
+Счётчик просмотров в ETag не входит - при ответе 304 посетитель видит число
+просмотров на момент последней полной загрузки страницы.
+"""
+
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import PropertyCard
+
+# Увеличивается при изменении шаблона детальной страницы, чтобы после выпуска
+# браузеры не получали 304 для страниц, отрисованных старым шаблоном
+DETAIL_PAGE_VERSION = 1
+
+VALIDATOR_FIELDS = ('updated_at', 'realtor_updated_at')
+
+
+def detail_validators_query(pk):
+    return PropertyCard.objects.filter(pk=pk).values_list(*VALIDATOR_FIELDS)
+
+
+def detail_validators(pk, row):
+    """(ETag, Last-Modified в секундах) по строке detail_validators_query; Http404, если объекта нет."""
+    if row is None:
+        raise Http404('Объект не найден')
+    updated_at, realtor_updated_at = row
+    last_modified = max(value for value in row if value is not None)
+    source = ':'.join([
+        str(DETAIL_PAGE_VERSION), str(pk), updated_at.isoformat(),
+        realtor_updated_at.isoformat() if realtor_updated_at else '',
+    ])
+    etag = quote_etag(hashlib.md5(source.encode(), usedforsecurity=False).hexdigest())
+    return etag, int(last_modified.timestamp())
+
+
+def not_modified_response(request, etag, last_modified):
+    """Ответ 304 (или 412), если у клиента актуальная страница, иначе None."""
+    # Ожидающие сообщения выводятся в шаблоне - такую страницу нужно отрисовать
+    if len(get_messages(request)):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """ETag, Last-Modified и Cache-Control с обязательной проверкой."""
+    if response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Страница не отдаётся из кеша браузера без проверки: иначе изменения
+    # объекта были бы видны только через эвристический срок свежести
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def private_response(response):
+    """Страница вошедшего пользователя: без валидаторов, не для общих кешей."""
+    patch_cache_control(response, no_cache=True, private=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,110 @@
+"""Фасетные счётчики для боковой панели каталога.
+
+Все счётчики (по типам, статусам и ценовым диапазонам) считаются одним
+агрегатным запросом с условными COUNT(...) FILTER (WHERE ...). Для каждого
+фасета учитываются все текущие фильтры, кроме его собственного, чтобы
+пользователь видел, сколько объектов даст выбор другого значения.
+"""
+
+import hashlib
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import get_catalog_version, pin_primary_if_changed
+from .filters import apply_filters
+from .models import Property
+
+# Ценовые диапазоны: (подпись, нижняя граница, верхняя граница). Нижняя граница
+# входит в диапазон, верхняя - нет: объект с ценой ровно 3 млн - в «3–5 млн»
+PRICE_BUCKETS = [
+    ('до 3 млн', None, Decimal('3000000')),
+    ('3–5 млн', Decimal('3000000'), Decimal('5000000')),
+    ('5–10 млн', Decimal('5000000'), Decimal('10000000')),
+    ('10–20 млн', Decimal('10000000'), Decimal('20000000')),
+    ('от 20 млн', Decimal('20000000'), None),
+]
+
+# Шаг цены (Property.price хранится с двумя знаками): фильтр «Цена до»
+# включает границу, поэтому ссылка диапазона передаёт верхнюю границу минус шаг
+PRICE_STEP = Decimal('0.01')
+
+FACETS_CACHE_PREFIX = 'realty:facets'
+
+
+def _range_condition(field, low, high, high_lookup='lte'):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__{high_lookup}': high})
+    return condition
+
+
+def _count(condition):
+    # Пустое условие - обычный COUNT, без FILTER (WHERE)
+    return Count('pk', filter=condition) if condition else Count('pk')
+
+
+def compute_facets(queryset, filters):
+    """Считает фасеты для нормализованных фильтров одним запросом."""
+    type_condition = Q(property_type=filters['property_type']) if filters.get('property_type') else Q()
+    status_condition = Q(status=filters['status']) if filters.get('status') else Q()
+    price_condition = _range_condition('price', filters.get('price_min'), filters.get('price_max'))
+
+    aggregates = {'total': _count(type_condition & status_condition & price_condition)}
+    for code, _label in Property.PROPERTY_TYPES:
+        aggregates[f'type_{code}'] = _count(Q(property_type=code) & status_condition & price_condition)
+    for code, _label in Property.STATUS_CHOICES:
+        aggregates[f'status_{code}'] = _count(Q(status=code) & type_condition & price_condition)
+    for index, (_label, low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f'price_{index}'] = _count(
+            _range_condition('price', low, high, high_lookup='lt') & type_condition & status_condition
+        )
+
+    base = apply_filters(queryset, filters, exclude=('property_type', 'status', 'price'))
+    counts = base.order_by().aggregate(**aggregates)
+
+    return {
+        'total': counts['total'],
+        'property_type': [
+            {'value': code, 'label': label, 'count': counts[f'type_{code}']}
+            for code, label in Property.PROPERTY_TYPES
+        ],
+        'status': [
+            {'value': code, 'label': label, 'count': counts[f'status_{code}']}
+            for code, label in Property.STATUS_CHOICES
+        ],
+        'price': [
+            {
+                'label': label,
+                'min': '' if low is None else str(low),
+                'max': '' if high is None else str(high - PRICE_STEP),
+                'count': counts[f'price_{index}'],
+            }
+            for index, (label, low, high) in enumerate(PRICE_BUCKETS)
+        ],
+    }
+
+
+def facets_cache_key(queryset, filters):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'{FACETS_CACHE_PREFIX}:{get_catalog_version()}:{queryset.model._meta.label_lower}:{digest}'
+
+
+def get_facets(queryset, filters):
+    """
+    Фасеты из кеша; при промахе считаются и сохраняются на FACETS_CACHE_TIMEOUT
+    секунд. Ключ включает версию каталога, поэтому изменения видны сразу
+    (сразу после изменения счётчики читаются из основной БД, см. cache.py).
+    """
+    key = facets_cache_key(queryset, filters)
+    facets = cache.get(key)
+    if facets is None:
+        pin_primary_if_changed()
+        facets = compute_facets(queryset, filters)
+        cache.set(key, facets, getattr(settings, 'FACETS_CACHE_TIMEOUT', 300))
+    return facets
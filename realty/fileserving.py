@@ -0,0 +1,243 @@
+"""Отдача статики и загруженных файлов самим приложением (WSGI и ASGI).
+
+StaticMediaMiddleware (realty/middleware.py) отвечает на запросы к
+STATIC_URL (файлы из STATIC_ROOT после collectstatic) и MEDIA_URL (файлы из
+MEDIA_ROOT) без отдельного веб-сервера:
+
+* Cache-Control: статика с хешем в имени (CompressedManifestStaticFilesStorage)
+  и фотографии с именем из хеша содержимого (ContentAddressedStorage)
+  кешируются на год с immutable; остальные файлы - на STATIC_MAX_AGE или
+  MEDIA_MAX_AGE секунд с проверкой по ETag;
+* ETag (размер и время изменения) и If-None-Match / If-Modified-Since - 304;
+* заранее сжатые варианты .br/.gz по Accept-Encoding (Vary: Accept-Encoding);
+  прямой запрос к самому сжатому файлу (site.css.gz) отдаётся как архив;
+* Range для одного диапазона байтов (206, 416), If-Range.
+
+При DEBUG с приложением django.contrib.staticfiles статика, как в runserver,
+ищется в исходных каталогах (STATICFILES_DIRS, static/ приложений), а не в
+STATIC_ROOT, где может лежать устаревшая копия от прошлого collectstatic.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from email.utils import formatdate
+from urllib.parse import unquote
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import parse_http_date_safe
+
+from .storage import CONTENT_NAME
+
+# Имя с хешем содержимого: name.0123456789ab.ext
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Кодировка в Accept-Encoding -> расширение заранее сжатого файла (по предпочтению)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Тип файлов, сжатых целиком (mimetypes определяет для них кодировку)
+COMPRESSED_TYPES = {'gzip': 'application/gzip', 'br': 'application/x-brotli'}
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _url_prefix(url):
+    if not url:
+        return None
+    path = url if url.startswith('/') else '/' + url
+    return path if path.endswith('/') else path + '/'
+
+
+def use_finders():
+    """Статика из исходных каталогов (finders), а не из STATIC_ROOT."""
+    return settings.DEBUG and apps.is_installed('django.contrib.staticfiles')
+
+
+def file_roots():
+    """[(префикс URL, каталог, вид)] для статики и загруженных файлов; каталог None - finders."""
+    roots = []
+    static_prefix = _url_prefix(settings.STATIC_URL)
+    if static_prefix and use_finders():
+        roots.append((static_prefix, None, 'static'))
+    elif static_prefix and settings.STATIC_ROOT:
+        roots.append((static_prefix, str(settings.STATIC_ROOT), 'static'))
+    media_prefix = _url_prefix(settings.MEDIA_URL)
+    if media_prefix and settings.MEDIA_ROOT:
+        roots.append((media_prefix, str(settings.MEDIA_ROOT), 'media'))
+    return roots
+
+
+def find_file(path):
+    """(полный путь, имя, вид) файла для пути запроса или None."""
+    for prefix, root, kind in file_roots():
+        if not path.startswith(prefix):
+            continue
+        name = unquote(path[len(prefix):])
+        # Скрытые файлы (.htaccess, временные .upload-* при записи изображений) не отдаются
+        if any(part.startswith('.') for part in re.split(r'[/\\]', name)):
+            return None
+        try:
+            if root is None:
+                full_path = finders.find(posixpath.normpath(name).lstrip('/'))
+            else:
+                full_path = safe_join(root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if full_path is None:
+            return None
+        try:
+            st = os.stat(full_path)
+        except (OSError, ValueError):
+            return None
+        if stat.S_ISREG(st.st_mode):
+            return full_path, name, kind
+        return None
+    return None
+
+
+def cache_control(name, kind):
+    if (kind == 'static' and HASHED_NAME.search(name)) or (kind == 'media' and CONTENT_NAME.match(name)):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    setting = 'STATIC_MAX_AGE' if kind == 'static' else 'MEDIA_MAX_AGE'
+    return f'public, max-age={getattr(settings, setting, 0)}'
+
+
+def make_etag(st, encoding=None):
+    tag = f'{int(st.st_mtime):x}-{st.st_size:x}'
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+def accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_variant(request, full_path):
+    """(путь, кодировка) - заранее сжатый вариант, если клиент его принимает."""
+    accepted = accepted_encodings(request)
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return full_path, None
+
+
+def parse_range(header, size):
+    """(начало, конец) включительно; None - диапазон не разобран; False - вне файла."""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Последние N байтов
+        length = int(last)
+        if not length:
+            return False
+        start, end = max(size - length, 0), size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def not_modified(request, etag, st):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return modified_since is not None and int(st.st_mtime) <= modified_since
+
+
+def serve_file(request, full_path, name, kind):
+    """Ответ с файлом для GET/HEAD с учётом условных запросов и Range."""
+    if request.method not in ('GET', 'HEAD'):
+        response = HttpResponse(status=405)
+        response['Allow'] = 'GET, HEAD'
+        return response
+
+    range_header = request.headers.get('Range')
+    # Диапазоны относятся к несжатому файлу
+    path, encoding = (full_path, None) if range_header else choose_variant(request, full_path)
+    st = os.stat(path)
+    etag = make_etag(st, encoding)
+    headers = {
+        'Cache-Control': cache_control(name, kind),
+        'ETag': etag,
+        'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+        'Accept-Ranges': 'bytes',
+    }
+    if any(os.path.isfile(full_path + suffix) for _encoding, suffix in ENCODINGS):
+        headers['Vary'] = 'Accept-Encoding'
+
+    if not_modified(request, etag, st):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, file_encoding = mimetypes.guess_type(full_path)
+    if file_encoding:
+        # Запрошен сам сжатый файл (site.css.gz): это архив, а не site.css
+        # с Content-Encoding - иначе клиент получил бы gzip под видом CSS
+        content_type = COMPRESSED_TYPES.get(file_encoding)
+    content_type = content_type or 'application/octet-stream'
+    if_range = request.headers.get('If-Range')
+    byte_range = None
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = parse_range(range_header, st.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        body = [] if request.method == 'HEAD' else _read_range(path, start, length)
+        response = StreamingHttpResponse(body, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+        response['Content-Length'] = str(length)
+    elif request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(st.st_size)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type, filename=os.path.basename(full_path))
+        response['Content-Length'] = str(st.st_size)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
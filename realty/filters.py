@@ -0,0 +1,78 @@
+"""Фильтры каталога объектов недвижимости.
+
+Значения фильтров приходят из PropertyFilterForm и передаются сюда в
+нормализованном виде (словарь только с заполненными полями), чтобы один и тот
+же набор фильтров давал одинаковый ключ кеша независимо от порядка параметров
+в строке запроса.
+"""
+
+from .geo import filter_bbox, filter_radius
+from .search import normalize_query, search_properties
+
+# Диапазонные фильтры: имя группы -> поле модели (параметры <поле>_min/<поле>_max)
+RANGE_FILTERS = ('price', 'area', 'bedrooms', 'bathrooms')
+
+# Фильтры по точному совпадению значения
+CHOICE_FILTERS = ('property_type', 'status')
+
+# Поиск по расстоянию: параметры lat/lng/radius_km или bbox=юг,запад,север,восток
+GEO_FILTERS = ('lat', 'lng', 'radius_km', 'bbox')
+MAX_RADIUS_KM = 100
+
+# Сортировки: значение параметра sort -> поля order_by (pk - для однозначности
+# и keyset-пагинации). Под каждую есть составные индексы, см. Property.Meta.
+SORT_ORDERINGS = {
+    'newest': ('-created_at', '-pk'),
+    'price_asc': ('price', 'pk'),
+    'price_desc': ('-price', '-pk'),
+    'popular': ('-view_count', '-pk'),
+}
+DEFAULT_SORT = 'newest'
+
+
+def normalize_filters(cleaned_data):
+    """Оставляет только заполненные фильтры; значения приводятся к строкам."""
+    filters = {}
+    for name, value in cleaned_data.items():
+        if value in (None, ''):
+            continue
+        if name == 'q':
+            value = normalize_query(value)
+            if not value:
+                continue
+        filters[name] = str(value)
+    return filters
+
+
+def apply_filters(queryset, filters, exclude=()):
+    """
+    Применяет нормализованные фильтры к queryset.
+
+    ``exclude`` - группы фильтров ('q', 'property_type', 'price', 'geo', ...),
+    которые нужно пропустить (используется при подсчёте фасетов).
+    """
+    if filters.get('q') and 'q' not in exclude:
+        queryset = search_properties(queryset, filters['q'], rank=False)
+
+    for name in CHOICE_FILTERS:
+        if filters.get(name) and name not in exclude:
+            queryset = queryset.filter(**{name: filters[name]})
+
+    for name in RANGE_FILTERS:
+        if name in exclude:
+            continue
+        if filters.get(f'{name}_min'):
+            queryset = queryset.filter(**{f'{name}__gte': filters[f'{name}_min']})
+        if filters.get(f'{name}_max'):
+            queryset = queryset.filter(**{f'{name}__lte': filters[f'{name}_max']})
+
+    if 'geo' not in exclude:
+        if filters.get('bbox'):
+            # bbox может пересекать 180-й меридиан (запад > восток)
+            south, west, north, east = (float(part) for part in filters['bbox'].split(','))
+            if east < west:
+                east += 360
+            queryset = filter_bbox(queryset, south, west, north, east)
+        if all(filters.get(name) for name in ('lat', 'lng', 'radius_km')):
+            queryset = filter_radius(queryset, filters['lat'], filters['lng'], filters['radius_km'])
+    return queryset
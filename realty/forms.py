@@ -3,11 +3,25 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import Client, Realtor, Property 
+from .filters import MAX_RADIUS_KM, normalize_filters
+from .gallery import add_gallery_images, gallery_changed
+from .images import IMAGE_FIELDS, generate_property_variants
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.forms import AuthenticationForm, UsernameField # <--- Добавьте UsernameField
 from django.forms import PasswordInput, TextInput # <--- Добавьте TextInput
 
+def check_email_available(email):
+    """
+    Email должен быть свободен (без учёта регистра). На PostgreSQL поиск идёт
+    по индексу UPPER(email), см. миграцию 0008.
+    """
+    if email and User.objects.filter(email__iexact=email).exists():
+        raise forms.ValidationError('Пользователь с таким email уже зарегистрирован.')
+    return email
+
+
 # --- 1. ФОРМА РЕГИСТРАЦИИ КЛИЕНТА ---
 class ClientSignUpForm(forms.Form):
     # Поля для User
@@ -33,6 +47,16 @@ class ClientSignUpForm(forms.Form):
             
         self.fields['address'].widget.attrs['rows'] = 3
 
+    def clean_username(self):
+        """Имя пользователя свободно (без учёта регистра, как в UserCreationForm)."""
+        username = self.cleaned_data.get('username')
+        if username and User.objects.filter(username__iexact=username).exists():
+            raise forms.ValidationError('Пользователь с таким именем уже существует.')
+        return username
+
+    def clean_user_email(self):
+        return check_email_available(self.cleaned_data.get('user_email'))
+
     def clean_password2(self):
         """Проверка, что пароли совпадают."""
         password = self.cleaned_data.get('password')
@@ -46,23 +70,27 @@ class ClientSignUpForm(forms.Form):
         """
         Вручную создает объекты User и Client. 
         Этот метод мы добавили в forms.Form, чтобы чище выглядел views.py.
+
+        Два INSERT в одной транзакции: при ошибке не остаётся пользователя
+        без профиля клиента. Уникальность проверена в clean_*; IntegrityError
+        возможен только при одновременной регистрации с теми же данными.
         """
-        # 1. Создаем User
-        user = User.objects.create_user(
-            username=self.cleaned_data['username'],
-            email=self.cleaned_data['user_email'],
-            password=self.cleaned_data['password'],
-            first_name=self.cleaned_data['first_name'],
-            last_name=self.cleaned_data['last_name'],
-        )
-        user.save()
-        
-        # 2. Создаем Client
-        Client.objects.create(
-            user=user,
-            phone=self.cleaned_data['phone'],
-            address=self.cleaned_data['address'],
-        )
+        with transaction.atomic():
+            # 1. Создаем User (create_user сразу сохраняет его)
+            user = User.objects.create_user(
+                username=self.cleaned_data['username'],
+                email=self.cleaned_data['user_email'],
+                password=self.cleaned_data['password'],
+                first_name=self.cleaned_data['first_name'],
+                last_name=self.cleaned_data['last_name'],
+            )
+
+            # 2. Создаем Client
+            Client.objects.create(
+                user=user,
+                phone=self.cleaned_data['phone'],
+                address=self.cleaned_data['address'],
+            )
         
         return user # Возвращаем объект User для логина
 
@@ -83,15 +111,27 @@ class RealtorSignUpForm(UserCreationForm):
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
         }
         
+    def clean_email(self):
+        return check_email_available(self.cleaned_data.get('email'))
+
+    def clean_license_number(self):
+        """Номер лицензии свободен (поиск по уникальному индексу)."""
+        license_number = self.cleaned_data.get('license_number')
+        if license_number and Realtor.objects.filter(license_number=license_number).exists():
+            raise forms.ValidationError('Риелтор с таким номером лицензии уже зарегистрирован.')
+        return license_number
+
     def save(self, commit=True):
-        user = super().save(commit=True)
-        
-        Realtor.objects.create(
-            user=user,
-            license_number=self.cleaned_data.get('license_number'),
-            phone=self.cleaned_data.get('phone'),
-            experience_years=0,
-        )
+        """Пользователь и профиль риелтора - два INSERT в одной транзакции."""
+        with transaction.atomic():
+            user = super().save(commit=True)
+            
+            Realtor.objects.create(
+                user=user,
+                license_number=self.cleaned_data.get('license_number'),
+                phone=self.cleaned_data.get('phone'),
+                experience_years=0,
+            )
         return user
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -110,6 +150,24 @@ class RealtorSignUpForm(UserCreationForm):
         # })
 
 # --- 3. ФОРМА УПРАВЛЕНИЯ ОБЪЕКТОМ НЕДВИЖИМОСТИ ---
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """Несколько изображений в одном поле (список файлов)."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        clean_one = super().clean
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        return [clean_one(item, initial) for item in data if item]
+
+
 class PropertyForm(forms.ModelForm):
     
     client = forms.ModelChoiceField(
@@ -117,6 +175,11 @@ class PropertyForm(forms.ModelForm):
         widget=forms.HiddenInput(),
         required=False # Ставим False, т.к. мы заполним его в view
     )
+    # Фотографии добавляются в конец галереи объекта (PropertyImage)
+    gallery = MultipleImageField(
+        required=False, label='Фотографии галереи',
+        widget=MultipleFileInput(attrs={'class': 'form-control', 'accept': 'image/*'}),
+    )
 
     class Meta:
         model = Property
@@ -130,12 +193,11 @@ class PropertyForm(forms.ModelForm):
             'bathrooms': forms.NumberInput(attrs={'class': 'form-control'}),
             'area': forms.NumberInput(attrs={'class': 'form-control'}), 
             'address': forms.TextInput(attrs={'class': 'form-control'}),
+            'latitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
+            'longitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any'}),
             'property_type': forms.Select(attrs={'class': 'form-select'}),
             'status': forms.Select(attrs={'class': 'form-select'}),
             'main_image': forms.ClearableFileInput(attrs={'class': 'form-control'}), 
-            'image1': forms.ClearableFileInput(attrs={'class': 'form-control'}), 
-            'image2': forms.ClearableFileInput(attrs={'class': 'form-control'}), 
-            'image3': forms.ClearableFileInput(attrs={'class': 'form-control'}), 
         }
         
         labels = {
@@ -146,14 +208,106 @@ class PropertyForm(forms.ModelForm):
             'bathrooms': 'Количество ванных',
             'area': 'Площадь (м²)', 
             'address': 'Адрес',
+            'latitude': 'Широта',
+            'longitude': 'Долгота',
             'property_type': 'Тип недвижимости',
             'status': 'Статус',
             'main_image': 'Главное фото', 
-            'image1': 'Изображение 1', 
-            'image2': 'Изображение 2', 
-            'image3': 'Изображение 3',
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # Адрес изменился, а координаты не введены заново - прежние координаты
+        # устарели, при сохранении они будут определены геокодером по новому адресу
+        if 'address' in self.changed_data and not {'latitude', 'longitude'} & set(self.changed_data):
+            cleaned_data['latitude'] = cleaned_data['longitude'] = None
+        return cleaned_data
+
+    def save(self, commit=True):
+        instance = super().save(commit)
+        if commit:
+            self.save_gallery()
+        return instance
+
+    def save_gallery(self):
+        """
+        Уменьшенные варианты новых фото и фотографии галереи. Файлы попадают в
+        хранилище при сохранении объекта, поэтому после save(commit=False)
+        метод вызывается явно - после сохранения объекта и save_m2m().
+        """
+        changed = [name for name in IMAGE_FIELDS if name in self.changed_data]
+        variants = generate_property_variants(self.instance, changed) if changed else []
+        images = add_gallery_images(self.instance, self.cleaned_data.get('gallery'))
+        if variants and not images:
+            # Варианты появились после сохранения объекта - карточка, закешированная
+            # в этот промежуток, не должна остаться с исходным <img>
+            gallery_changed([self.instance.pk])
+
+class PropertyImportForm(PropertyForm):
+    """
+    Проверка строки массового импорта по правилам PropertyForm.
+    Риелтор и клиент подставляются командой import_properties, фото не импортируются.
+    """
+    client = None
+    gallery = None
+
+    class Meta(PropertyForm.Meta):
+        exclude = PropertyForm.Meta.exclude + ('client',) + IMAGE_FIELDS
+
+    def save_gallery(self):
+        # Объекты создаются через bulk_create, фото не импортируются
+        pass
+
+# --- 4. ФОРМА ФИЛЬТРОВ КАТАЛОГА ---
+class PropertyFilterForm(forms.Form):
+    """Параметры поиска и фильтрации в PropertyListView."""
+    q = forms.CharField(required=False, label='Поиск')
+    property_type = forms.ChoiceField(
+        choices=[('', 'Все типы')] + Property.PROPERTY_TYPES, required=False, label='Тип недвижимости'
+    )
+    status = forms.ChoiceField(
+        choices=[('', 'Все статусы')] + Property.STATUS_CHOICES, required=False, label='Статус'
+    )
+    price_min = forms.DecimalField(required=False, min_value=0, max_digits=12, decimal_places=2, label='Цена от')
+    price_max = forms.DecimalField(required=False, min_value=0, max_digits=12, decimal_places=2, label='Цена до')
+    area_min = forms.DecimalField(required=False, min_value=0, max_digits=8, decimal_places=2, label='Площадь от')
+    area_max = forms.DecimalField(required=False, min_value=0, max_digits=8, decimal_places=2, label='Площадь до')
+    bedrooms_min = forms.IntegerField(required=False, min_value=0, label='Спален от')
+    bedrooms_max = forms.IntegerField(required=False, min_value=0, label='Спален до')
+    bathrooms_min = forms.IntegerField(required=False, min_value=0, label='Ванных от')
+    bathrooms_max = forms.IntegerField(required=False, min_value=0, label='Ванных до')
+    lat = forms.FloatField(required=False, min_value=-90, max_value=90, label='Широта')
+    lng = forms.FloatField(required=False, min_value=-180, max_value=180, label='Долгота')
+    radius_km = forms.FloatField(required=False, min_value=0.1, max_value=MAX_RADIUS_KM, label='Радиус, км')
+    bbox = forms.CharField(required=False, label='Область (юг,запад,север,восток)')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for name, field in self.fields.items():
+            css_class = 'form-select' if isinstance(field, forms.ChoiceField) else 'form-control'
+            field.widget.attrs.update({'class': css_class, 'placeholder': field.label})
+
+    def clean_bbox(self):
+        value = self.cleaned_data['bbox'].strip()
+        if not value:
+            return ''
+        try:
+            south, west, north, east = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError('Ожидается четыре числа через запятую: юг,запад,север,восток')
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            raise forms.ValidationError('Некорректные границы области')
+        return f'{south},{west},{north},{east}'
+
+    def get_filters(self):
+        """
+        Нормализованные фильтры. Некорректно заполненные поля
+        не приводят к ошибке, а просто игнорируются.
+        """
+        self.is_valid()
+        return normalize_filters(self.cleaned_data)
+
 class LoginForm(AuthenticationForm):
     # Явно переопределяем поля и виджеты, чтобы применить наш класс стилей
     username = UsernameField(
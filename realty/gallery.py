@@ -0,0 +1,90 @@
+"""Галерея фотографий объекта (PropertyImage).
+
+Списки объектов читают карточки (PropertyCard), где хранится только обложка:
+главное фото объекта, а без него - первая фотография галереи. Обложка
+вычисляется подзапросом при пересборке карточек (first_image_subquery в
+read_model.py), так что страницы каталога не загружают галерею вовсе.
+Детальная страница загружает всю галерею одним запросом (attach_gallery).
+
+Изменение галереи и появление уменьшенных вариантов фото обновляют
+Property.updated_at: от него зависят кеш HTML карточек (выводящих <picture>
+только при готовых вариантах), ETag детальной страницы и версия каталога.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .images import generate_image_variants
+from .models import Property, PropertyImage
+from .read_model import refresh_property_cards
+
+
+def attach_gallery(objects):
+    """
+    Загружает галереи объектов (Property или PropertyCard - у карточки тот же pk)
+    одним запросом и сохраняет их в атрибуте gallery. Возвращает objects.
+    """
+    galleries = {obj.pk: [] for obj in objects}
+    if galleries:
+        for image in PropertyImage.objects.filter(property_id__in=list(galleries)):
+            galleries[image.property_id].append(image)
+    for obj in objects:
+        obj.gallery = galleries[obj.pk]
+    return objects
+
+
+def gallery_slides(card):
+    """
+    Изображения для карусели детальной страницы: обложка, если это не
+    фотография галереи (главное фото), затем галерея. Галерея должна быть
+    загружена attach_gallery.
+    """
+    images = [image.image for image in card.gallery]
+    if card.main_image and card.main_image.name not in {image.name for image in images}:
+        images.insert(0, card.main_image)
+    return images
+
+
+async def aattach_gallery(objects):
+    """Асинхронный вариант attach_gallery."""
+    galleries = {obj.pk: [] for obj in objects}
+    if galleries:
+        async for image in PropertyImage.objects.filter(property_id__in=list(galleries)):
+            galleries[image.property_id].append(image)
+    for obj in objects:
+        obj.gallery = galleries[obj.pk]
+    return objects
+
+
+def gallery_changed(property_ids):
+    """
+    Галерея или варианты фото объектов изменились: новая дата изменения,
+    карточки и версия каталога.
+    """
+    property_ids = list(property_ids)
+    Property.objects.filter(pk__in=property_ids).update(updated_at=timezone.now())
+    refresh_property_cards(property_ids)
+    bump_catalog_version()
+
+
+def add_gallery_images(property_obj, files):
+    """
+    Добавляет фотографии в конец галереи объекта: файлы и их варианты
+    сохраняются в хранилище, записи - одним INSERT, карточка пересобирается
+    один раз, когда варианты уже готовы.
+    """
+    if not files:
+        return []
+    last = property_obj.images.order_by('-position', '-pk').values_list('position', flat=True).first()
+    start = 0 if last is None else last + 1
+    images = []
+    for offset, upload in enumerate(files):
+        image = PropertyImage(property=property_obj, position=start + offset)
+        image.image.save(upload.name, upload, save=False)
+        images.append(image)
+    generate_image_variants([image.image for image in images])
+    with transaction.atomic():
+        PropertyImage.objects.bulk_create(images)
+        gallery_changed([property_obj.pk])
+    return images
@@ -0,0 +1,276 @@
+"""Поиск объектов по расстоянию («рядом со мной») без PostGIS.
+
+У каждого объекта с координатами хранится ячейка geohash (``Property.geo_cell``,
+точность GEO_CELL_PRECISION) с B-tree индексом. Все ячейки с общим префиксом
+лежат в индексе подряд, поэтому область поиска покрывается небольшим числом
+префиксов, каждый из которых превращается в диапазон ``geo_cell >= префикс AND
+geo_cell < следующий префикс``. Отобранные по индексу кандидаты затем
+дополнительно проверяются по прямоугольнику координат и точной формуле
+гаверсинусов.
+
+Геокодер подключается настройкой GEOCODER (путь к классу). По умолчанию его
+нет: координаты объекта без явно заданных широты и долготы остаются пустыми, и
+в поиск по расстоянию он не попадает. Локальная заглушка StubGeocoder
+придумывает координаты по хешу адреса и годится только для разработки и тестов.
+"""
+
+import hashlib
+import logging
+import math
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Алфавит geohash (base32 без a, i, l, o) - в порядке возрастания кодов символов
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Точность ячейки, хранимой в Property.geo_cell (~1.2 x 0.6 км)
+GEO_CELL_PRECISION = 6
+
+# Наибольшее число ячеек-диапазонов в одном запросе; для больших областей
+# берутся более крупные ячейки (более короткие префиксы)
+MAX_COVER_CELLS = 16
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(latitude, longitude, precision=GEO_CELL_PRECISION):
+    """Geohash точки с заданным числом символов."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Размер ячейки geohash в градусах: (по широте, по долготе)."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def next_prefix(prefix):
+    """Наименьшая строка, большая всех строк с префиксом prefix (None - таких нет)."""
+    chars = list(prefix)
+    while chars:
+        position = GEOHASH_ALPHABET.index(chars[-1])
+        if position + 1 < len(GEOHASH_ALPHABET):
+            chars[-1] = GEOHASH_ALPHABET[position + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Прямоугольник (юг, запад, север, восток), содержащий круг радиуса radius_km."""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or delta_lat >= 90:
+        delta_lng = 180.0
+    else:
+        delta_lng = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (
+        max(-90.0, latitude - delta_lat),
+        longitude - delta_lng,
+        min(90.0, latitude + delta_lat),
+        longitude + delta_lng,
+    )
+
+
+def _wrap_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def _steps(start, stop, step):
+    """Точки от start до stop включительно с шагом не больше step."""
+    points = []
+    value = start
+    while value < stop:
+        points.append(value)
+        value += step
+    points.append(stop)
+    return points
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """
+    Префиксы geohash, покрывающие прямоугольник. Выбирается самая мелкая
+    точность (не больше GEO_CELL_PRECISION), при которой ячеек не больше max_cells.
+    """
+    east = min(east, west + 360.0)
+    for precision in range(GEO_CELL_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        columns = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * columns <= max_cells:
+            break
+
+    # Шаг выборки равен размеру ячейки, поэтому в каждую пересекаемую ячейку попадает точка
+    return sorted({
+        geohash_encode(latitude, _wrap_longitude(longitude), precision)
+        for latitude in _steps(south, north, height)
+        for longitude in _steps(west, east, width)
+    })
+
+
+def cell_ranges(cells):
+    """Объединяет соседние префиксы в диапазоны [начало, конец) по geo_cell."""
+    ranges = []
+    for cell in sorted(cells):
+        end = next_prefix(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = end
+        else:
+            ranges.append([cell, end])
+    return [tuple(item) for item in ranges]
+
+
+def cell_condition(cells):
+    """Условие Q по столбцу geo_cell для набора префиксов."""
+    condition = Q()
+    for start, end in cell_ranges(cells):
+        step = Q(geo_cell__gte=start)
+        if end is not None:
+            step &= Q(geo_cell__lt=end)
+        condition |= step
+    return condition
+
+
+def _bbox_condition(south, west, north, east):
+    condition = Q(latitude__gte=south, latitude__lte=north)
+    if east - west >= 360:
+        return condition
+    west, east = _wrap_longitude(west), _wrap_longitude(east)
+    if west <= east:
+        return condition & Q(longitude__gte=west, longitude__lte=east)
+    # Прямоугольник пересекает 180-й меридиан
+    return condition & (Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def filter_bbox(queryset, south, west, north, east):
+    """Объекты внутри прямоугольника координат."""
+    cells = covering_cells(south, west, north, east)
+    return queryset.filter(cell_condition(cells) & _bbox_condition(south, west, north, east))
+
+
+def distance_expression(latitude, longitude):
+    """Выражение ORM: расстояние в километрах от точки до объекта (формула гаверсинусов)."""
+    lat1 = Radians(Value(float(latitude), output_field=FloatField()))
+    lat2 = Radians(F('latitude'))
+    delta_lat = Radians(F('latitude') - Value(float(latitude), output_field=FloatField()))
+    delta_lng = Radians(F('longitude') - Value(float(longitude), output_field=FloatField()))
+    haversine = Power(Sin(delta_lat / 2), 2) + Cos(lat1) * Cos(lat2) * Power(Sin(delta_lng / 2), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(haversine))
+
+
+def filter_radius(queryset, latitude, longitude, radius_km):
+    """Объекты не дальше radius_km от точки; расстояние доступно для order_by как distance_km."""
+    latitude, longitude, radius_km = float(latitude), float(longitude), float(radius_km)
+    queryset = filter_bbox(queryset, *bounding_box(latitude, longitude, radius_km))
+    return queryset.alias(
+        distance_km=distance_expression(latitude, longitude),
+    ).filter(distance_km__lte=radius_km)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Расстояние между двумя точками в километрах."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# --- Геокодирование ---
+
+class Geocoder:
+    """Базовый класс геокодера: адрес -> (широта, долгота) или None."""
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+
+class StubGeocoder(Geocoder):
+    """
+    Локальная заглушка: детерминированно раскладывает адреса вокруг точки
+    GEOCODER_STUB_CENTER в пределах GEOCODER_STUB_SPREAD градусов. Известные
+    адреса можно задать явно в GEOCODER_STUB_LOCATIONS.
+    """
+
+    def __init__(self):
+        self.center = getattr(settings, 'GEOCODER_STUB_CENTER', (55.7558, 37.6173))
+        self.spread = getattr(settings, 'GEOCODER_STUB_SPREAD', 0.3)
+        self.locations = getattr(settings, 'GEOCODER_STUB_LOCATIONS', {})
+
+    def geocode(self, address):
+        address = ' '.join((address or '').split())
+        if not address:
+            return None
+        if address in self.locations:
+            return tuple(self.locations[address])
+        digest = hashlib.md5(address.lower().encode('utf-8')).digest()
+        lat_offset = int.from_bytes(digest[:4], 'big') / 0xFFFFFFFF * 2 - 1
+        lng_offset = int.from_bytes(digest[4:8], 'big') / 0xFFFFFFFF * 2 - 1
+        return (
+            round(self.center[0] + lat_offset * self.spread, 6),
+            round(self.center[1] + lng_offset * self.spread, 6),
+        )
+
+
+_geocoder = None
+
+
+def get_geocoder():
+    """Экземпляр геокодера из настройки GEOCODER (создаётся один раз) или None."""
+    global _geocoder
+    path = getattr(settings, 'GEOCODER', None)
+    if _geocoder is None and path:
+        _geocoder = import_string(path)()
+    return _geocoder
+
+
+@receiver(setting_changed)
+def _reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting.startswith('GEOCODER'):
+        _geocoder = None
+
+
+def locate_property(obj):
+    """
+    Заполняет координаты объекта по адресу (если они не заданы и геокодер
+    настроен) и ячейку geo_cell. Ошибки геокодера не мешают сохранению объекта.
+    """
+    geocoder = get_geocoder()
+    if (obj.latitude is None or obj.longitude is None) and obj.address and geocoder is not None:
+        try:
+            coordinates = geocoder.geocode(obj.address)
+        except Exception:
+            logger.exception('Не удалось определить координаты адреса %r', obj.address)
+            coordinates = None
+        if coordinates:
+            obj.latitude, obj.longitude = coordinates
+
+    if obj.latitude is not None and obj.longitude is not None:
+        obj.geo_cell = geohash_encode(obj.latitude, obj.longitude)
+    else:
+        obj.geo_cell = ''
@@ -0,0 +1,104 @@
+"""Уменьшенные варианты фотографий объектов.
+
+Для каждого загруженного изображения создаются копии нескольких размеров
+(миниатюра, карточка, детальная страница) в форматах JPEG и WebP. Варианты
+лежат рядом с оригиналом: ``properties/foo.jpg`` -> ``properties/foo__card.webp``.
+"""
+
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Поля модели Property с фотографиями (остальные фото - галерея PropertyImage)
+IMAGE_FIELDS = ('main_image',)
+
+# Варианты: имя -> максимальная ширина в пикселях
+VARIANTS = {
+    'thumb': 320,
+    'card': 640,
+    'detail': 1280,
+}
+
+# Форматы вариантов: расширение -> (формат Pillow, параметры сохранения)
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+
+def variant_name(name, variant, extension):
+    """Имя файла варианта для оригинала ``name``."""
+    root, _ext = os.path.splitext(name)
+    return f'{root}__{variant}.{extension}'
+
+
+def _open_image(name, storage):
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # JPEG не поддерживает прозрачность - подкладываем белый фон
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(name, storage=None, force=False):
+    """
+    Создаёт все варианты изображения ``name``. Уже существующие варианты
+    пропускаются, если не указан force. Возвращает имена созданных файлов.
+    """
+    storage = storage or default_storage
+    targets = [
+        (variant, width, extension)
+        for variant, width in VARIANTS.items()
+        for extension in FORMATS
+        if force or not storage.exists(variant_name(name, variant, extension))
+    ]
+    if not targets:
+        return []
+
+    original = _open_image(name, storage)
+    # Вариант лежит рядом с оригиналом, а не под именем из хеша (ContentAddressedStorage)
+    save = getattr(storage, 'save_as', storage.save)
+    created = []
+    for variant, width, extension in targets:
+        image = original.copy()
+        # thumbnail() не увеличивает изображение, только уменьшает
+        image.thumbnail((width, width * 4), Image.LANCZOS)
+        buffer = BytesIO()
+        pil_format, options = FORMATS[extension]
+        image.save(buffer, pil_format, **options)
+
+        target = variant_name(name, variant, extension)
+        if storage.exists(target):
+            storage.delete(target)
+        created.append(save(target, ContentFile(buffer.getvalue())))
+    return created
+
+
+def generate_image_variants(images, force=False):
+    """Создаёт варианты для заполненных файлов полей-изображений (FieldFile)."""
+    created = []
+    for image in images:
+        if not image:
+            continue
+        try:
+            created += generate_variants(image.name, storage=image.storage, force=force)
+        except (OSError, ValueError):
+            logger.exception('Не удалось создать варианты изображения %s', image.name)
+    return created
+
+
+def generate_property_variants(property_obj, fields=IMAGE_FIELDS, force=False):
+    """Создаёт варианты для заполненных полей-изображений объекта."""
+    return generate_image_variants([getattr(property_obj, field) for field in fields], force=force)
@@ -0,0 +1,123 @@
+import json
+import secrets
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from realty.benchmarking import run_threaded
+from realty.models import Property
+from realty.pagination import estimate_count
+from realty.querybudget import QueryRecorder
+
+SCENARIOS = (
+    'property_changelist', 'property_changelist_filtered', 'property_changelist_search',
+    'property_change', 'realtor_autocomplete', 'client_autocomplete',
+    'realtor_changelist', 'client_changelist',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц админки (списки объектов, риелторов и клиентов, '
+        'поиск, форма объекта, автодополнение): задержки p50/p95/p99 и SQL-запросов '
+        'на запрос. Запросы выполняются от имени временного суперпользователя. '
+        'Для проверки на больших таблицах: seed_scale --properties 1000000.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=1, help='Потоков с запросами')
+        parser.add_argument('--output', help='Записать JSON в файл вместо вывода')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+        property_obj = Property.objects.select_related('realtor__user', 'client__user').order_by('pk').first()
+        if property_obj is None:
+            raise CommandError('В базе нет объектов - сначала выполните seed_scale')
+        self.property = property_obj
+
+        username = f'bench_admin_{secrets.token_hex(3)}'
+        self.admin = User.objects.create_superuser(username, f'{username}@example.com', secrets.token_hex(8))
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for name in options['scenarios']:
+                    url = self.scenario_url(name)
+                    results.append({'scenario': name, 'url': url, **self.run_scenario(url, options)})
+        finally:
+            self.admin.delete()
+
+        properties = Property.objects.all()
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            # Оценка, как в самой админке: точный COUNT(*) по миллиону строк исказил бы замер
+            'properties': estimate_count(properties) or properties.count(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результат записан в {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def scenario_url(self, name):
+        property_obj = self.property
+        changelist = reverse('admin:realty_property_changelist')
+        if name == 'property_changelist':
+            return changelist
+        if name == 'property_changelist_filtered':
+            return f'{changelist}?{urlencode({"status__exact": "for_sale", "property_type__exact": property_obj.property_type})}'
+        if name == 'property_changelist_search':
+            return f'{changelist}?{urlencode({"q": property_obj.title.split()[0]})}'
+        if name == 'property_change':
+            return reverse('admin:realty_property_change', args=[property_obj.pk])
+        if name in ('realtor_autocomplete', 'client_autocomplete'):
+            field = name.split('_')[0]
+            user = getattr(property_obj, field).user
+            query = {
+                'app_label': 'realty', 'model_name': 'property', 'field_name': field,
+                'term': user.username[:4],
+            }
+            return f'{reverse("admin:autocomplete")}?{urlencode(query)}'
+        return reverse(f'admin:realty_{name.split("_")[0]}_changelist')
+
+    def run_scenario(self, url, options):
+        local = threading.local()
+        query_counts = []
+        statuses = set()
+
+        def request():
+            # Тестовый клиент не потокобезопасен - свой экземпляр в каждом потоке
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(self.admin)
+            with QueryRecorder() as recorder:
+                status = local.client.get(url).status_code
+            query_counts.append(len(recorder))
+            statuses.add(status)
+            return status == 200
+
+        request()  # прогрев
+        query_counts.clear()
+        statuses.clear()
+        summary = run_threaded(request, options['requests'], options['concurrency'])
+        return {
+            **summary,
+            'statuses': sorted(statuses),
+            'queries_avg': round(sum(query_counts) / len(query_counts), 1),
+            'queries_max': max(query_counts),
+        }
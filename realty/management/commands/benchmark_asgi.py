@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from realty.benchmarking import run_concurrent, run_threaded
+from realty.models import Property
+
+# Страница -> (синхронный маршрут, асинхронный маршрут, нужен ли pk объекта)
+PAGES = {
+    'home': ('home', 'async_home', False),
+    'list': ('property_list', 'async_property_list', False),
+    'detail': ('property_detail', 'async_property_detail', True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает синхронные (WSGI) и асинхронные (ASGI) страницы каталога под '
+        'конкурентной нагрузкой: запросов в секунду и задержки p50/p95/p99'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), default=sorted(PAGES))
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на страницу и путь')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных запросов')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Не отключать кеш страниц каталога (по умолчанию измеряется работа с БД)')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        property_pk = Property.objects.order_by('pk').values_list('pk', flat=True).first()
+        if property_pk is None and 'detail' in options['pages']:
+            raise CommandError('В базе нет объектов - сначала заполните каталог')
+
+        # Тестовые клиенты обращаются к хосту testserver
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['page_cache']:
+            overrides['CATALOG_CACHE_TIMEOUT'] = 0
+        results = []
+        with override_settings(**overrides):
+            for page in options['pages']:
+                sync_name, async_name, with_pk = PAGES[page]
+                url_args = [property_pk] if with_pk else []
+                for path, name in (('wsgi', sync_name), ('asgi', async_name)):
+                    url = reverse(name, args=url_args)
+                    runner = self.run_wsgi if path == 'wsgi' else self.run_asgi
+                    summary = runner(url, options)
+                    results.append({'page': page, 'path': path, 'url': url, **summary})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(f'{"страница":<10}{"путь":<6}{"запр/с":>10}{"p50, мс":>10}{"p99, мс":>10}{"ошибки":>8}')
+        for row in results:
+            self.stdout.write(
+                f'{row["page"]:<10}{row["path"]:<6}{row["rps"]:>10}{row["p50_ms"]:>10}{row["p99_ms"]:>10}{row["errors"]:>8}'
+            )
+
+    def run_wsgi(self, url, options):
+        local = threading.local()
+
+        def request():
+            # Тестовый клиент не потокобезопасен - свой экземпляр в каждом потоке
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(url).status_code == 200
+
+        request()  # прогрев
+        return run_threaded(request, options['requests'], options['concurrency'])
+
+    def run_asgi(self, url, options):
+        client = AsyncClient()
+
+        async def request():
+            return (await client.get(url)).status_code == 200
+
+        async def main():
+            await request()  # прогрев
+            return await run_concurrent(request, options['requests'], options['concurrency'])
+
+        return asyncio.run(main())
@@ -0,0 +1,86 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+
+from realty.benchmarking import summarize
+from realty.storage import ContentAddressedStorage
+
+BACKENDS = (
+    ('filesystem', FileSystemStorage),
+    ('content_addressed', ContentAddressedStorage),
+)
+
+
+def disk_usage(root):
+    files = size = 0
+    for directory, _dirs, names in os.walk(root):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(directory, name))
+    return files, size
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает сохранение фотографий в FileSystemStorage (как было) и '
+        'ContentAddressedStorage на синтетическом наборе с большим числом повторов: '
+        'файлов и байт на диске, задержка загрузки p50/p95/p99. Файлы пишутся во '
+        'временный каталог и удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distinct', type=int, default=50, help='Разных фотографий')
+        parser.add_argument('--copies', type=int, default=10, help='Загрузок каждой фотографии')
+        parser.add_argument('--size-kb', type=int, default=500, help='Размер фотографии, КБ')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        if min(options['distinct'], options['copies'], options['size_kb']) < 1:
+            raise CommandError('--distinct, --copies и --size-kb должны быть положительными')
+        rnd = random.Random(options['seed'])
+        # Случайные байты не сжимаются - как уже сжатые JPEG
+        photos = [rnd.randbytes(options['size_kb'] * 1024) for _ in range(options['distinct'])]
+        uploads = [index for index in range(options['distinct']) for _ in range(options['copies'])]
+        rnd.shuffle(uploads)
+
+        results = []
+        for name, backend in BACKENDS:
+            location = tempfile.mkdtemp(prefix=f'bench-{name}-')
+            try:
+                storage = backend(location=location)
+                latencies = []
+                started = time.perf_counter()
+                for number, index in enumerate(uploads):
+                    upload_started = time.perf_counter()
+                    storage.save(f'properties/photo_{number}.jpg', ContentFile(photos[index]))
+                    latencies.append(time.perf_counter() - upload_started)
+                elapsed = time.perf_counter() - started
+                files, size = disk_usage(location)
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+            results.append({'storage': name, 'files': files, 'bytes': size, **summarize(latencies, elapsed)})
+
+        baseline = results[0]['bytes']
+        for row in results:
+            row['saved_percent'] = round(100 * (1 - row['bytes'] / baseline), 1) if baseline else 0.0
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(
+            f'{"хранилище":<19}{"файлов":>8}{"МБ":>9}{"экономия":>10}{"загр/с":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+        )
+        for row in results:
+            self.stdout.write(
+                f'{row["storage"]:<19}{row["files"]:>8}{row["bytes"] / 1024 / 1024:>9.1f}'
+                f'{row["saved_percent"]:>9}%{row["rps"]:>9}{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}'
+            )
@@ -0,0 +1,106 @@
+import json
+import secrets
+import threading
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from realty.benchmarking import run_threaded
+from realty.querybudget import QueryRecorder
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер регистрации клиентов и риелторов (POST формы через '
+        'тестовый клиент): регистраций в секунду, задержки p50/p95/p99, SQL-запросов '
+        'и записей на регистрацию. Созданные пользователи удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kinds', nargs='+', choices=['client', 'realtor'], default=['client', 'realtor'])
+        parser.add_argument('--requests', type=int, default=100, help='Регистраций каждого вида')
+        parser.add_argument('--concurrency', type=int, default=10, help='Потоков с запросами')
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Хешировать пароли MD5, чтобы измерить работу с БД без стоимости PBKDF2')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданных пользователей')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        self.prefix = f'bench_{secrets.token_hex(3)}_'
+        self.numbers = count()
+        self.lock = threading.Lock()
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['fast_hasher']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        results = []
+        try:
+            with override_settings(**overrides):
+                for kind in options['kinds']:
+                    results.append({'kind': kind, **self.run_kind(kind, options)})
+        finally:
+            if not options['keep']:
+                # Профили клиента и риелтора удаляются каскадно
+                User.objects.filter(username__startswith=self.prefix).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(
+            f'{"вид":<9}{"рег/с":>8}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+            f'{"запросов":>10}{"записей":>9}{"ошибки":>8}'
+        )
+        for row in results:
+            self.stdout.write(
+                f'{row["kind"]:<9}{row["rps"]:>8}{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}'
+                f'{row["queries_avg"]:>10}{row["writes_avg"]:>9}{row["errors"]:>8}'
+            )
+
+    def signup_data(self, kind):
+        with self.lock:
+            number = next(self.numbers)
+        username = f'{self.prefix}{number}'
+        password = f'Pw-{secrets.token_hex(8)}'
+        data = {
+            'username': username,
+            'first_name': 'Нагрузочный',
+            'last_name': 'Тест',
+            'phone': f'+7 900 {number:07d}',
+        }
+        if kind == 'client':
+            data.update(user_email=f'{username}@example.com', password=password, password2=password)
+        else:
+            data.update(
+                email=f'{username}@example.com', password1=password, password2=password,
+                license_number=f'{self.prefix}{number}'.upper(),
+            )
+        return data
+
+    def run_kind(self, kind, options):
+        url = reverse('client_signup' if kind == 'client' else 'realtor_signup')
+        query_counts, write_counts = [], []
+
+        def request():
+            # Новый клиент на каждую регистрацию - как новый посетитель без сессии
+            with QueryRecorder() as recorder:
+                response = Client().post(url, self.signup_data(kind))
+            query_counts.append(len(recorder))
+            write_counts.append(sum(1 for sql in recorder.queries if sql.lstrip().upper().startswith(WRITE_PREFIXES)))
+            # Успешная регистрация перенаправляет на главную
+            return response.status_code == 302
+
+        summary = run_threaded(request, options['requests'], options['concurrency'])
+        return {
+            **summary,
+            'queries_avg': round(sum(query_counts) / len(query_counts), 1),
+            'writes_avg': round(sum(write_counts) / len(write_counts), 1),
+        }
@@ -0,0 +1,114 @@
+import json
+import threading
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from realty import urls
+from realty.benchmarking import run_threaded
+from realty.models import Property, PropertyCard, Realtor
+from realty.querybudget import QueryRecorder
+
+# Страницы кабинета риелтора: запрашиваются от имени владельца объекта
+AUTHENTICATED_PAGES = {'realtor_dashboard', 'property_add', 'property_edit', 'property_delete'}
+
+
+def page_names():
+    """Имена маршрутов realty/urls.py в порядке объявления."""
+    return [pattern.name for pattern in urls.urlpatterns if pattern.name]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц из realty/urls.py через тестовый клиент: запросов '
+        'в секунду, задержки p50/p95/p99 и число SQL-запросов на запрос. Результат - '
+        'JSON для сравнения запусков (данные можно создать командой seed_scale).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', metavar='NAME', help='Имена маршрутов (по умолчанию - все)')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на страницу')
+        parser.add_argument('--concurrency', type=int, default=10, help='Потоков с запросами')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Не отключать кеш страниц каталога (по умолчанию измеряется работа с БД)')
+        parser.add_argument('--output', help='Записать JSON в файл вместо вывода')
+
+    def handle(self, *args, **options):
+        names = options['pages'] or page_names()
+        unknown = set(names) - set(page_names())
+        if unknown:
+            raise CommandError(f'Неизвестные страницы: {", ".join(sorted(unknown))}')
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        # Объект с риелтором - для детальных страниц и кабинета его владельца
+        property_obj = Property.objects.select_related('realtor__user').order_by('pk').first()
+        if property_obj is None:
+            raise CommandError('В базе нет объектов - сначала выполните seed_scale')
+        self.property = property_obj
+        self.owner = property_obj.realtor.user
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['page_cache']:
+            overrides['CATALOG_CACHE_TIMEOUT'] = 0
+        results = []
+        with override_settings(**overrides):
+            for name in names:
+                url = reverse(name, args=self.url_args(name))
+                results.append({'page': name, 'url': url, **self.run_page(name, url, options)})
+
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'properties': PropertyCard.objects.count(),
+            'realtors': Realtor.objects.count(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'page_cache': options['page_cache'],
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результат записан в {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def url_args(self, name):
+        pattern = next(pattern for pattern in urls.urlpatterns if pattern.name == name)
+        if '<int:pk>' not in str(pattern.pattern):
+            return []
+        return [self.property.realtor_id if 'realtor' in name else self.property.pk]
+
+    def run_page(self, name, url, options):
+        local = threading.local()
+        query_counts = []
+        statuses = set()
+
+        def request():
+            # Тестовый клиент не потокобезопасен - свой экземпляр в каждом потоке
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                if name in AUTHENTICATED_PAGES:
+                    local.client.force_login(self.owner)
+            with QueryRecorder() as recorder:
+                status = local.client.get(url).status_code
+            query_counts.append(len(recorder))
+            statuses.add(status)
+            return status == 200
+
+        request()  # прогрев
+        query_counts.clear()
+        statuses.clear()
+        summary = run_threaded(request, options['requests'], options['concurrency'])
+        return {
+            **summary,
+            'statuses': sorted(statuses),
+            'queries_avg': round(sum(query_counts) / len(query_counts), 1),
+            'queries_max': max(query_counts),
+        }
@@ -0,0 +1,89 @@
+import os
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from realty.images import IMAGE_FIELDS
+from realty.models import Property, PropertyImage
+from realty.storage import CONTENT_DIR, CONTENT_NAME, property_image_storage
+
+
+def content_hash(filename):
+    """Хеш оригинала по имени файла: <хеш>.jpg и варианты <хеш>__card.webp."""
+    return filename.split('__', 1)[0].split('.', 1)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из хранилища фотографий (ContentAddressedStorage) файлы, на которые '
+        'не ссылается ни один объект или галерея, вместе с их уменьшенными вариантами. Файлы '
+        'моложе --min-age не трогаются: их объект может быть ещё не сохранён.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24, help='Минимальный возраст файла, часов')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError('--min-age не может быть отрицательным')
+        storage = property_image_storage()
+        root = storage.path(CONTENT_DIR)
+        if not os.path.isdir(root):
+            self.stdout.write('Хранилище фотографий пусто')
+            return
+
+        referenced = set()
+        names = PropertyImage.objects.values_list('image', flat=True).iterator()
+        for row in Property.objects.values_list(*IMAGE_FIELDS).iterator():
+            referenced.update(content_hash(os.path.basename(name)) for name in row if name and CONTENT_NAME.match(name))
+        referenced.update(content_hash(os.path.basename(name)) for name in names if CONTENT_NAME.match(name))
+
+        deadline = time.time() - options['min_age'] * 3600
+        self.removed = self.freed = 0
+        candidates = defaultdict(list)
+        for directory, _dirs, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                # Недописанные загрузки (.upload-*) удаляются по возрасту, остальное - без ссылок
+                if filename.startswith('.upload-'):
+                    if os.stat(path).st_mtime <= deadline:
+                        self.remove(storage, path, options['dry_run'])
+                    continue
+                if content_hash(filename) not in referenced:
+                    candidates[content_hash(filename)].append(path)
+
+        for digest, paths in candidates.items():
+            # Оригинал, загруженный повторно во время обхода, получил свежую дату
+            # (ContentAddressedStorage._save) - он и его варианты остаются
+            if any(os.stat(path).st_mtime > deadline for path in paths):
+                continue
+            # Ссылки собраны до обхода: проверяем ещё раз непосредственно перед удалением
+            if self.is_referenced(digest):
+                continue
+            for path in paths:
+                self.remove(storage, path, options['dry_run'])
+
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action} файлов: {self.removed}, {self.freed / 1024 / 1024:.1f} МБ'))
+
+    def remove(self, storage, path, dry_run):
+        self.removed += 1
+        self.freed += os.stat(path).st_size
+        if dry_run:
+            self.stdout.write(os.path.relpath(path, storage.location))
+        else:
+            os.remove(path)
+
+    def is_referenced(self, digest):
+        """Ссылаются ли на файл с хешем digest объект или фотография галереи."""
+        prefix = f'{CONTENT_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+        condition = Q()
+        for field in IMAGE_FIELDS:
+            condition |= Q(**{f'{field}__startswith': prefix})
+        return (
+            Property.objects.filter(condition).exists()
+            or PropertyImage.objects.filter(image__startswith=prefix).exists()
+        )
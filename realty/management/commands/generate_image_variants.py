@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from realty.gallery import gallery_changed
+from realty.images import IMAGE_FIELDS, generate_variants
+from realty.models import Property, PropertyImage
+from realty.storage import property_image_storage
+
+
+def _init_worker():
+    # При запуске процессов через spawn (Windows, macOS) Django нужно настроить заново
+    django.setup()
+
+
+def _generate(args):
+    name, force = args
+    try:
+        return name, len(generate_variants(name, storage=property_image_storage(), force=force)), None
+    except Exception as exc:  # noqa: BLE001 - ошибка одного файла не должна останавливать обработку
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные варианты (JPEG/WebP) для уже загруженных фотографий объектов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Количество процессов (по умолчанию - число ядер; 1 - без пула)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие варианты')
+
+    def handle(self, *args, **options):
+        names = set()
+        for row in Property.objects.values_list(*IMAGE_FIELDS).iterator():
+            names.update(name for name in row if name)
+        names.update(PropertyImage.objects.values_list('image', flat=True).iterator())
+        tasks = [(name, options['force']) for name in sorted(names)]
+
+        started = time.perf_counter()
+        if options['workers'] == 1:
+            results = [_generate(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+                results = list(executor.map(_generate, tasks, chunksize=8))
+
+        created = failed = 0
+        updated = []
+        for name, count, error in results:
+            created += count
+            if count:
+                updated.append(name)
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.touch_properties(updated)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(tasks)}, создано вариантов: {created}, ошибок: {failed}, время: {elapsed:.1f} с'
+        ))
+
+    def touch_properties(self, names, batch_size=500):
+        """
+        Объекты с новыми вариантами фото получают новую дату изменения: кеш
+        карточек (ключ по updated_at) перестаёт отдавать разметку без вариантов.
+        """
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            condition = Q(images__image__in=batch)
+            for field in IMAGE_FIELDS:
+                condition |= Q(**{f'{field}__in': batch})
+            property_ids = list(Property.objects.filter(condition).values_list('pk', flat=True).distinct())
+            if property_ids:
+                gallery_changed(property_ids)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from realty.cache import bump_catalog_version
+from realty.geo import get_geocoder, locate_property
+from realty.models import Property
+from realty.read_model import refresh_property_cards
+
+
+class Command(BaseCommand):
+    help = 'Заполняет координаты (по адресу) и ячейки geohash у объектов, где их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Объектов в одном UPDATE')
+        parser.add_argument('--all', action='store_true', help='Пересчитать ячейки geohash у всех объектов')
+
+    def handle(self, *args, **options):
+        if get_geocoder() is None:
+            self.stderr.write('Геокодер не настроен (GEOCODER): заполняются только ячейки объектов с координатами')
+        queryset = Property.objects.only('pk', 'address', 'latitude', 'longitude', 'geo_cell').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True) | Q(geo_cell=''))
+
+        started = time.perf_counter()
+        total = located = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=options['batch_size']):
+            total += 1
+            locate_property(obj)
+            if obj.geo_cell:
+                located += 1
+            batch.append(obj)
+            if len(batch) >= options['batch_size']:
+                self.save_batch(batch)
+                batch = []
+        if batch:
+            self.save_batch(batch)
+        if total:
+            # bulk_update не отправляет сигналы - сбрасываем кеш каталога вручную
+            bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Объектов: {total}, с координатами: {located}, без координат: {total - located}, время: {elapsed:.1f} с'
+        ))
+
+    def save_batch(self, batch):
+        Property.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+        refresh_property_cards([obj.pk for obj in batch])
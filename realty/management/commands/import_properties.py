@@ -0,0 +1,186 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from realty.cache import bump_catalog_version
+from realty.forms import PropertyImportForm
+from realty.geo import locate_property
+from realty.models import Client, Property, Realtor
+from realty.portfolio import rebuild_summaries
+from realty.read_model import refresh_property_cards
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {key.strip(): (value or '').strip() for key, value in row.items() if key}
+
+
+class InvalidRow:
+    """Строка, которую не удалось разобрать, - попадает в отчёт об ошибках."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield InvalidRow(f'некорректный JSON: {exc}')
+            continue
+        if not isinstance(row, dict):
+            yield InvalidRow('ожидается JSON-объект с полями объекта')
+            continue
+        yield row
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовый импорт объектов из CSV или JSONL. Столбцы - поля PropertyForm '
+        '(включая необязательные latitude/longitude), '
+        'плюс realtor (номер лицензии) и необязательный client (имя пользователя клиента; '
+        'по умолчанию - клиентский профиль самого риелтора).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для импорта или "-" для stdin')
+        parser.add_argument('--format', choices=sorted(READERS), help='Формат (по умолчанию - по расширению файла)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError('Укажите --format: csv или jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        self.total = self.imported = self.failed = 0
+        self.realtor_ids = set()
+        started = time.perf_counter()
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            rows = enumerate(READERS[file_format](stream), start=1)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+        except csv.Error as exc:
+            raise CommandError(f'Ошибка чтения после строки {self.total}: {exc}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if self.imported:
+            # bulk_create не отправляет сигналы post_save - сбрасываем кеш каталога
+            # и пересчитываем сводки затронутых риелторов вручную
+            bump_catalog_version()
+            rebuild_summaries(self.realtor_ids)
+
+        elapsed = time.perf_counter() - started
+        rate = self.total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк: {self.total}, импортировано: {self.imported}, с ошибками: {self.failed}, '
+            f'время: {elapsed:.1f} с ({rate:.0f} строк/с)'
+        ))
+
+    def report_error(self, line, message):
+        self.failed += 1
+        self.stderr.write(f'Строка {line}: {message}')
+
+    def resolve_references(self, batch):
+        """Риелторы и клиенты для всей пачки - по одному запросу на модель."""
+        licenses = {str(row.get('realtor') or '').strip() for _line, row in batch}
+        realtors = {
+            realtor.license_number: realtor
+            for realtor in Realtor.objects.filter(license_number__in=licenses)
+        }
+
+        usernames = {str(row.get('client') or '').strip() for _line, row in batch} - {''}
+        clients_by_username = {
+            client.user.username: client
+            for client in Client.objects.filter(user__username__in=usernames).select_related('user')
+        }
+
+        # Клиентский профиль риелтора, как в property_add; недостающие создаются
+        realtor_user_ids = {realtor.user_id for realtor in realtors.values()}
+        clients_by_user = {
+            client.user_id: client
+            for client in Client.objects.filter(user_id__in=realtor_user_ids)
+        }
+        missing = [
+            Client(user_id=realtor.user_id, phone=realtor.phone, address='Не указан')
+            for realtor in realtors.values()
+            if realtor.user_id not in clients_by_user
+        ]
+        if missing:
+            Client.objects.bulk_create(missing, ignore_conflicts=True)
+            clients_by_user.update(
+                (client.user_id, client)
+                for client in Client.objects.filter(user_id__in=[client.user_id for client in missing])
+            )
+        return realtors, clients_by_username, clients_by_user
+
+    def import_batch(self, batch):
+        self.total += len(batch)
+        invalid = [(line, row) for line, row in batch if isinstance(row, InvalidRow)]
+        for line, row in invalid:
+            self.report_error(line, row.message)
+        if invalid:
+            batch = [(line, row) for line, row in batch if not isinstance(row, InvalidRow)]
+        realtors, clients_by_username, clients_by_user = self.resolve_references(batch)
+
+        objects, lines = [], []
+        for line, row in batch:
+            realtor = realtors.get(str(row.get('realtor') or '').strip())
+            if realtor is None:
+                self.report_error(line, f'риелтор с лицензией "{row.get("realtor")}" не найден')
+                continue
+
+            username = str(row.get('client') or '').strip()
+            client = clients_by_username.get(username) if username else clients_by_user.get(realtor.user_id)
+            if client is None:
+                self.report_error(line, f'клиент "{username}" не найден')
+                continue
+
+            form = PropertyImportForm(data=row)
+            if not form.is_valid():
+                errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+                self.report_error(line, errors)
+                continue
+
+            instance = form.save(commit=False)
+            instance.realtor = realtor
+            instance.client = client
+            # bulk_create не вызывает pre_save - координаты и ячейка geohash заполняются здесь
+            locate_property(instance)
+            objects.append(instance)
+            lines.append(line)
+
+        if not objects:
+            return
+        try:
+            with transaction.atomic():
+                Property.objects.bulk_create(objects)
+        except DatabaseError as exc:
+            for line in lines:
+                self.report_error(line, f'ошибка записи пачки: {exc}')
+            return
+        # Карточки каталога (сигналы post_save при bulk_create не отправляются)
+        refresh_property_cards([obj.pk for obj in objects])
+        self.imported += len(objects)
+        self.realtor_ids.update(obj.realtor_id for obj in objects)
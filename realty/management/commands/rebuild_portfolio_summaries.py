@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from realty.portfolio import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки риелторов (RealtorPortfolioSummary) по данным объектов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('realtor_ids', nargs='*', type=int, help='ID риелторов (по умолчанию - все)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        summaries = rebuild_summaries(options['realtor_ids'] or None)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано сводок: {len(summaries)}, время: {elapsed:.1f} с'))
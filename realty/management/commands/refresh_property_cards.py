@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from realty.cache import bump_catalog_version
+from realty.read_model import refresh_property_cards
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает денормализованные карточки объектов (PropertyCard)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('property_ids', nargs='*', type=int, help='ID объектов (по умолчанию - все)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Карточек в одном UPSERT')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = refresh_property_cards(options['property_ids'] or None, batch_size=options['batch_size'])
+        bump_catalog_version()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Карточек: {total}, время: {elapsed:.1f} с'))
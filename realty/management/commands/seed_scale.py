@@ -0,0 +1,142 @@
+import random
+import secrets
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from realty.cache import bump_catalog_version
+from realty.geo import geohash_encode
+from realty.models import Client, Property, Realtor
+from realty.portfolio import rebuild_summaries
+from realty.read_model import refresh_property_cards
+
+FIRST_NAMES = ['Анна', 'Иван', 'Мария', 'Пётр', 'Елена', 'Сергей', 'Ольга', 'Дмитрий', 'Наталья', 'Алексей']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов']
+STREETS = ['Ленина', 'Мира', 'Садовая', 'Лесная', 'Школьная', 'Набережная', 'Советская', 'Молодёжная', 'Полевая']
+TITLE_WORDS = ['Уютная', 'Светлая', 'Просторная', 'Новая', 'Тихая', 'Современная']
+
+# Тип объекта -> (название, диапазон площади, цена за м²)
+PROPERTY_PROFILES = {
+    'apartment': ('квартира', (25, 120), (150_000, 400_000)),
+    'house': ('дом', (80, 400), (60_000, 200_000)),
+    'commercial': ('помещение', (40, 1000), (80_000, 300_000)),
+    'land': ('участок', (300, 5000), (1_000, 20_000)),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими риелторами, клиентами и объектами для нагрузочных '
+        'замеров. Записи вставляются через bulk_create; у всех пользователей один '
+        'пароль, хешируемый один раз.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--realtors', type=int, default=100)
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--properties', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Объектов в одной транзакции')
+        parser.add_argument('--password', default='seed-password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--seed', type=int, help='Начальное значение генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        if options['realtors'] < 1 or options['clients'] < 0 or options['properties'] < 0:
+            raise CommandError('Нужен хотя бы один риелтор, остальные количества - неотрицательные')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        self.random = random.Random(options['seed'])
+        # Метка запуска делает имена пользователей и лицензии уникальными при повторных запусках
+        self.token = secrets.token_hex(3)
+        self.password = make_password(options['password'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            realtors = self.create_realtors(options['realtors'], batch_size)
+            # Собственный клиентский профиль риелтора, как при импорте объектов
+            clients = self.create_clients([realtor.user for realtor in realtors], batch_size)
+            clients += self.create_clients(self.create_users('c', options['clients'], batch_size), batch_size)
+
+        created = 0
+        while created < options['properties']:
+            count = min(batch_size, options['properties'] - created)
+            with transaction.atomic():
+                properties = Property.objects.bulk_create(
+                    [self.build_property(realtors, clients) for _ in range(count)], batch_size=batch_size,
+                )
+                refresh_property_cards([obj.pk for obj in properties], batch_size=batch_size)
+            created += count
+
+        # bulk_create не отправляет сигналы - сводки и кеш каталога обновляются вручную
+        rebuild_summaries([realtor.pk for realtor in realtors])
+        bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Риелторов: {len(realtors)}, клиентов: {len(clients)}, объектов: {created}, '
+            f'время {elapsed:.1f} с ({created / elapsed if elapsed else 0:.0f} объектов/с). '
+            f'Имена пользователей: seed_{self.token}_*'
+        ))
+
+    def create_users(self, kind, count, batch_size):
+        users = []
+        for index in range(count):
+            users.append(User(
+                username=f'seed_{self.token}_{kind}{index}',
+                email=f'seed_{self.token}_{kind}{index}@example.com',
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                password=self.password,
+            ))
+        return User.objects.bulk_create(users, batch_size=batch_size)
+
+    def create_realtors(self, count, batch_size):
+        users = self.create_users('r', count, batch_size)
+        realtors = [
+            Realtor(
+                user=user,
+                license_number=f'SEED-{self.token}-{index}',
+                phone=f'+7 900 {index:07d}',
+                experience_years=self.random.randint(0, 30),
+                bio='Синтетический риелтор для нагрузочных замеров.',
+            )
+            for index, user in enumerate(users)
+        ]
+        return Realtor.objects.bulk_create(realtors, batch_size=batch_size)
+
+    def create_clients(self, users, batch_size):
+        clients = [Client(user=user, phone=f'+7 901 {user.pk:07d}') for user in users]
+        return Client.objects.bulk_create(clients, batch_size=batch_size)
+
+    def build_property(self, realtors, clients):
+        rnd = self.random
+        property_type = rnd.choice(list(PROPERTY_PROFILES))
+        noun, area_range, price_range = PROPERTY_PROFILES[property_type]
+        area = Decimal(rnd.randint(*area_range))
+        center_lat, center_lng = getattr(settings, 'GEOCODER_STUB_CENTER', (55.7558, 37.6173))
+        spread = getattr(settings, 'GEOCODER_STUB_SPREAD', 0.3)
+        latitude = center_lat + rnd.uniform(-spread, spread)
+        longitude = center_lng + rnd.uniform(-spread, spread)
+        return Property(
+            title=f'{rnd.choice(TITLE_WORDS)} {noun}, {area} м²',
+            description=f'Синтетический объект: {noun} площадью {area} м².',
+            property_type=property_type,
+            status=rnd.choices(['for_sale', 'for_rent', 'sold', 'rented'], weights=[5, 3, 1, 1])[0],
+            address=f'ул. {rnd.choice(STREETS)}, д. {rnd.randint(1, 200)}',
+            price=area * rnd.randint(*price_range),
+            area=area,
+            bedrooms=rnd.randint(0, 5) if property_type in ('apartment', 'house') else 0,
+            bathrooms=rnd.randint(1, 3) if property_type in ('apartment', 'house') else 0,
+            realtor=rnd.choice(realtors),
+            client=rnd.choice(clients),
+            is_featured=rnd.random() < 0.02,
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=geohash_encode(latitude, longitude),
+        )
@@ -0,0 +1,170 @@
+"""Промежуточные слои (middleware) приложения realty."""
+
+import logging
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .fileserving import find_file, serve_file
+from .profiles import get_request_profile
+from .routers import routing_context
+from .timing import RequestProfiler, should_profile, timing_context
+
+timing_logger = logging.getLogger('realty.timing')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Включает чтение с реплик для запроса (см. realty/routers.py) и закрепляет
+    посетителя за основной БД на PRIMARY_STICKY_SECONDS после его записи.
+    """
+
+    cookie_name = 'realty_primary'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _pinned(self, request):
+        return request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES
+
+    def _process_response(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=getattr(settings, 'PRIMARY_STICKY_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_context(self._pinned(request)) as state:
+            response = self.get_response(request)
+        return self._process_response(state, response)
+
+    async def __acall__(self, request):
+        with routing_context(self._pinned(request)) as state:
+            response = await self.get_response(request)
+        return self._process_response(state, response)
+
+
+class ProfileMiddleware:
+    """
+    Добавляет request.profile - роль и id профилей пользователя, определяемые
+    при первом обращении (см. realty/profiles.py). Должен стоять после
+    SessionMiddleware и AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_request_profile(request))
+        # В асинхронном режиме возвращается корутина get_response - её ожидает вызывающий
+        return self.get_response(request)
+
+
+class ServerTimingMiddleware:
+    """
+    Время SQL (и число запросов), отрисовки шаблонов, остального Python и
+    всего запроса - в заголовке Server-Timing и в журнале realty.timing
+    (поля записи в extra). Выборочно сохраняет профиль запроса, см.
+    realty/timing.py. Должен стоять первым в MIDDLEWARE.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _enabled(self):
+        return getattr(settings, 'SERVER_TIMING_ENABLED', False)
+
+    def _profiler(self, request):
+        return RequestProfiler(request) if should_profile() else nullcontext()
+
+    def _process_response(self, request, response, timings, profiler):
+        metrics = timings.metrics()
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = timings.header()
+        profiles = [str(path) for path in getattr(profiler, 'paths', [])]
+        timing_logger.info(
+            '%s %s %s: %s мс (SQL %s мс, запросов %s; шаблоны %s мс; Python %s мс)',
+            request.method, request.path, response.status_code, metrics['total_ms'],
+            metrics['db_ms'], metrics['queries'], metrics['template_ms'], metrics['app_ms'],
+            extra={
+                'method': request.method, 'path': request.path, 'status': response.status_code,
+                **metrics, 'profiles': profiles,
+            },
+        )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._enabled():
+            return self.get_response(request)
+        with timing_context() as timings, self._profiler(request) as profiler:
+            response = self.get_response(request)
+        return self._process_response(request, response, timings, profiler)
+
+    async def __acall__(self, request):
+        if not self._enabled():
+            return await self.get_response(request)
+        with timing_context() as timings, self._profiler(request) as profiler:
+            response = await self.get_response(request)
+        return self._process_response(request, response, timings, profiler)
+
+
+class StaticMediaMiddleware:
+    """
+    Отдаёт файлы из STATIC_ROOT и MEDIA_ROOT с заголовками кеширования,
+    ETag, сжатыми вариантами и Range (см. realty/fileserving.py). Ставится
+    сразу после SecurityMiddleware: запросы к файлам не загружают сессию и
+    пользователя. Отключается настройкой SERVE_STATIC_MEDIA = False, если
+    файлы отдаёт веб-сервер или CDN.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _find(self, request):
+        if not getattr(settings, 'SERVE_STATIC_MEDIA', True):
+            return None
+        return find_file(request.path_info)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        found = self._find(request)
+        if found is None:
+            return self.get_response(request)
+        return serve_file(request, *found)
+
+    async def __acall__(self, request):
+        found = await sync_to_async(self._find)(request)
+        if found is None:
+            return await self.get_response(request)
+        return await sync_to_async(serve_file)(request, *found)
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:52
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# GIN-индекс и триггер существуют только на PostgreSQL; на SQLite столбец
+# остаётся пустым и поиск идёт по вхождению подстроки (см. realty/search.py).
+CREATE_SEARCH_SQL = """
+CREATE INDEX realty_property_search_vector_gin
+    ON realty_property USING GIN (search_vector);
+
+CREATE FUNCTION realty_property_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.address, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER realty_property_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, address, description, search_vector
+    ON realty_property
+    FOR EACH ROW EXECUTE FUNCTION realty_property_search_vector_update();
+
+UPDATE realty_property SET title = title;
+"""
+
+DROP_SEARCH_SQL = """
+DROP TRIGGER IF EXISTS realty_property_search_vector_trigger ON realty_property;
+DROP FUNCTION IF EXISTS realty_property_search_vector_update();
+DROP INDEX IF EXISTS realty_property_search_vector_gin;
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='main_image',
+            field=models.ImageField(blank=True, null=True, upload_to='properties/main/', verbose_name='Главное изображение'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
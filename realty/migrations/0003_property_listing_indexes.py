@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0002_property_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['created_at', 'id'], name='property_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['price', 'id'], name='property_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='property_st_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['status', 'price', 'id'], name='property_st_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'created_at', 'id'], name='property_tp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'price', 'id'], name='property_tp_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'status', 'created_at', 'id'], name='property_tp_st_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'status', 'price', 'id'], name='property_tp_st_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at'], name='property_featured_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0003_property_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=12, verbose_name='Ячейка geohash'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Долгота'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['geo_cell'], name='property_geo_cell_idx'),
+        ),
+    ]
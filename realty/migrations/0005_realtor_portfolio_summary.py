@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0004_property_geo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealtorPortfolioSummary',
+            fields=[
+                ('realtor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='portfolio_summary', serialize=False, to='realty.realtor', verbose_name='Риелтор')),
+                ('listing_count', models.IntegerField(default=0, verbose_name='Всего объектов')),
+                ('for_sale_count', models.IntegerField(default=0, verbose_name='Продажа')),
+                ('for_rent_count', models.IntegerField(default=0, verbose_name='Аренда')),
+                ('sold_count', models.IntegerField(default=0, verbose_name='Продано')),
+                ('rented_count', models.IntegerField(default=0, verbose_name='Сдано в аренду')),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Суммарная цена')),
+                ('total_area', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Суммарная площадь (м²)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Сводка риелтора',
+                'verbose_name_plural': 'Сводки риелторов',
+            },
+        ),
+    ]
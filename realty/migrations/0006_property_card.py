@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Копия полей из realty/read_model.py на момент миграции
+PROPERTY_FIELDS = (
+    'title', 'description', 'property_type', 'status', 'address', 'price', 'area',
+    'bedrooms', 'bathrooms', 'main_image', 'image1', 'image2', 'image3', 'is_featured',
+    'created_at', 'updated_at', 'latitude', 'longitude', 'geo_cell', 'search_vector',
+)
+
+
+def fill_cards(apps, schema_editor):
+    Property = apps.get_model('realty', 'Property')
+    PropertyCard = apps.get_model('realty', 'PropertyCard')
+    db = schema_editor.connection.alias
+    batch = []
+    for obj in Property.objects.using(db).select_related('realtor__user').order_by('pk').iterator(chunk_size=1000):
+        values = {name: getattr(obj, name) for name in PROPERTY_FIELDS}
+        for name in ('main_image', 'image1', 'image2', 'image3'):
+            values[name] = values[name].name or None
+        user = obj.realtor.user
+        batch.append(PropertyCard(
+            property_id=obj.pk, **values,
+            realtor_id=obj.realtor_id,
+            realtor_name=f'{user.first_name} {user.last_name}'.strip(),
+            realtor_email=user.email,
+            realtor_phone=obj.realtor.phone,
+            realtor_license_number=obj.realtor.license_number,
+            realtor_experience_years=obj.realtor.experience_years,
+            realtor_bio=obj.realtor.bio,
+            realtor_photo=obj.realtor.photo.name or None,
+        ))
+        if len(batch) >= 1000:
+            PropertyCard.objects.using(db).bulk_create(batch)
+            batch = []
+    PropertyCard.objects.using(db).bulk_create(batch)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX realty_propertycard_search_vector_gin ON realty_propertycard USING GIN (search_vector);'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS realty_propertycard_search_vector_gin;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0005_realtor_portfolio_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyCard',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='realty.property', verbose_name='Объект')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('description', models.TextField(verbose_name='Описание')),
+                ('property_type', models.CharField(choices=[('apartment', 'Квартира'), ('house', 'Дом'), ('commercial', 'Коммерческая недвижимость'), ('land', 'Земельный участок')], max_length=20, verbose_name='Тип недвижимости')),
+                ('status', models.CharField(choices=[('for_sale', 'Продажа'), ('for_rent', 'Аренда'), ('sold', 'Продано'), ('rented', 'Сдано в аренду')], max_length=20, verbose_name='Статус')),
+                ('address', models.TextField(verbose_name='Адрес')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('area', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Площадь (м²)')),
+                ('bedrooms', models.IntegerField(verbose_name='Количество спален')),
+                ('bathrooms', models.IntegerField(verbose_name='Количество ванных комнат')),
+                ('main_image', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Главное изображение')),
+                ('image1', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Изображение 1')),
+                ('image2', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Изображение 2')),
+                ('image3', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Изображение 3')),
+                ('is_featured', models.BooleanField(verbose_name='Рекомендуемый')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('latitude', models.FloatField(null=True, verbose_name='Широта')),
+                ('longitude', models.FloatField(null=True, verbose_name='Долгота')),
+                ('geo_cell', models.CharField(blank=True, max_length=12, verbose_name='Ячейка geohash')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('realtor_id', models.IntegerField(db_index=True, verbose_name='ID риелтора')),
+                ('realtor_name', models.CharField(max_length=301, verbose_name='Имя риелтора')),
+                ('realtor_email', models.EmailField(blank=True, max_length=254, verbose_name='Email риелтора')),
+                ('realtor_phone', models.CharField(max_length=20, verbose_name='Телефон риелтора')),
+                ('realtor_license_number', models.CharField(max_length=50, verbose_name='Номер лицензии')),
+                ('realtor_experience_years', models.IntegerField(verbose_name='Опыт работы (лет)')),
+                ('realtor_bio', models.TextField(blank=True, verbose_name='О риелторе')),
+                ('realtor_photo', models.ImageField(blank=True, null=True, upload_to='', verbose_name='Фотография риелтора')),
+            ],
+            options={
+                'verbose_name': 'Карточка объекта',
+                'verbose_name_plural': 'Карточки объектов',
+                'indexes': [models.Index(fields=['created_at', 'property'], name='card_created_idx'), models.Index(fields=['price', 'property'], name='card_price_idx'), models.Index(fields=['status', 'created_at', 'property'], name='card_st_created_idx'), models.Index(fields=['status', 'price', 'property'], name='card_st_price_idx'), models.Index(fields=['property_type', 'created_at', 'property'], name='card_tp_created_idx'), models.Index(fields=['property_type', 'price', 'property'], name='card_tp_price_idx'), models.Index(fields=['property_type', 'status', 'created_at', 'property'], name='card_tp_st_created_idx'), models.Index(fields=['property_type', 'status', 'price', 'property'], name='card_tp_st_price_idx'), models.Index(fields=['geo_cell'], name='card_geo_cell_idx'), models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at'], name='card_featured_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
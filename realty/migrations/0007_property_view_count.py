@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0006_property_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+        migrations.AddField(
+            model_name='propertycard',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Просмотры'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['view_count', 'id'], name='property_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertycard',
+            index=models.Index(fields=['view_count', 'property'], name='card_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertycard',
+            index=models.Index(fields=['status', 'view_count', 'property'], name='card_st_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertycard',
+            index=models.Index(fields=['property_type', 'view_count', 'property'], name='card_tp_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertycard',
+            index=models.Index(fields=['property_type', 'status', 'view_count', 'property'], name='card_tp_st_views_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Регистрация проверяет, что имя пользователя и email свободны, без учёта
+# регистра (username__iexact, email__iexact). На PostgreSQL такие условия
+# имеют вид UPPER("auth_user"."email"::text) = UPPER(%s) и без индекса по
+# выражению читают всю таблицу пользователей. На SQLite iexact выполняется
+# через LIKE, и индексы по выражению не применяются.
+CREATE_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS realty_auth_user_username_upper ON auth_user (UPPER(username::text));
+CREATE INDEX IF NOT EXISTS realty_auth_user_email_upper ON auth_user (UPPER(email::text));
+"""
+
+DROP_INDEXES_SQL = """
+DROP INDEX IF EXISTS realty_auth_user_username_upper;
+DROP INDEX IF EXISTS realty_auth_user_email_upper;
+"""
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEXES_SQL)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEXES_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('realty', '0007_property_view_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
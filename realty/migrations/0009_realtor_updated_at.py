@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_realtor_updated_at(apps, schema_editor):
+    Realtor = apps.get_model('realty', 'Realtor')
+    PropertyCard = apps.get_model('realty', 'PropertyCard')
+    db = schema_editor.connection.alias
+    for realtor_id, updated_at in Realtor.objects.using(db).values_list('pk', 'updated_at').iterator():
+        PropertyCard.objects.using(db).filter(realtor_id=realtor_id).update(realtor_updated_at=updated_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0008_user_signup_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='realtor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='propertycard',
+            name='realtor_updated_at',
+            field=models.DateTimeField(null=True, verbose_name='Дата обновления риелтора'),
+        ),
+        migrations.RunPython(copy_realtor_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Поиск в админке по началу строки (search_fields с '^') - это условия вида
+# UPPER("auth_user"."username"::text) LIKE UPPER('иван%'). Индексы из 0008
+# (обычный класс операторов) для LIKE не подходят при локали базы, отличной
+# от C, поэтому нужны индексы по тем же выражениям с text_pattern_ops.
+# Только PostgreSQL, как и в 0008.
+CREATE_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS realty_auth_user_username_prefix ON auth_user (UPPER(username::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS realty_auth_user_first_name_prefix ON auth_user (UPPER(first_name::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS realty_auth_user_last_name_prefix ON auth_user (UPPER(last_name::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS realty_realtor_license_prefix ON realty_realtor (UPPER(license_number::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS realty_client_phone_prefix ON realty_client (UPPER(phone::text) text_pattern_ops);
+"""
+
+DROP_INDEXES_SQL = """
+DROP INDEX IF EXISTS realty_auth_user_username_prefix;
+DROP INDEX IF EXISTS realty_auth_user_first_name_prefix;
+DROP INDEX IF EXISTS realty_auth_user_last_name_prefix;
+DROP INDEX IF EXISTS realty_realtor_license_prefix;
+DROP INDEX IF EXISTS realty_client_phone_prefix;
+"""
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEXES_SQL)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEXES_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('realty', '0009_realtor_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:03
+
+import realty.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0010_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='property',
+            name='image1',
+            field=models.ImageField(blank=True, null=True, storage=realty.storage.property_image_storage, upload_to='properties/', verbose_name='Изображение 1'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='image2',
+            field=models.ImageField(blank=True, null=True, storage=realty.storage.property_image_storage, upload_to='properties/', verbose_name='Изображение 2'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='image3',
+            field=models.ImageField(blank=True, null=True, storage=realty.storage.property_image_storage, upload_to='properties/', verbose_name='Изображение 3'),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='main_image',
+            field=models.ImageField(blank=True, null=True, storage=realty.storage.property_image_storage, upload_to='properties/main/', verbose_name='Главное изображение'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:07
+
+import django.db.models.deletion
+import realty.storage
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery
+
+GALLERY_FIELDS = ('image1', 'image2', 'image3')
+
+
+def move_images_to_gallery(apps, schema_editor):
+    """image1-image3 -> PropertyImage (position 0-2); обложка карточек без главного фото."""
+    Property = apps.get_model('realty', 'Property')
+    PropertyImage = apps.get_model('realty', 'PropertyImage')
+    PropertyCard = apps.get_model('realty', 'PropertyCard')
+    db = schema_editor.connection.alias
+
+    has_images = Q()
+    for name in GALLERY_FIELDS:
+        has_images |= Q(**{f'{name}__gt': ''})
+    rows = Property.objects.using(db).filter(has_images).values_list('pk', *GALLERY_FIELDS).order_by('pk')
+    batch = []
+    for pk, *names in rows.iterator(chunk_size=2000):
+        batch.extend(
+            PropertyImage(property_id=pk, image=name, position=position)
+            for position, name in enumerate(name for name in names if name)
+        )
+        if len(batch) >= 2000:
+            PropertyImage.objects.using(db).bulk_create(batch)
+            batch = []
+    if batch:
+        PropertyImage.objects.using(db).bulk_create(batch)
+
+    first_image = PropertyImage.objects.filter(property_id=OuterRef('pk')).order_by('position', 'pk').values('image')[:1]
+    PropertyCard.objects.using(db).filter(Q(main_image__isnull=True) | Q(main_image='')).update(
+        main_image=Subquery(first_image),
+    )
+
+
+def move_gallery_to_images(apps, schema_editor):
+    """Обратно: первые три фотографии галереи - в image1-image3."""
+    Property = apps.get_model('realty', 'Property')
+    PropertyImage = apps.get_model('realty', 'PropertyImage')
+    PropertyCard = apps.get_model('realty', 'PropertyCard')
+    db = schema_editor.connection.alias
+
+    gallery = {}
+    rows = PropertyImage.objects.using(db).order_by('property_id', 'position', 'pk').values_list('property_id', 'image')
+    for property_id, name in rows:
+        gallery.setdefault(property_id, []).append(name)
+    for property_id, names in gallery.items():
+        values = dict(zip(GALLERY_FIELDS, names))
+        Property.objects.using(db).filter(pk=property_id).update(**values)
+        PropertyCard.objects.using(db).filter(pk=property_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0011_property_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(storage=realty.storage.property_image_storage, upload_to='properties/', verbose_name='Изображение')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Порядок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='realty.property', verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Фотография объекта',
+                'verbose_name_plural': 'Фотографии объектов',
+                'ordering': ['position', 'pk'],
+                'indexes': [models.Index(fields=['property', 'position', 'id'], name='property_image_pos_idx')],
+            },
+        ),
+        migrations.RunPython(move_images_to_gallery, move_gallery_to_images),
+        migrations.RemoveField(
+            model_name='property',
+            name='image1',
+        ),
+        migrations.RemoveField(
+            model_name='property',
+            name='image2',
+        ),
+        migrations.RemoveField(
+            model_name='property',
+            name='image3',
+        ),
+        migrations.RemoveField(
+            model_name='propertycard',
+            name='image1',
+        ),
+        migrations.RemoveField(
+            model_name='propertycard',
+            name='image2',
+        ),
+        migrations.RemoveField(
+            model_name='propertycard',
+            name='image3',
+        ),
+        migrations.AlterField(
+            model_name='propertycard',
+            name='main_image',
+            field=models.ImageField(blank=True, null=True, storage=realty.storage.property_image_storage, upload_to='', verbose_name='Обложка'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realty', '0012_property_gallery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertycard',
+            name='realtor_id',
+            field=models.BigIntegerField(db_index=True, verbose_name='ID риелтора'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Поиск пользователей в админке (и автодополнение пользователя в профилях
+# клиента и риелтора) - по началу username, email, имени и фамилии. Для
+# username, first_name и last_name индексы с text_pattern_ops созданы в 0010,
+# здесь - для email. Только PostgreSQL, как и в 0008 и 0010.
+CREATE_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS realty_auth_user_email_prefix ON auth_user (UPPER(email::text) text_pattern_ops);
+"""
+
+DROP_INDEXES_SQL = """
+DROP INDEX IF EXISTS realty_auth_user_email_prefix;
+"""
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEXES_SQL)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEXES_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('realty', '0013_propertycard_realtor_id_bigint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import DatabaseError, models, router, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+from .storage import property_image_storage
 
 class Client(models.Model):
     """Модель клиента"""
@@ -24,6 +30,7 @@ class Realtor(models.Model):
     bio = models.TextField(verbose_name="О себе", blank=True)
     photo = models.ImageField(upload_to='realtors/', verbose_name="Фотография", blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     class Meta:
         verbose_name = "Риелтор"
@@ -66,20 +73,224 @@ class Property(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='properties', verbose_name="Клиент")
     
     # Изображения
-    main_image = models.ImageField(upload_to='properties/main/', verbose_name="Главное изображение", blank=True, null=True)
-    image1 = models.ImageField(upload_to='properties/', verbose_name="Изображение 1", blank=True, null=True)
-    image2 = models.ImageField(upload_to='properties/', verbose_name="Изображение 2", blank=True, null=True)
-    image3 = models.ImageField(upload_to='properties/', verbose_name="Изображение 3", blank=True, null=True)
+    main_image = models.ImageField(upload_to='properties/main/', storage=property_image_storage, verbose_name="Главное изображение", blank=True, null=True)
     
     # Дополнительные поля
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     is_featured = models.BooleanField(default=False, verbose_name="Рекомендуемый")
+    # Увеличивается пачками через F() из буфера просмотров, см. realty/view_counts.py
+    view_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Просмотры")
+    
+    # Координаты (заполняются геокодером по адресу, если не указаны) и ячейка
+    # geohash для поиска по расстоянию, см. realty/geo.py
+    latitude = models.FloatField(
+        null=True, blank=True, verbose_name="Широта",
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, verbose_name="Долгота",
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    geo_cell = models.CharField(max_length=12, blank=True, editable=False, verbose_name="Ячейка geohash")
+    
+    # Поисковый вектор (title, address, description). На PostgreSQL заполняется
+    # триггером и индексируется GIN-индексом, см. миграцию 0002.
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         verbose_name = "Объект недвижимости"
         verbose_name_plural = "Объекты недвижимости"
         ordering = ['-created_at']
+        # Индексы под фильтры и сортировки каталога (PropertyListView.SORT_ORDERINGS):
+        # равенство по фильтрам, затем поле сортировки и pk для keyset-пагинации.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='property_created_idx'),
+            models.Index(fields=['price', 'id'], name='property_price_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='property_st_created_idx'),
+            models.Index(fields=['status', 'price', 'id'], name='property_st_price_idx'),
+            models.Index(fields=['property_type', 'created_at', 'id'], name='property_tp_created_idx'),
+            models.Index(fields=['property_type', 'price', 'id'], name='property_tp_price_idx'),
+            models.Index(fields=['property_type', 'status', 'created_at', 'id'], name='property_tp_st_created_idx'),
+            models.Index(fields=['property_type', 'status', 'price', 'id'], name='property_tp_st_price_idx'),
+            models.Index(fields=['view_count', 'id'], name='property_views_idx'),
+            # Поиск по расстоянию: диапазоны префиксов geohash
+            models.Index(fields=['geo_cell'], name='property_geo_cell_idx'),
+            # Рекомендуемые объекты на главной странице
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_featured=True), name='property_featured_idx',
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.title} - {self.get_property_type_display()} - {self.price}"
\ No newline at end of file
+        return f"{self.title} - {self.get_property_type_display()} - {self.price}"
+
+    # Поля, которые обычный save() не перезаписывает значением, прочитанным при
+    # загрузке объекта: счётчик просмотров меняет только сброс буфера просмотров
+    COUNTER_FIELDS = ('view_count',)
+
+    def save(self, *args, **kwargs):
+        if (
+            self.pk is None or self._state.adding
+            or kwargs.get('force_insert') or kwargs.get('update_fields') is not None
+        ):
+            return super().save(*args, **kwargs)
+
+        # UPDATE всех загруженных полей, кроме счётчиков (отложенные поля Django
+        # при save() тоже не записывает)
+        deferred = self.get_deferred_fields()
+        update_fields = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+        ]
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        try:
+            with transaction.atomic(using=using):
+                return super().save(*args, **{**kwargs, 'update_fields': update_fields})
+        except DatabaseError as exc:
+            # Строки нет (удалили параллельно): как и save() без update_fields,
+            # вставляем объект. Ошибки самой БД - подклассы DatabaseError
+            if type(exc) is not DatabaseError or kwargs.get('force_update'):
+                raise
+        return super().save(*args, **{**kwargs, 'force_insert': True})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки - по ним сигналы вычисляют изменение
+        # сводки риелтора (RealtorPortfolioSummary) без полного пересчёта
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+
+class PropertyImage(models.Model):
+    """Фотография галереи объекта (порядок показа - position)"""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images', verbose_name="Объект")
+    image = models.ImageField(upload_to='properties/', storage=property_image_storage, verbose_name="Изображение")
+    position = models.PositiveIntegerField(default=0, verbose_name="Порядок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+
+    class Meta:
+        verbose_name = "Фотография объекта"
+        verbose_name_plural = "Фотографии объектов"
+        ordering = ['position', 'pk']
+        indexes = [
+            # Галерея объекта и его обложка (первая фотография) - по индексу
+            models.Index(fields=['property', 'position', 'id'], name='property_image_pos_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id}: {self.image.name}"
+
+class RealtorPortfolioSummary(models.Model):
+    """
+    Сводка по объектам риелтора для личного кабинета. Обновляется
+    инкрементально сигналами Property, см. realty/portfolio.py.
+    """
+    realtor = models.OneToOneField(
+        Realtor, on_delete=models.CASCADE, primary_key=True,
+        related_name='portfolio_summary', verbose_name="Риелтор",
+    )
+    listing_count = models.IntegerField(default=0, verbose_name="Всего объектов")
+    for_sale_count = models.IntegerField(default=0, verbose_name="Продажа")
+    for_rent_count = models.IntegerField(default=0, verbose_name="Аренда")
+    sold_count = models.IntegerField(default=0, verbose_name="Продано")
+    rented_count = models.IntegerField(default=0, verbose_name="Сдано в аренду")
+    total_price = models.DecimalField(max_digits=18, decimal_places=2, default=0, verbose_name="Суммарная цена")
+    total_area = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Суммарная площадь (м²)")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Сводка риелтора"
+        verbose_name_plural = "Сводки риелторов"
+
+    def __str__(self):
+        return f"{self.realtor_id}: {self.listing_count}"
+
+    @property
+    def average_price(self):
+        """Средняя цена объекта."""
+        if not self.listing_count:
+            return None
+        return (self.total_price / self.listing_count).quantize(Decimal('0.01'))
+
+    @property
+    def price_per_sqm(self):
+        """Средняя цена квадратного метра (суммарная цена / суммарная площадь)."""
+        if not self.total_area:
+            return None
+        return (self.total_price / self.total_area).quantize(Decimal('0.01'))
+
+    def status_counts(self):
+        """Список (статус, название, количество) в порядке Property.STATUS_CHOICES."""
+        return [
+            (status, label, getattr(self, f'{status}_count'))
+            for status, label in Property.STATUS_CHOICES
+        ]
+
+class PropertyCard(models.Model):
+    """
+    Денормализованная карточка объекта для каталога, главной и детальной
+    страницы: поля объекта и контакты риелтора в одной таблице, без JOIN.
+    Обновляется сигналами Property, Realtor и User, см. realty/read_model.py.
+    """
+    property = models.OneToOneField(
+        Property, on_delete=models.CASCADE, primary_key=True, related_name='card', verbose_name="Объект",
+    )
+    title = models.CharField(max_length=200, verbose_name="Название")
+    description = models.TextField(verbose_name="Описание")
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES, verbose_name="Тип недвижимости")
+    status = models.CharField(max_length=20, choices=Property.STATUS_CHOICES, verbose_name="Статус")
+    address = models.TextField(verbose_name="Адрес")
+    price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Цена")
+    area = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Площадь (м²)")
+    bedrooms = models.IntegerField(verbose_name="Количество спален")
+    bathrooms = models.IntegerField(verbose_name="Количество ванных комнат")
+    # Главное изображение объекта, а без него - первая фотография галереи
+    main_image = models.ImageField(storage=property_image_storage, verbose_name="Обложка", blank=True, null=True)
+    is_featured = models.BooleanField(verbose_name="Рекомендуемый")
+    view_count = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата обновления")
+    latitude = models.FloatField(null=True, verbose_name="Широта")
+    longitude = models.FloatField(null=True, verbose_name="Долгота")
+    geo_cell = models.CharField(max_length=12, blank=True, verbose_name="Ячейка geohash")
+    search_vector = SearchVectorField(null=True)
+
+    # Риелтор (для детальной страницы)
+    realtor_id = models.BigIntegerField(db_index=True, verbose_name="ID риелтора")
+    realtor_name = models.CharField(max_length=301, verbose_name="Имя риелтора")
+    realtor_email = models.EmailField(blank=True, verbose_name="Email риелтора")
+    realtor_phone = models.CharField(max_length=20, verbose_name="Телефон риелтора")
+    realtor_license_number = models.CharField(max_length=50, verbose_name="Номер лицензии")
+    realtor_experience_years = models.IntegerField(verbose_name="Опыт работы (лет)")
+    realtor_bio = models.TextField(blank=True, verbose_name="О риелторе")
+    realtor_photo = models.ImageField(blank=True, null=True, verbose_name="Фотография риелтора")
+    realtor_updated_at = models.DateTimeField(null=True, verbose_name="Дата обновления риелтора")
+
+    class Meta:
+        verbose_name = "Карточка объекта"
+        verbose_name_plural = "Карточки объектов"
+        # Те же индексы, что у Property: каталог читает только эту таблицу
+        indexes = [
+            models.Index(fields=['created_at', 'property'], name='card_created_idx'),
+            models.Index(fields=['price', 'property'], name='card_price_idx'),
+            models.Index(fields=['status', 'created_at', 'property'], name='card_st_created_idx'),
+            models.Index(fields=['status', 'price', 'property'], name='card_st_price_idx'),
+            models.Index(fields=['property_type', 'created_at', 'property'], name='card_tp_created_idx'),
+            models.Index(fields=['property_type', 'price', 'property'], name='card_tp_price_idx'),
+            models.Index(fields=['property_type', 'status', 'created_at', 'property'], name='card_tp_st_created_idx'),
+            models.Index(fields=['property_type', 'status', 'price', 'property'], name='card_tp_st_price_idx'),
+            models.Index(fields=['view_count', 'property'], name='card_views_idx'),
+            models.Index(fields=['status', 'view_count', 'property'], name='card_st_views_idx'),
+            models.Index(fields=['property_type', 'view_count', 'property'], name='card_tp_views_idx'),
+            models.Index(fields=['property_type', 'status', 'view_count', 'property'], name='card_tp_st_views_idx'),
+            models.Index(fields=['geo_cell'], name='card_geo_cell_idx'),
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_featured=True), name='card_featured_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
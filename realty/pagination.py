@@ -0,0 +1,205 @@
+"""Keyset (курсорная) пагинация.
+
+В отличие от постраничной пагинации Django (OFFSET/LIMIT + COUNT(*)), курсор
+хранит значения ключа сортировки последней показанной записи, и следующая
+страница выбирается условием ``WHERE (ключ) > (значения курсора)``. Стоимость
+запроса не зависит от глубины страницы, если для сортировки есть индекс.
+
+EstimatedCountPaginator - постраничный пагинатор для админки: вместо точного
+COUNT(*) по большой таблице число записей оценивается планировщиком
+PostgreSQL.
+"""
+
+import json
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """Курсор повреждён или не соответствует текущей сортировке."""
+
+
+class KeysetPage:
+    """Страница результатов keyset-пагинации."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по набору полей сортировки.
+
+    ``ordering`` - кортеж полей в формате order_by ('-created_at', '-pk');
+    последнее поле должно быть уникальным (pk), чтобы порядок был строгим.
+    """
+
+    salt = 'realty.pagination.cursor'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [
+            queryset.model._meta.pk if name.lstrip('-') == 'pk'
+            else queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        """Курсор для записи obj - экземпляра модели или словаря из values()."""
+        values = []
+        for field in self.fields:
+            value = obj[field.attname] if isinstance(obj, dict) else getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return signing.dumps([self.ordering, direction, values], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            ordering, direction, values = signing.loads(cursor, salt=self.salt)
+        except (signing.BadSignature, TypeError, ValueError) as exc:
+            raise InvalidCursor('Некорректный курсор') from exc
+        if tuple(ordering) != self.ordering or direction not in ('next', 'prev'):
+            raise InvalidCursor('Курсор относится к другой сортировке')
+        try:
+            values = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except Exception as exc:
+            raise InvalidCursor('Некорректные значения курсора') from exc
+        return direction, values
+
+    def _seek_condition(self, values, reverse):
+        """
+        Условие «строго после курсора» для составного ключа.
+
+        Строится в виде ``a <= x AND (a < x OR (a = x AND b < y))``: первое
+        слагаемое позволяет СУБД начать чтение индекса сразу с позиции курсора.
+        """
+        condition = Q()
+        for index in range(len(self.ordering) - 1, -1, -1):
+            name = self.ordering[index].lstrip('-')
+            descending = self.ordering[index].startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            if index < len(self.ordering) - 1:
+                step |= Q(**{name: values[index]}) & condition
+            condition = step
+        first = self.ordering[0].lstrip('-')
+        descending = self.ordering[0].startswith('-') != reverse
+        bound = Q(**{f'{first}__{"lte" if descending else "gte"}': values[0]})
+        return bound & condition
+
+    def page_queryset(self, direction='next', values=None):
+        """Запрос одной страницы (на одну запись больше, чтобы узнать о следующей)."""
+        reverse = direction == 'prev'
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek_condition(values, reverse))
+        return queryset[:self.per_page + 1]
+
+    def _query(self, cursor):
+        direction, values = ('next', None) if not cursor else self.decode_cursor(cursor)
+        return direction, self.page_queryset(direction, values)
+
+    def _build_page(self, rows, cursor, direction):
+        reverse = direction == 'prev'
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], 'next')
+            if (has_more and reverse) or (cursor and not reverse):
+                previous_cursor = self.encode_cursor(rows[0], 'prev')
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        """Возвращает страницу после (или перед) курсором; без курсора - первую."""
+        direction, queryset = self._query(cursor)
+        return self._build_page(list(queryset), cursor, direction)
+
+    async def apage(self, cursor=None):
+        """Асинхронный вариант page()."""
+        direction, queryset = self._query(cursor)
+        return self._build_page([obj async for obj in queryset], cursor, direction)
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк queryset планировщиком PostgreSQL: для всей таблицы -
+    pg_class.reltuples, для отфильтрованной выборки - строки плана EXPLAIN.
+    На остальных СУБД - None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+            # -1 - таблица ещё ни разу не анализировалась
+            if row and row[0] >= 0:
+                return row[0]
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с приблизительным числом записей для больших таблиц.
+
+    Сначала считается не больше exact_count_limit + 1 строк (COUNT по
+    подзапросу с LIMIT - его стоимость ограничена). Если строк меньше
+    предела, число точное; иначе берётся оценка планировщика (estimate_count),
+    а на СУБД без оценки - обычный COUNT(*).
+    """
+
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        capped = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if capped <= self.exact_count_limit:
+            return capped
+        estimate = estimate_count(queryset)
+        if estimate is None:
+            return queryset.count()
+        return max(estimate, capped)
@@ -0,0 +1,149 @@
+"""Статистика портфеля риелтора для личного кабинета.
+
+Полная статистика считается одним агрегирующим запросом (``portfolio_stats``).
+Чтобы не выполнять его при каждом открытии кабинета, результат хранится в
+RealtorPortfolioSummary, а сигналы Property применяют к этой строке только
+разницу между старым и новым состоянием сохранённого или удалённого объекта.
+Отсутствующая строка сводки строится при первом обращении тем же запросом
+``portfolio_stats``. Операции в обход
+сигналов (bulk_create, QuerySet.update) должны вызывать ``rebuild_summaries``
+для затронутых риелторов.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Now
+
+from .models import Property, Realtor, RealtorPortfolioSummary
+
+# Поля Property, от которых зависит сводка
+TRACKED_FIELDS = ('realtor_id', 'status', 'price', 'area')
+
+# Статус объекта -> поле счётчика в сводке
+STATUS_COUNT_FIELDS = {status: f'{status}_count' for status, _label in Property.STATUS_CHOICES}
+
+SUMMARY_FIELDS = ('listing_count', *STATUS_COUNT_FIELDS.values(), 'total_price', 'total_area')
+
+
+def portfolio_aggregates():
+    """Агрегаты сводки: имя поля RealtorPortfolioSummary -> выражение."""
+    zero = Value(Decimal('0'), output_field=DecimalField())
+    aggregates = {
+        'listing_count': Count('pk'),
+        'total_price': Coalesce(Sum('price'), zero),
+        'total_area': Coalesce(Sum('area'), zero),
+    }
+    for status, field in STATUS_COUNT_FIELDS.items():
+        aggregates[field] = Count('pk', filter=Q(status=status))
+    return aggregates
+
+
+def portfolio_stats(queryset):
+    """Статистика по объектам queryset одним запросом (несохранённая сводка)."""
+    return RealtorPortfolioSummary(**queryset.aggregate(**portfolio_aggregates()))
+
+
+def rebuild_summaries(realtor_ids=None):
+    """
+    Полный пересчёт сводок одним сгруппированным запросом - для всех
+    риелторов или только для realtor_ids.
+    """
+    realtors = Realtor.objects.all()
+    properties = Property.objects.all()
+    if realtor_ids is not None:
+        realtors = realtors.filter(pk__in=realtor_ids)
+        properties = properties.filter(realtor_id__in=realtor_ids)
+
+    rows = {
+        row.pop('realtor_id'): row
+        for row in properties.order_by().values('realtor_id').annotate(**portfolio_aggregates())
+    }
+    return _save_summaries([
+        RealtorPortfolioSummary(realtor_id=pk, **rows.get(pk, {}))
+        for pk in realtors.values_list('pk', flat=True)
+    ])
+
+
+def _save_summaries(summaries):
+    """Вставляет сводки или перезаписывает существующие строки."""
+    RealtorPortfolioSummary.objects.bulk_create(
+        summaries, update_conflicts=True, unique_fields=['realtor'],
+        update_fields=[*SUMMARY_FIELDS, 'updated_at'],
+    )
+    return summaries
+
+
+def _state(values):
+    return tuple(values.get(name) for name in TRACKED_FIELDS)
+
+
+def _apply_changes(changes):
+    """
+    Применяет изменения [(состояние объекта, +1/-1), ...] к сводкам одним
+    UPDATE на риелтора.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for (realtor_id, status, price, area), sign in changes:
+        delta = deltas[realtor_id]
+        delta['listing_count'] += sign
+        if status in STATUS_COUNT_FIELDS:
+            delta[STATUS_COUNT_FIELDS[status]] += sign
+        delta['total_price'] += sign * Decimal(str(price or 0))
+        delta['total_area'] += sign * Decimal(str(area or 0))
+
+    for realtor_id, delta in deltas.items():
+        updates = {name: F(name) + value for name, value in delta.items() if value}
+        if not updates:
+            continue
+        # Если строки сводки ещё нет, обновлять нечего: она будет построена
+        # целиком при первом обращении (get_portfolio_summary)
+        RealtorPortfolioSummary.objects.filter(realtor_id=realtor_id).update(updated_at=Now(), **updates)
+
+
+def _invalidate(realtor_id):
+    """Удаляет сводку, чтобы она была пересчитана при следующем обращении."""
+    RealtorPortfolioSummary.objects.filter(realtor_id=realtor_id).delete()
+
+
+def property_saved(instance, created):
+    """Обновляет сводку после сохранения объекта (вызывается из post_save)."""
+    new_state = _state(instance.__dict__)
+    loaded = getattr(instance, '_loaded_values', None)
+
+    if created:
+        _apply_changes([(new_state, 1)])
+    elif loaded is not None and all(name in loaded for name in TRACKED_FIELDS):
+        old_state = _state(loaded)
+        if old_state != new_state:
+            _apply_changes([(old_state, -1), (new_state, 1)])
+    else:
+        # Прежнее состояние неизвестно (объект не загружался из БД или
+        # загружен с отложенными полями) - сводку придётся пересчитать
+        _invalidate(instance.realtor_id)
+
+    instance._loaded_values = {**(loaded or {}), **dict(zip(TRACKED_FIELDS, new_state))}
+
+
+def property_deleted(instance):
+    """Обновляет сводку после удаления объекта (вызывается из post_delete)."""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and all(name in loaded for name in TRACKED_FIELDS):
+        _apply_changes([(_state(loaded), -1)])
+    else:
+        _invalidate(instance.realtor_id)
+
+
+def get_portfolio_summary(realtor):
+    """
+    Сводка риелтора. Если realtor загружен с select_related('portfolio_summary'),
+    запросов к БД нет; при отсутствии сводки она строится один раз.
+    """
+    try:
+        return realtor.portfolio_summary
+    except RealtorPortfolioSummary.DoesNotExist:
+        summary = portfolio_stats(Property.objects.filter(realtor_id=realtor.pk))
+        summary.realtor = realtor
+        summary, = _save_summaries([summary])
+        return summary
@@ -0,0 +1,115 @@
+"""Роль и профиль пользователя, определяемые один раз и хранимые в сессии.
+
+ProfileMiddleware (realty/middleware.py) добавляет request.profile - ленивый
+RequestProfile с ролью пользователя и id его профилей риелтора и клиента.
+При первом обращении профиль читается из сессии; если его там нет или он
+устарел, выполняется один запрос к БД, и результат сохраняется в сессию.
+
+Актуальность проверяется по версии профилей пользователя в кеше: сигналы
+сохранения и удаления Realtor и Client увеличивают её (см. signals.py), и
+профиль в сессии с другой версией определяется заново. Как и версия
+каталога (realty/cache.py), версия требует общего бэкенда кеша при
+нескольких процессах.
+"""
+
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+SESSION_KEY = '_realty_profile'
+VERSION_KEY = 'realty:profile-version:{user_id}'
+
+
+class RequestProfile:
+    """Роль пользователя и id его профилей (без загрузки самих профилей)."""
+
+    def __init__(self, realtor_id=None, client_id=None):
+        self.realtor_id = realtor_id
+        self.client_id = client_id
+
+    @property
+    def is_realtor(self):
+        return self.realtor_id is not None
+
+    @property
+    def is_client(self):
+        return self.client_id is not None
+
+    @property
+    def role(self):
+        if self.is_realtor:
+            return 'realtor'
+        return 'client' if self.is_client else None
+
+
+def _initial_version():
+    # Как у версии каталога: после вытеснения ключа новая версия больше прежних
+    return time.time_ns() // 1_000_000
+
+
+def get_profile_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_profile_version(user_id):
+    """Делает недействительным профиль пользователя во всех его сессиях."""
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def resolve_profile(user):
+    """Профиль из БД одним запросом (LEFT JOIN с риелтором и клиентом)."""
+    row = User.objects.filter(pk=user.pk).values('realtor__id', 'client__id').first() or {}
+    return RequestProfile(row.get('realtor__id'), row.get('client__id'))
+
+
+def get_request_profile(request):
+    user = request.user
+    if not user.is_authenticated:
+        return RequestProfile()
+
+    version = get_profile_version(user.pk)
+    stored = request.session.get(SESSION_KEY)
+    if stored and stored.get('user_id') == user.pk and stored.get('version') == version:
+        return RequestProfile(stored.get('realtor_id'), stored.get('client_id'))
+
+    profile = resolve_profile(user)
+    request.session[SESSION_KEY] = {
+        'user_id': user.pk,
+        'version': version,
+        'realtor_id': profile.realtor_id,
+        'client_id': profile.client_id,
+    }
+    return profile
+
+
+def realtor_required(message=None):
+    """
+    Декоратор страниц риелтора: требует входа и профиля риелтора, иначе -
+    сообщение message (если задано) и переход на главную. Профиль доступен
+    представлению как request.profile.
+    """
+    def decorator(view_func):
+        @login_required
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.profile.is_realtor:
+                if message:
+                    messages.error(request, message)
+                return redirect('home')
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
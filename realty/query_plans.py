@@ -0,0 +1,42 @@
+"""Проверка планов запросов каталога (используется в тестах).
+
+Разбирает вывод ``QuerySet.explain()`` и ищет в нём признаки того, что СУБД
+не смогла воспользоваться индексом: полный просмотр таблицы или отдельную
+сортировку результата.
+"""
+
+import re
+
+from django.db import connections
+
+# Шаблоны строк плана, означающие проблему, для каждой поддерживаемой СУБД
+PLAN_PROBLEMS = {
+    'postgresql': [
+        (re.compile(r'\bSeq Scan\b'), 'последовательное сканирование таблицы'),
+        (re.compile(r'\bSort\b'), 'сортировка без индекса'),
+    ],
+    'sqlite': [
+        (re.compile(r'\bSCAN \S+$'), 'последовательное сканирование таблицы'),
+        (re.compile(r'\bUSE TEMP B-TREE\b'), 'сортировка без индекса'),
+    ],
+}
+
+
+def explain(queryset):
+    """Возвращает план запроса в виде списка строк."""
+    return [line.strip() for line in queryset.explain().splitlines() if line.strip()]
+
+
+def plan_problems(queryset):
+    """
+    Список проблем в плане запроса: пары (строка плана, описание).
+
+    Для СУБД без известных шаблонов возвращает пустой список.
+    """
+    patterns = PLAN_PROBLEMS.get(connections[queryset.db].vendor, [])
+    problems = []
+    for line in explain(queryset):
+        for pattern, description in patterns:
+            if pattern.search(line):
+                problems.append((line, description))
+    return problems
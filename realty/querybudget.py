@@ -0,0 +1,150 @@
+"""Бюджеты SQL-запросов для представлений и поиск N+1.
+
+QueryRecorder записывает все SQL-запросы, выполненные внутри блока with, на
+всех подключениях к БД. Запросы приводятся к «форме» (параметры уже вынесены
+в %s, списки IN схлопываются), и одинаковая форма, повторённая несколько раз,
+считается признаком N+1 - запроса внутри цикла по объектам.
+
+Служебная работа, не связанная с самим запросом (например, запись буфера
+счётчиков просмотров всего процесса), выполняется в блоке ``unbudgeted()`` и
+в бюджет не входит.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Сколько повторений одной формы запроса считать N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IGNORED = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+_unbudgeted = ContextVar('realty_unbudgeted', default=False)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление превысило бюджет запросов (в строгом режиме)."""
+
+
+def query_shape(sql):
+    """Форма запроса: без конкретных значений и с одинаковыми списками IN."""
+    shape = _STRING.sub('?', sql)
+    shape = _IN_LIST.sub('(...)', shape)
+    shape = _NUMBER.sub('?', shape)
+    return ' '.join(shape.split())
+
+
+@contextmanager
+def unbudgeted():
+    """Запросы внутри блока не входят в бюджет (QueryRecorder с budgeted=True их не записывает)."""
+    token = _unbudgeted.set(True)
+    try:
+        yield
+    finally:
+        _unbudgeted.reset(token)
+
+
+class QueryRecorder:
+    """
+    Записывает SQL-запросы, выполненные внутри блока with. При budgeted=True
+    запросы из блоков unbudgeted() пропускаются.
+    """
+
+    def __init__(self, budgeted=False):
+        self.budgeted = budgeted
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not (self.budgeted and _unbudgeted.get()) and not _IGNORED.match(sql):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Формы запросов, выполненные не менее threshold раз: {форма: количество}."""
+        counts = Counter(query_shape(sql) for sql in self.queries)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def problems(self, max_queries=None):
+        """Нарушения: превышение бюджета и повторяющиеся запросы."""
+        problems = []
+        if max_queries is not None and len(self) > max_queries:
+            problems.append(f'Выполнено запросов: {len(self)}, бюджет: {max_queries}')
+        for shape, count in self.repeated_shapes().items():
+            problems.append(f'Вероятный N+1 ({count} раз): {shape}')
+        return problems
+
+
+def query_budget(max_queries):
+    """
+    Декоратор представления: записывает запросы (включая отрисовку шаблона)
+    и сообщает о превышении бюджета или N+1. Включается настройкой
+    QUERY_BUDGET_ENABLED; при QUERY_BUDGET_STRICT нарушение - исключение.
+
+    Загрузка сессии и пользователя в middleware в бюджет не входит.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+                return view_func(request, *args, **kwargs)
+
+            # request.user ленивый: без этого сессия и пользователь загрузились бы
+            # при первом обращении в представлении и вошли бы в бюджет
+            user = getattr(request, 'user', None)
+            if user is not None:
+                user.is_authenticated
+            with QueryRecorder(budgeted=True) as recorder:
+                response = view_func(request, *args, **kwargs)
+                # TemplateResponse отрисовывается позже - учитываем и запросы шаблона
+                if not getattr(response, 'is_rendered', True):
+                    response.render()
+
+            problems = recorder.problems(max_queries)
+            if problems:
+                message = f'{request.method} {request.path}: ' + '; '.join(problems)
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+class QueryBudgetTestMixin:
+    """Примесь для TestCase с проверкой бюджета запросов."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries):
+        """Блок должен уложиться в max_queries запросов и не содержать N+1."""
+        with QueryRecorder(budgeted=True) as recorder:
+            yield recorder
+        problems = recorder.problems(max_queries)
+        if problems:
+            queries = '\n'.join(f'{index}. {sql}' for index, sql in enumerate(recorder.queries, 1))
+            self.fail('\n'.join(problems) + '\n\nЗапросы:\n' + queries)
@@ -0,0 +1,97 @@
+"""Денормализованные карточки объектов (PropertyCard).
+
+Каталог, главная и детальная страница читают одну таблицу с индексами под
+фильтры и сортировки, без JOIN с риелтором и пользователем. Карточки
+обновляются сигналами (см. realty/signals.py):
+
+* сохранение Property - пересборка карточки этого объекта (один SELECT с
+  JOIN и один UPSERT);
+* сохранение Realtor или имени/email пользователя-риелтора - один UPDATE
+  полей риелтора во всех его карточках;
+* удаление Property удаляет карточку каскадно;
+* изменение галереи (PropertyImage) - пересборка карточки объекта.
+
+Из фотографий в карточке хранится только обложка (main_image): главное фото
+объекта или первая фотография галереи.
+
+Операции в обход сигналов (bulk_create, QuerySet.update) должны вызывать
+``refresh_property_cards`` или команду refresh_property_cards.
+"""
+
+from django.db.models import OuterRef, Subquery
+
+from .models import Property, PropertyCard, PropertyImage
+
+# Поля, копируемые из Property в карточку без изменений
+PROPERTY_FIELDS = (
+    'title', 'description', 'property_type', 'status', 'address', 'price', 'area',
+    'bedrooms', 'bathrooms', 'is_featured', 'view_count',
+    'created_at', 'updated_at', 'latitude', 'longitude', 'geo_cell', 'search_vector',
+)
+
+REALTOR_FIELDS = (
+    'realtor_id', 'realtor_name', 'realtor_email', 'realtor_phone', 'realtor_license_number',
+    'realtor_experience_years', 'realtor_bio', 'realtor_photo', 'realtor_updated_at',
+)
+
+
+def realtor_card_values(realtor):
+    """Значения полей риелтора для карточек (realtor.user должен быть загружен)."""
+    return {
+        'realtor_id': realtor.pk,
+        'realtor_name': realtor.user.get_full_name(),
+        'realtor_email': realtor.user.email,
+        'realtor_phone': realtor.phone,
+        'realtor_license_number': realtor.license_number,
+        'realtor_experience_years': realtor.experience_years,
+        'realtor_bio': realtor.bio,
+        'realtor_photo': realtor.photo.name or None,
+        'realtor_updated_at': realtor.updated_at,
+    }
+
+
+def first_image_subquery(outer_ref='pk'):
+    """Имя первой фотографии галереи объекта OuterRef(outer_ref)."""
+    return Subquery(
+        PropertyImage.objects.filter(property_id=OuterRef(outer_ref)).order_by('position', 'pk').values('image')[:1]
+    )
+
+
+def build_card(property_obj):
+    """
+    Карточка (несохранённая) для объекта с загруженными realtor и realtor.user.
+    Обложка без главного фото берётся из аннотации first_image (refresh_property_cards).
+    """
+    values = {name: getattr(property_obj, name) for name in PROPERTY_FIELDS}
+    values['main_image'] = property_obj.main_image.name or getattr(property_obj, 'first_image', None) or None
+    return PropertyCard(property_id=property_obj.pk, **values, **realtor_card_values(property_obj.realtor))
+
+
+def refresh_property_cards(property_ids=None, batch_size=1000):
+    """Пересобирает карточки объектов property_ids (или всех объектов), возвращает их число."""
+    queryset = Property.objects.select_related('realtor__user').annotate(first_image=first_image_subquery()).order_by('pk')
+    if property_ids is not None:
+        queryset = queryset.filter(pk__in=property_ids)
+
+    total, batch = 0, []
+    for property_obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(build_card(property_obj))
+        if len(batch) >= batch_size:
+            total += _save_cards(batch)
+            batch = []
+    if batch:
+        total += _save_cards(batch)
+    return total
+
+
+def _save_cards(cards):
+    PropertyCard.objects.bulk_create(
+        cards, update_conflicts=True, unique_fields=['property'],
+        update_fields=[*PROPERTY_FIELDS, 'main_image', *REALTOR_FIELDS],
+    )
+    return len(cards)
+
+
+def refresh_realtor_cards(realtor):
+    """Обновляет контакты риелтора во всех его карточках одним UPDATE."""
+    return PropertyCard.objects.filter(realtor_id=realtor.pk).update(**realtor_card_values(realtor))
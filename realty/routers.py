@@ -0,0 +1,108 @@
+"""Маршрутизация запросов к основной БД и репликам для чтения.
+
+Чтение объектов и риелторов из публичных страниц направляется на реплики из
+настройки DATABASE_REPLICAS, всё остальное - на основную БД (default):
+
+* любые записи;
+* чтение вне HTTP-запроса (команды manage.py, shell, фоновые задачи);
+* чтение внутри транзакции и после записи в том же запросе;
+* запросы с небезопасным методом (POST и т.п.) и представления с use_primary;
+* запросы посетителя в течение PRIMARY_STICKY_SECONDS после его записи
+  (cookie ставит PrimaryStickinessMiddleware), чтобы он сразу видел свои
+  изменения, даже если реплика отстаёт.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Модели, чтение которых допускается с реплик
+REPLICATED_MODELS = {'realty.property', 'realty.propertycard', 'realty.realtor'}
+
+
+class RoutingState:
+    """Состояние маршрутизации в рамках одного запроса."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('realty_db_routing', default=None)
+
+
+@contextmanager
+def routing_context(pinned=False):
+    """Включает чтение с реплик для блока кода (обычно - для HTTP-запроса)."""
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def pin_primary():
+    """Направляет все последующие запросы текущего контекста на основную БД."""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+def use_primary(view_func):
+    """Декоратор представления: все запросы - к основной БД."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            pin_primary()
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        pin_primary()
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+class PrimaryReplicaRouter:
+    """Роутер для DATABASE_ROUTERS."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = get_replicas()
+        if (
+            state is None
+            or state.pinned
+            or not replicas
+            or model._meta.label_lower not in REPLICATED_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же БД, что и исходный
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Дальнейшие чтения в этом запросе должны видеть запись
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,75 @@
+"""Полнотекстовый поиск по каталогу объектов недвижимости.
+
+На PostgreSQL поиск идёт по столбцу ``search_vector`` (tsvector с GIN-индексом),
+который поддерживается триггером из миграции ``0002``. На остальных СУБД
+(SQLite в тестах) используется упрощённый поиск по вхождению подстроки.
+"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+# Конфигурация текстового поиска PostgreSQL (должна совпадать с триггером)
+SEARCH_CONFIG = 'russian'
+
+# Поля, по которым ведётся поиск, и их веса (A - самый важный)
+SEARCH_FIELDS = (
+    ('title', 'A'),
+    ('address', 'B'),
+    ('description', 'C'),
+)
+
+
+def normalize_query(query):
+    """Приводит поисковую строку к каноническому виду (без лишних пробелов)."""
+    return ' '.join((query or '').split())
+
+
+def _uses_full_text(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_properties(queryset, query, rank=True):
+    """
+    Фильтрует queryset объектов по поисковой строке.
+
+    При rank=True результаты дополнительно аннотируются полем ``rank``
+    и сортируются по релевантности.
+    """
+    query = normalize_query(query)
+    if not query:
+        return queryset
+
+    if _uses_full_text(queryset):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query)
+        if rank:
+            queryset = queryset.annotate(
+                rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-rank', '-pk')
+        return queryset
+
+    # Запасной вариант для SQLite: поиск по вхождению каждого слова
+    for word in query.split():
+        condition = Q()
+        for field, _weight in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(condition)
+
+    if rank:
+        # Грубая оценка релевантности: совпадение в более важном поле выше
+        weights = {'A': 3, 'B': 2, 'C': 1}
+        queryset = queryset.annotate(
+            rank=sum(
+                (
+                    Case(
+                        When(**{f'{field}__icontains': query}, then=Value(weights[weight])),
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                    for field, weight in SEARCH_FIELDS
+                ),
+                Value(0),
+            )
+        ).order_by('-rank', '-pk')
+    return queryset
@@ -0,0 +1,108 @@
+"""Обработчики сигналов моделей приложения realty."""
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .geo import locate_property
+from .gallery import gallery_changed
+from .models import Client, Property, PropertyImage, Realtor
+from .portfolio import property_deleted, property_saved
+from .profiles import bump_profile_version
+from .read_model import refresh_property_cards, refresh_realtor_cards
+from .timing import install_query_timer
+
+
+@receiver(pre_save, sender=Property)
+def geocode_property(sender, instance, raw=False, **kwargs):
+    """Координаты по адресу (если не заданы) и ячейка geohash для поиска по расстоянию."""
+    if not raw:
+        locate_property(instance)
+
+
+@receiver(post_save, sender=Property)
+def update_portfolio_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Инкрементальное обновление сводки риелтора (RealtorPortfolioSummary)."""
+    if raw:
+        return
+    if update_fields is not None and not {'realtor', 'realtor_id', 'status', 'price', 'area'} & set(update_fields):
+        return
+    property_saved(instance, created)
+
+
+@receiver(post_delete, sender=Property)
+def update_portfolio_on_delete(sender, instance, **kwargs):
+    property_deleted(instance)
+
+
+@receiver(post_save, sender=Property)
+def refresh_card_on_save(sender, instance, raw=False, **kwargs):
+    """Пересборка денормализованной карточки объекта (PropertyCard)."""
+    if not raw:
+        refresh_property_cards([instance.pk])
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def refresh_card_on_gallery_change(sender, instance, raw=False, origin=None, **kwargs):
+    """Фотография галереи добавлена, изменена или удалена (обложка, ETag, кеш карточек)."""
+    if raw:
+        return
+    # Фотографии удаляются каскадно вместе с объектом - пересобирать нечего
+    if isinstance(origin, Property) or getattr(origin, 'model', None) is Property:
+        return
+    gallery_changed([instance.property_id])
+
+
+@receiver(post_save, sender=Realtor)
+def refresh_cards_on_realtor_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_realtor_cards(instance)
+
+
+# Регистрируется после пересборки карточек: иначе между новой версией и
+# новой карточкой параллельный запрос закешировал бы под новой версией
+# страницу со старой карточкой
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=Realtor)
+@receiver(post_delete, sender=Realtor)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Любое изменение объекта или риелтора делает закешированные страницы каталога устаревшими."""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def refresh_cards_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Имя и email пользователя-риелтора выводятся в карточках его объектов."""
+    if raw or created:
+        return
+    if update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields):
+        return
+    realtor = Realtor.objects.filter(user=instance).first()
+    if realtor is not None:
+        # Профиль риелтора на страницах объектов изменился (ETag, см. conditional.py)
+        realtor.updated_at = timezone.now()
+        Realtor.objects.filter(pk=realtor.pk).update(updated_at=realtor.updated_at)
+        realtor.user = instance
+        refresh_realtor_cards(realtor)
+        # update() не отправляет сигналов: имя риелтора есть на главной и в API
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=Realtor)
+@receiver(post_delete, sender=Realtor)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_request_profile(sender, instance, **kwargs):
+    """Профиль пользователя, сохранённый в его сессиях, устарел (см. realty/profiles.py)."""
+    bump_profile_version(instance.user_id)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Время SQL-запросов для заголовка Server-Timing (см. realty/timing.py)."""
+    install_query_timer(connection)
@@ -0,0 +1,157 @@
+"""Хранилища файлов приложения realty.
+
+CompressedManifestStaticFilesStorage - хранилище статики для collectstatic:
+к именам файлов добавляется хеш содержимого (ManifestStaticFilesStorage), а
+рядом с каждым сжимаемым файлом сохраняются варианты .gz и, если установлен
+пакет brotli, .br. Их отдаёт StaticMediaMiddleware (realty/fileserving.py),
+выбирая вариант по Accept-Encoding, так что сжатие не выполняется на каждый
+запрос.
+
+ContentAddressedStorage - хранилище фотографий объектов: файл сохраняется
+один раз под именем из SHA-256 содержимого (images/ab/cd/<хеш>.jpg), и
+повторная загрузка той же фотографии к другому объекту только возвращает имя
+уже сохранённого файла. Удаление объекта файлов не удаляет (Django не удаляет
+файлы полей), поэтому общие файлы других объектов не ломаются; файлы без
+ссылок удаляет команда collect_orphan_images.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, storages
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него создаются только .gz
+    brotli = None
+
+# Текстовые форматы; изображения, шрифты woff2 и архивы уже сжаты
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot',
+}
+
+# Файлы меньше этого размера не сжимаются - выигрыш меньше накладных расходов
+MIN_COMPRESS_SIZE = 256
+
+
+def compressed_variants(content):
+    """Сжатые варианты содержимого: [(расширение, данные)], только если они меньше исходного."""
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    return [(suffix, data) for suffix, data in variants if len(data) < len(content)]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и заранее сжатыми вариантами .gz/.br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if self.should_compress(name):
+                self.compress(name)
+
+    def should_compress(self, name):
+        return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, data in compressed_variants(content):
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
+
+
+# Каталог файлов с именами из хеша содержимого
+CONTENT_DIR = 'images'
+CONTENT_NAME = re.compile(rf'^{CONTENT_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[^./]+)?$')
+
+
+def content_name(digest, original_name):
+    """Имя файла по хешу содержимого; расширение берётся из исходного имени."""
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{CONTENT_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище с дедупликацией по содержимому. Загрузка пишется по частям во
+    временный файл в каталоге хранилища с одновременным подсчётом SHA-256,
+    затем переименовывается в имя из хеша или удаляется, если такой файл уже
+    есть. Файлы, уже лежащие в CONTENT_DIR, сохраняются под своим именем;
+    производные файлы (уменьшенные варианты рядом с оригиналом, см. images.py)
+    сохраняются под заданным именем через save_as - в том числе для фотографий,
+    загруженных до перехода на это хранилище.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя файла определяется содержимым в _save
+        if name.startswith(f'{CONTENT_DIR}/'):
+            return super().get_available_name(name, max_length)
+        return name
+
+    def _write_temporary(self, content):
+        """Пишет content во временный файл хранилища; (путь, SHA-256)."""
+        directory = self.path(CONTENT_DIR)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return temporary, digest.hexdigest()
+
+    def _replace(self, temporary, name):
+        full_path = self.path(name)
+        try:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Атомарно: параллельная запись того же файла запишет то же содержимое
+            os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(f'{CONTENT_DIR}/'):
+            return super()._save(name, content)
+
+        temporary, digest = self._write_temporary(content)
+        name = content_name(digest, name)
+        if os.path.exists(self.path(name)):
+            os.remove(temporary)
+            # Файл снова используется: свежая дата изменения защищает его от
+            # collect_orphan_images (--min-age), пока объект ещё не сохранён
+            os.utime(self.path(name))
+            return name
+        return self._replace(temporary, name)
+
+    def save_as(self, name, content):
+        """Сохраняет файл под именем name (с заменой), без адресации по содержимому."""
+        temporary, _digest = self._write_temporary(content)
+        return self._replace(temporary, name)
+
+
+def property_image_storage():
+    """Хранилище полей-фотографий Property (STORAGES['images'])."""
+    return storages['images']
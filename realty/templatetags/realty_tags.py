@@ -0,0 +1,95 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from realty.images import VARIANTS, variant_name
+
+register = template.Library()
+
+# Наборы вариантов для мест вывода: варианты в srcset, вариант для src, атрибут sizes
+IMAGE_SIZES = {
+    'card': (('thumb', 'card'), 'card', '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'),
+    'detail': (('card', 'detail'), 'detail', '(min-width: 768px) 66vw, 100vw'),
+}
+
+
+def _srcset(image, variants, extension):
+    return ', '.join(
+        f'{image.storage.url(variant_name(image.name, variant, extension))} {VARIANTS[variant]}w'
+        for variant in variants
+    )
+
+
+@register.simple_tag
+def responsive_image(image, size='card', alt='', css_class='', style='', loading='lazy'):
+    """
+    Выводит <picture> с WebP- и JPEG-вариантами изображения и атрибутами
+    srcset/sizes. Если варианты ещё не созданы, выводит оригинал. Изображения
+    загружаются лениво; для первого экрана - loading='eager'.
+
+    Пример: {% responsive_image property.main_image 'card' alt=property.title %}
+    """
+    if not image:
+        return ''
+
+    variants, default, sizes = IMAGE_SIZES[size]
+    attrs = format_html_join(' ', '{}="{}"', [(k, v) for k, v in (('class', css_class), ('style', style)) if v])
+    if not image.storage.exists(variant_name(image.name, default, 'jpg')):
+        return format_html('<img src="{}" alt="{}" loading="{}" {}>', image.url, alt, loading, attrs)
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}" {}>'
+        '</picture>',
+        _srcset(image, variants, 'webp'), sizes,
+        image.storage.url(variant_name(image.name, default, 'jpg')),
+        _srcset(image, variants, 'jpg'), sizes, alt, loading, attrs,
+    )
+
+
+# Варианты карточки объекта: шаблон и его параметры
+CARD_STYLES = {
+    'list': ('realty/includes/property_card.html', {'description_length': 80, 'show_details': True}),
+    'home': ('realty/includes/property_card.html', {'description_length': 60, 'show_details': False}),
+    'row': ('realty/includes/property_row.html', {}),
+}
+
+# Увеличивается при изменении разметки карточек, чтобы не отдавать старый HTML
+CARD_CACHE_VERSION = 1
+
+
+def card_cache_key(property_obj, style):
+    return f'realty:card:{CARD_CACHE_VERSION}:{style}:{property_obj.pk}:{property_obj.updated_at.timestamp()}'
+
+
+@register.simple_tag
+def property_cards(properties, style='list'):
+    """
+    Возвращает список готовых HTML-карточек объектов.
+
+    Карточка кешируется по (pk, updated_at): любое сохранение объекта меняет
+    ключ, как и появление уменьшенных вариантов фото (см. gallery_changed).
+    Все карточки страницы читаются из кеша одним get_many.
+
+    Пример: {% property_cards properties 'list' as cards %}
+    """
+    properties = list(properties)
+    template_name, options = CARD_STYLES[style]
+    keys = [card_cache_key(property_obj, style) for property_obj in properties]
+    cached = cache.get_many(keys)
+
+    cards, missing = [], {}
+    for key, property_obj in zip(keys, properties):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(template_name, {'property': property_obj, **options})
+            missing[key] = html
+        cards.append(mark_safe(html))
+
+    if missing:
+        cache.set_many(missing, getattr(settings, 'PROPERTY_CARD_CACHE_TIMEOUT', 24 * 60 * 60))
+    return cards
@@ -1,14 +1,43 @@
-from django.test import Client, TestCase
-from django.contrib.auth import get_user_model
-
-from realty.models import Property, Realtor, Client
-# from models import Property, Realtor
+import json
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from django.core.exceptions import ValidationError
-from realty.models import Client, Realtor, Property 
-from realty.forms import ClientSignUpForm, RealtorSignUpForm, PropertyForm, LoginForm 
+from django.utils.http import http_date
+from PIL import Image
+
+from realty.benchmarking import summarize
+from realty.cache import get_catalog_version, page_cache_key
+from realty.facets import compute_facets, get_facets
+from realty.forms import ClientSignUpForm, LoginForm, PropertyForm, RealtorSignUpForm
+from realty.geo import MAX_COVER_CELLS, StubGeocoder, filter_radius, geohash_encode, haversine_km, locate_property
+from realty.images import generate_variants, variant_name
+from realty.models import Client, Property, PropertyCard, PropertyImage, Realtor, RealtorPortfolioSummary
+from realty.pagination import KeysetPaginator
+from realty.portfolio import SUMMARY_FIELDS, get_portfolio_summary, portfolio_stats, rebuild_summaries
+from realty.query_plans import explain, plan_problems
+from realty.querybudget import QueryBudgetTestMixin, QueryRecorder, query_shape
+from realty.read_model import refresh_property_cards
+from realty.routers import PrimaryReplicaRouter, pin_primary, routing_context
+from realty.storage import ContentAddressedStorage
+from realty.view_counts import flush_view_counts, view_counter
+from realty.views import PropertyListView
 
 
 User = get_user_model()
@@ -283,3 +312,2198 @@ class LoginFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('username', form.errors) # Ожидаем ошибку для поля username
 
+
+
+class PropertySearchTest(TestCase):
+    """Тесты поиска по каталогу (параметр q в PropertyListView)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='search_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-S1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+        self.by_title = Property.objects.create(
+            title='Квартира у парка', description='Светлая', address='ул. Ленина, 1',
+            price=5000000, area=50, realtor=self.realtor, client=self.client_profile,
+        )
+        self.by_description = Property.objects.create(
+            title='Дом', description='Рядом большой парк', address='ул. Мира, 2',
+            price=7000000, area=90, realtor=self.realtor, client=self.client_profile,
+        )
+        Property.objects.create(
+            title='Офис', description='Центр города', address='пр. Победы, 3',
+            price=9000000, area=120, realtor=self.realtor, client=self.client_profile,
+        )
+
+    def test_search_filters_and_ranks(self):
+        """Находит совпадения во всех полях, совпадение в названии идёт первым."""
+        response = self.client.get(reverse('property_list'), {'q': 'парк'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([obj.pk for obj in response.context['properties']], [self.by_title.pk, self.by_description.pk])
+
+    def test_search_respects_explicit_sort(self):
+        """Явная сортировка имеет приоритет над релевантностью."""
+        response = self.client.get(reverse('property_list'), {'q': 'парк', 'sort': 'price_desc'})
+        self.assertEqual([obj.pk for obj in response.context['properties']], [self.by_description.pk, self.by_title.pk])
+
+
+class PropertyCursorPaginationTest(TestCase):
+    """Тесты курсорной пагинации PropertyListView."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cursor_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-C1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+        # Повторяющиеся цены проверяют разрешение совпадений по pk
+        for i in range(20):
+            Property.objects.create(
+                title=f'Объект {i}', description='', address='', price=1000000 + (i % 4) * 100000,
+                area=40, realtor=self.realtor, client=self.client_profile,
+                property_type='house' if i % 2 else 'apartment',
+            )
+
+    def walk(self, params):
+        """Проходит все страницы вперёд, затем назад; возвращает pk по страницам."""
+        url = reverse('property_list')
+        forward, page = [], self.client.get(url, {**params, 'pagination': 'cursor'}).context['page_obj']
+        forward.append([p.pk for p in page])
+        while page.has_next():
+            page = self.client.get(url, {**params, 'cursor': page.next_cursor}).context['page_obj']
+            forward.append([p.pk for p in page])
+        backward = [[p.pk for p in page]]
+        while page.has_previous():
+            page = self.client.get(url, {**params, 'cursor': page.previous_cursor}).context['page_obj']
+            backward.append([p.pk for p in page])
+        return forward, backward[::-1]
+
+    def test_cursor_pages_match_full_ordering(self):
+        """Курсорные страницы в обе стороны совпадают с полной сортировкой."""
+        orderings = {'': ('-created_at', '-pk'), 'price_asc': ('price', 'pk'), 'price_desc': ('-price', '-pk')}
+        for sort, ordering in orderings.items():
+            for params in ({'sort': sort}, {'sort': sort, 'property_type': 'house'}):
+                with self.subTest(params=params):
+                    expected = list(
+                        Property.objects.filter(**{k: v for k, v in params.items() if k != 'sort'})
+                        .order_by(*ordering).values_list('pk', flat=True)
+                    )
+                    forward, backward = self.walk(params)
+                    self.assertEqual(sum(forward, []), expected)
+                    self.assertEqual(forward, backward)
+
+    def test_cursor_links_keep_filters(self):
+        """Ссылки на следующую страницу сохраняют параметры фильтрации."""
+        response = self.client.get(reverse('property_list'), {'pagination': 'cursor', 'property_type': 'house'})
+        self.assertEqual(response.context['filter_querystring'], 'pagination=cursor&property_type=house')
+        self.assertContains(response, 'property_type=house')
+
+    def test_invalid_cursor_returns_404(self):
+        """Подделанный курсор или курсор другой сортировки даёт 404."""
+        response = self.client.get(reverse('property_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+        page = self.client.get(reverse('property_list'), {'pagination': 'cursor'}).context['page_obj']
+        response = self.client.get(reverse('property_list'), {'cursor': page.next_cursor, 'sort': 'price_asc'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PropertyListQueryPlanTest(TestCase):
+    """Планы запросов PropertyListView: каждая комбинация фильтров и сортировки идёт по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='plan_realtor', password='pwd')
+        realtor = Realtor.objects.create(user=user, license_number='LIC-P1')
+        client_profile = Client.objects.create(user=user, phone='123')
+        types = [code for code, _label in Property.PROPERTY_TYPES]
+        statuses = [code for code, _label in Property.STATUS_CHOICES]
+        Property.objects.bulk_create(
+            Property(
+                title=f'Объект {i}', description='', address='', price=1000000 + i * 1000, area=50,
+                property_type=types[i % len(types)], status=statuses[(i // 4) % len(statuses)],
+                is_featured=(i % 50 == 0), realtor=realtor, client=client_profile,
+            )
+            for i in range(2000)
+        )
+        refresh_property_cards()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexedPlan(self, queryset, label):
+        problems = plan_problems(queryset)
+        self.assertEqual(problems, [], f'{label}:\n' + '\n'.join(explain(queryset)))
+
+    def test_list_filters_and_sorts_use_indexes(self):
+        """Ни одна комбинация не приводит к полному сканированию или сортировке."""
+        factory = RequestFactory()
+        sample = PropertyCard.objects.order_by('pk')[1000]
+        for property_type in ('', 'house'):
+            for status in ('', 'for_sale'):
+                for sort in ('', *PropertyListView.SORT_ORDERINGS):
+                    params = {'property_type': property_type, 'status': status, 'sort': sort}
+                    view = PropertyListView()
+                    view.setup(factory.get(reverse('property_list'), params))
+                    queryset = view.get_queryset()
+                    self.assertIndexedPlan(queryset[:view.paginate_by], f'page {params}')
+
+                    paginator = KeysetPaginator(queryset, view.paginate_by, view.get_ordering_fields())
+                    values = [getattr(sample, field.attname) for field in paginator.fields]
+                    for direction in ('next', 'prev'):
+                        self.assertIndexedPlan(
+                            paginator.page_queryset(direction, values), f'cursor {direction} {params}'
+                        )
+
+    def test_home_featured_uses_partial_index(self):
+        """Рекомендуемые объекты на главной выбираются по частичному индексу."""
+        queryset = PropertyCard.objects.filter(is_featured=True).order_by('-created_at')[:3]
+        self.assertIndexedPlan(queryset, 'featured')
+
+
+class PropertyFacetsTest(TestCase):
+    """Тесты диапазонных фильтров и фасетных счётчиков каталога."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='facet_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-F1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+        data = [
+            ('apartment', 'for_sale', 2500000, 40, 1),
+            ('apartment', 'for_rent', 4000000, 55, 2),
+            ('house', 'for_sale', 8000000, 120, 4),
+            ('house', 'sold', 25000000, 300, 6),
+        ]
+        for property_type, status, price, area, bedrooms in data:
+            Property.objects.create(
+                title=f'{property_type} {price}', description='', address='', property_type=property_type,
+                status=status, price=price, area=area, bedrooms=bedrooms,
+                realtor=self.realtor, client=self.client_profile,
+            )
+
+    def counts(self, facets, name):
+        return {item['value']: item['count'] for item in facets[name]}
+
+    def test_range_filters(self):
+        """Фильтры по цене, площади и спальням ограничивают выдачу."""
+        response = self.client.get(reverse('property_list'), {
+            'price_min': '3000000', 'price_max': '10000000', 'area_min': '50', 'bedrooms_min': '3',
+        })
+        self.assertEqual([p.title for p in response.context['properties']], ['house 8000000'])
+
+    def test_invalid_range_value_is_ignored(self):
+        """Некорректное значение диапазона не ломает страницу и игнорируется."""
+        response = self.client.get(reverse('property_list'), {'price_min': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['properties']), 4)
+
+    def test_facets_exclude_own_filter(self):
+        """Фасет учитывает все фильтры, кроме собственного."""
+        facets = compute_facets(Property.objects.all(), {'property_type': 'house', 'price_max': '10000000'})
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(self.counts(facets, 'property_type'), {'apartment': 2, 'house': 1, 'commercial': 0, 'land': 0})
+        self.assertEqual(self.counts(facets, 'status'), {'for_sale': 1, 'for_rent': 0, 'sold': 0, 'rented': 0})
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [0, 0, 1, 0, 1])
+
+    def test_price_on_bucket_boundary_counted_once(self):
+        """Цена на границе диапазонов попадает только в верхний; ссылка диапазона даёт те же объекты."""
+        Property.objects.create(
+            title='apartment 5000000', description='', address='', price=5000000, area=50,
+            realtor=self.realtor, client=self.client_profile,
+        )
+        facets = compute_facets(Property.objects.all(), {})
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 1, 2, 0, 1])
+        self.assertEqual(sum(bucket['count'] for bucket in facets['price']), facets['total'])
+
+        response = self.client.get(reverse('property_list'))
+        for bucket in response.context['facets']['price']:
+            with self.subTest(bucket=bucket['label']):
+                page = self.client.get(reverse('property_list') + '?' + bucket['querystring'])
+                self.assertEqual(len(page.context['properties']), bucket['count'])
+
+    def test_facets_single_query_and_cached(self):
+        """Все фасеты - один запрос; повторный вызов берётся из кеша."""
+        filters = {'status': 'for_sale'}
+        with self.assertNumQueries(1):
+            first = get_facets(Property.objects.all(), filters)
+        with self.assertNumQueries(0):
+            second = get_facets(Property.objects.all(), dict(filters))
+        self.assertEqual(first, second)
+
+
+def make_test_image(name='photo.jpg', size=(1600, 1000)):
+    """Загружаемый файл с JPEG-изображением заданного размера."""
+    buffer = BytesIO()
+    Image.new('RGB', size, (120, 160, 200)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class PropertyImageVariantsTest(TestCase):
+    """Тесты уменьшенных вариантов фотографий объектов."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='image_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-I1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_form_upload_generates_variants(self):
+        """Загрузка через PropertyForm создаёт JPEG- и WebP-варианты всех размеров."""
+        form = PropertyForm(
+            data={
+                'title': 'С фото', 'description': 'Описание', 'price': 1000000, 'bedrooms': 1,
+                'bathrooms': 1, 'area': 30, 'address': 'ул. Мира, 1', 'property_type': 'apartment',
+                'status': 'for_sale',
+            },
+            files={'main_image': make_test_image()},
+        )
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        instance = form.save(commit=False)
+        instance.realtor, instance.client = self.realtor, self.client_profile
+        instance.save()
+        form.save_m2m()
+        form.save_gallery()
+
+        name = instance.main_image.name
+        for variant, width in (('thumb', 320), ('card', 640), ('detail', 1280)):
+            for extension in ('jpg', 'webp'):
+                with default_storage.open(variant_name(name, variant, extension)) as variant_file:
+                    self.assertEqual(Image.open(variant_file).width, width)
+
+    def test_responsive_image_tag(self):
+        """Тег выводит srcset с вариантами, а без вариантов - оригинал."""
+        name = default_storage.save('properties/tag.jpg', make_test_image())
+        image = Property(main_image=name).main_image
+        template = Template("{% load realty_tags %}{% responsive_image image 'card' alt='Фото' %}")
+
+        html = template.render(Context({'image': image}))
+        self.assertNotIn('srcset', html)
+        self.assertIn(image.url, html)
+
+        generate_variants(name)
+        html = template.render(Context({'image': image}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('tag__thumb.webp 320w', html)
+        self.assertIn('tag__card.jpg 640w', html)
+
+    def test_backfill_command(self):
+        """Команда создаёт варианты для уже загруженных фотографий."""
+        name = default_storage.save('properties/main/old.jpg', make_test_image())
+        Property.objects.create(
+            title='Старый', description='', address='', price=1, area=1,
+            realtor=self.realtor, client=self.client_profile, main_image=name,
+        )
+        call_command('generate_image_variants', workers=1, stdout=StringIO())
+        self.assertTrue(default_storage.exists(variant_name(name, 'detail', 'webp')))
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Тесты хранилища фотографий с дедупликацией по содержимому."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='dedup_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-D1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, title, **files):
+        form = PropertyForm(
+            data={
+                'title': title, 'description': 'Описание', 'price': 1000000, 'bedrooms': 1,
+                'bathrooms': 1, 'area': 30, 'address': 'ул. Мира, 1', 'property_type': 'apartment',
+                'status': 'for_sale',
+            },
+            files=files,
+        )
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        instance = form.save(commit=False)
+        instance.realtor, instance.client = self.realtor, self.client_profile
+        instance.save()
+        form.save_m2m()
+        form.save_gallery()
+        return instance
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _dirs, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_same_photo_is_stored_once(self):
+        first = self.upload('Первый', main_image=make_test_image('a.jpg'))
+        second = self.upload('Второй', main_image=make_test_image('b.JPG'), gallery=make_test_image('c.jpg'))
+        self.assertEqual(first.main_image.name, second.main_image.name)
+        self.assertEqual(second.images.get().image.name, first.main_image.name)
+        self.assertRegex(first.main_image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        # Оригинал и шесть вариантов, без временных файлов
+        self.assertEqual(len(self.stored_files()), 7)
+
+        other = self.upload('Третий', main_image=make_test_image('a.jpg', size=(800, 600)))
+        self.assertNotEqual(other.main_image.name, first.main_image.name)
+
+    def test_variants_and_cover_use_images_storage(self):
+        """Команда вариантов и обложка карточки работают с хранилищем фотографий, а не с default_storage."""
+        default_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, default_root, ignore_errors=True)
+        default = {**settings.STORAGES['default'], 'OPTIONS': {'location': default_root}}
+        with override_settings(STORAGES={**settings.STORAGES, 'default': default}):
+            property_obj = self.upload('Объект', main_image=make_test_image())
+            name = property_obj.main_image.name
+            storage = property_obj.main_image.storage
+            storage.delete(variant_name(name, 'detail', 'webp'))
+            call_command('generate_image_variants', workers=1, stdout=StringIO())
+            self.assertTrue(storage.exists(variant_name(name, 'detail', 'webp')))
+            card = PropertyCard.objects.get(pk=property_obj.pk)
+            self.assertIsInstance(card.main_image.storage, ContentAddressedStorage)
+            self.assertTrue(card.main_image.storage.exists(card.main_image.name))
+        self.assertEqual(os.listdir(default_root), [])
+
+    def test_deleting_property_keeps_shared_file(self):
+        first = self.upload('Первый', main_image=make_test_image())
+        second = self.upload('Второй', main_image=make_test_image())
+        first.delete()
+        self.assertTrue(second.main_image.storage.exists(second.main_image.name))
+        response = self.client.get(second.main_image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_collect_orphan_images(self):
+        kept = self.upload('Оставшийся', main_image=make_test_image())
+        removed = self.upload('Удалённый', main_image=make_test_image(size=(640, 480)))
+        removed_name = removed.main_image.name
+        removed.delete()
+
+        call_command('collect_orphan_images', stdout=StringIO())
+        self.assertEqual(len(self.stored_files()), 14)
+
+        call_command('collect_orphan_images', min_age=0, dry_run=True, stdout=StringIO())
+        self.assertEqual(len(self.stored_files()), 14)
+
+        out = StringIO()
+        call_command('collect_orphan_images', min_age=0, stdout=out)
+        self.assertIn('Удалено файлов: 7', out.getvalue())
+        storage = kept.main_image.storage
+        self.assertTrue(storage.exists(kept.main_image.name))
+        self.assertTrue(storage.exists(variant_name(kept.main_image.name, 'card', 'webp')))
+        self.assertFalse(storage.exists(removed_name))
+
+    def test_collect_orphan_images_keeps_reuploaded_files(self):
+        """Старый файл без ссылок, загруженный снова во время сборки, не удаляется."""
+        orphan = self.upload('Удалённый', main_image=make_test_image())
+        name = orphan.main_image.name
+        orphan.delete()
+        storage = ContentAddressedStorage()
+        old = time.time() - 48 * 3600
+        for stored in self.stored_files():
+            os.utime(os.path.join(self.media_root, stored), (old, old))
+
+        # Повторная загрузка того же содержимого обновляет дату изменения файла
+        self.assertEqual(storage.save('again.jpg', make_test_image()), name)
+        call_command('collect_orphan_images', stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(storage.exists(variant_name(name, 'card', 'webp')))
+
+        # Ссылка появилась после того, как команда собрала список используемых файлов
+        os.utime(storage.path(name), (old, old))
+        walk = os.walk
+
+        def walk_after_upload(root):
+            self.upload('Новый', gallery=make_test_image())
+            os.utime(storage.path(name), (old, old))
+            return walk(root)
+
+        with mock.patch('realty.management.commands.collect_orphan_images.os.walk', walk_after_upload):
+            call_command('collect_orphan_images', stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(storage.exists(variant_name(name, 'card', 'webp')))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_image_uploads', distinct=2, copies=3, size_kb=4, json=True, stdout=out)
+        plain, deduplicated = json.loads(out.getvalue())
+        self.assertEqual((plain['files'], deduplicated['files']), (6, 2))
+        self.assertEqual(deduplicated['saved_percent'], 66.7)
+
+
+class PropertyGalleryTest(TestCase):
+    """Тесты галереи фотографий объекта."""
+
+    def setUp(self):
+        cache.clear()
+        view_counter.discard()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='gallery_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-G1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+
+    def tearDown(self):
+        view_counter.discard()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def form_data(self):
+        return {
+            'title': 'Галерея', 'description': 'Описание', 'price': 1000000, 'bedrooms': 1,
+            'bathrooms': 1, 'area': 30, 'address': 'ул. Мира, 1', 'property_type': 'apartment',
+            'status': 'for_sale', 'client': self.client_profile.pk,
+        }
+
+    def create(self, **files):
+        form = PropertyForm(data=self.form_data(), files=files)
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        instance = form.save(commit=False)
+        instance.realtor, instance.client = self.realtor, self.client_profile
+        instance.save()
+        form.save_m2m()
+        form.save_gallery()
+        return instance
+
+    def photos(self, count):
+        return [make_test_image(f'{i}.jpg', size=(400 + i, 300)) for i in range(count)]
+
+    def test_form_appends_photos_in_order(self):
+        property_obj = self.create(main_image=make_test_image(), gallery=self.photos(2))
+        names = [image.image.name for image in property_obj.images.all()]
+        self.assertEqual([image.position for image in property_obj.images.all()], [0, 1])
+
+        form = PropertyForm(
+            data=self.form_data(), files={'gallery': [make_test_image('new.jpg', size=(500, 500))]},
+            instance=property_obj,
+        )
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        form.save()
+        self.assertEqual([image.position for image in property_obj.images.all()], [0, 1, 2])
+        self.assertEqual([image.image.name for image in property_obj.images.all()][:2], names)
+
+    def test_card_cover_is_main_image_or_first_photo(self):
+        with_main = self.create(main_image=make_test_image(), gallery=self.photos(2))
+        without_main = self.create(gallery=self.photos(2))
+        self.assertEqual(PropertyCard.objects.get(pk=with_main.pk).main_image.name, with_main.main_image.name)
+        first = without_main.images.first()
+        self.assertEqual(PropertyCard.objects.get(pk=without_main.pk).main_image.name, first.image.name)
+
+        updated_at = Property.objects.get(pk=without_main.pk).updated_at
+        first.delete()
+        self.assertEqual(
+            PropertyCard.objects.get(pk=without_main.pk).main_image.name, without_main.images.first().image.name,
+        )
+        self.assertGreater(Property.objects.get(pk=without_main.pk).updated_at, updated_at)
+
+    def test_catalog_does_not_load_gallery(self):
+        self.create(gallery=self.photos(3))
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse('property_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([sql for sql in recorder.queries if 'realty_propertyimage' in sql])
+
+    def test_detail_loads_gallery_with_one_query(self):
+        property_obj = self.create(main_image=make_test_image(), gallery=self.photos(3))
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse('property_detail', args=[property_obj.pk]))
+        self.assertEqual(len([sql for sql in recorder.queries if 'realty_propertyimage' in sql]), 1)
+        slides = response.context['slides']
+        self.assertEqual(
+            [image.name for image in slides],
+            [property_obj.main_image.name, *(image.image.name for image in property_obj.images.all())],
+        )
+        content = response.content.decode()
+        self.assertEqual(content.count('loading="eager"'), 1)
+        self.assertEqual(content.count('carousel-item'), 4)
+
+    async def test_async_detail_shows_gallery(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        property_obj = await sync_to_async(self.create)(gallery=self.photos(2))
+        response = await AsyncClient().get(reverse('async_property_detail', args=[property_obj.pk]))
+        self.assertEqual(len(response.context['slides']), 2)
+
+    def test_deleting_property_with_gallery(self):
+        property_obj = self.create(gallery=self.photos(2))
+        with QueryRecorder() as recorder:
+            property_obj.delete()
+        self.assertFalse(PropertyImage.objects.exists())
+        # Фотографии удаляются каскадно, без пересборки карточки удаляемого объекта
+        self.assertFalse([sql for sql in recorder.queries if 'INSERT' in sql and 'realty_propertycard' in sql])
+
+
+class CatalogPageCacheTest(TestCase):
+    """Тесты кеширования страниц главной и каталога."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cache_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-K1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+        self.property = Property.objects.create(
+            title='Кешируемый объект', description='', address='', price=1000000, area=40,
+            realtor=self.realtor, client=self.client_profile, is_featured=True,
+        )
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Повторный анонимный запрос не обращается к БД."""
+        for url in (reverse('home'), reverse('property_list')):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_querystring_is_normalized(self):
+        """Порядок параметров и пустые значения не влияют на ключ кеша."""
+        factory = RequestFactory()
+        first = factory.get('/properties/?status=for_sale&sort=price_asc&q=')
+        second = factory.get('/properties/?sort=price_asc&status=for_sale')
+        self.assertEqual(page_cache_key(first), page_cache_key(second))
+
+    def test_model_changes_invalidate_cache(self):
+        """Изменение объекта или риелтора сразу меняет версию каталога."""
+        self.client.get(reverse('property_list'))
+        version = get_catalog_version()
+
+        self.property.title = 'Новое название'
+        self.property.save()
+        self.assertGreater(get_catalog_version(), version)
+        self.assertContains(self.client.get(reverse('property_list')), 'Новое название')
+
+        version = get_catalog_version()
+        self.realtor.delete()
+        self.assertGreater(get_catalog_version(), version)
+        self.assertNotContains(self.client.get(reverse('property_list')), 'Новое название')
+
+    def test_version_bumped_after_card_rebuild(self):
+        """Новая версия каталога появляется, когда карточка уже пересобрана."""
+        titles = []
+        with mock.patch(
+            'realty.signals.bump_catalog_version',
+            side_effect=lambda: titles.append(PropertyCard.objects.get(pk=self.property.pk).title),
+        ):
+            self.property.title = 'Новое название'
+            self.property.save()
+        self.assertEqual(titles, ['Новое название'])
+
+    def test_realtor_name_change_invalidates_cache(self):
+        """Смена имени пользователя-риелтора обновляет главную и ETag API риелтора."""
+        self.user.first_name = 'Ольга'
+        self.user.save()
+        self.assertContains(self.client.get(reverse('home')), 'Ольга')
+        url = reverse('api_realtor_detail', args=[self.realtor.pk])
+        etag = self.client.get(url)['ETag']
+
+        self.user.first_name = 'Мария'
+        self.user.save()
+        home = self.client.get(reverse('home'))
+        self.assertContains(home, 'Мария')
+        self.assertNotContains(home, 'Ольга')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], 'Мария')
+
+    def test_authenticated_pages_not_cached(self):
+        """Страницы авторизованных пользователей не кешируются."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        self.assertIsNone(cache.get(page_cache_key(RequestFactory().get(reverse('home')))))
+        self.assertContains(self.client.get(reverse('home')), 'cache_realtor')
+
+    def test_cached_page_keeps_view_headers(self):
+        """Ответ из кеша содержит те же заголовки, что и ответ представления."""
+        from asgiref.sync import async_to_sync
+        from django.contrib.auth.models import AnonymousUser
+        from realty.cache import cache_catalog_page
+
+        calls = []
+
+        def respond():
+            calls.append(1)
+            response = HttpResponse('страница', content_type='text/html; charset=utf-8')
+            response['Content-Language'] = 'ru'
+            response['Cache-Control'] = 'max-age=60'
+            response['Vary'] = 'Accept-Language'
+            return response
+
+        @cache_catalog_page
+        def view(request):
+            return respond()
+
+        @cache_catalog_page
+        async def async_view(request):
+            return respond()
+
+        async def auser():
+            return AnonymousUser()
+
+        for path, call in (('/sync/', view), ('/async/', async_to_sync(async_view))):
+            with self.subTest(path=path):
+                responses = []
+                for _ in range(2):
+                    request = RequestFactory().get(path)
+                    request.user, request.auser = AnonymousUser(), auser
+                    responses.append(call(request))
+                miss, hit = responses
+                self.assertEqual(len(calls), 1)
+                calls.clear()
+                self.assertEqual(hit.content, miss.content)
+                self.assertEqual(dict(hit.items()), dict(miss.items()))
+
+
+class PropertyCardCacheTest(TestCase):
+    """Тесты кеширования HTML карточек объектов."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='card_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-D1')
+        self.client_profile = Client.objects.create(user=self.user, phone='123')
+        self.property = Property.objects.create(
+            title='Карточка', description='Описание', address='', price=1000000, area=40,
+            realtor=self.realtor, client=self.client_profile,
+        )
+        self.template = Template(
+            "{% load realty_tags %}{% property_cards properties style as cards %}{% for card in cards %}{{ card }}{% endfor %}"
+        )
+
+    def render(self, style='list'):
+        return self.template.render(Context({'properties': [self.property], 'style': style}))
+
+    def test_card_cached_until_property_saved(self):
+        """Карточка берётся из кеша, пока не изменится updated_at."""
+        self.assertIn('Карточка', self.render())
+
+        self.property.title = 'Без сохранения'
+        self.assertIn('Карточка', self.render())
+
+        self.property.save()
+        self.assertIn('Без сохранения', self.render())
+
+    def test_styles_cached_separately(self):
+        """Разные варианты карточки не пересекаются в кеше."""
+        self.assertIn('card-body', self.render('list'))
+        self.assertIn('<tr>', self.render('row'))
+        self.assertIn(reverse('property_edit', args=[self.property.pk]), self.render('row'))
+
+    def test_card_rerendered_when_variants_appear(self):
+        """Карточка, закешированная до создания вариантов фото, перерисовывается с <picture>."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            name = ContentAddressedStorage().save('photo.jpg', make_test_image())
+            Property.objects.filter(pk=self.property.pk).update(main_image=name)
+            refresh_property_cards([self.property.pk])
+
+            def render_card():
+                card = PropertyCard.objects.get(pk=self.property.pk)
+                return self.template.render(Context({'properties': [card], 'style': 'list'}))
+
+            self.assertNotIn('<picture>', render_card())
+            call_command('generate_image_variants', workers=1, stdout=StringIO())
+            self.assertIn('<picture>', render_card())
+
+
+class ViewQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Бюджеты запросов представлений: число запросов не растёт с количеством данных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(4):
+            user = User.objects.create_user(
+                username=f'budget_realtor{i}', password='pwd', first_name='Имя', last_name=f'Фамилия{i}'
+            )
+            realtor = Realtor.objects.create(user=user, license_number=f'LIC-B{i}')
+            client_profile = Client.objects.create(user=user, phone='123')
+            for j in range(5):
+                Property.objects.create(
+                    title=f'Объект {i}-{j}', description='', address='ул. Мира', price=1000000 + j, area=40,
+                    realtor=realtor, client=client_profile, is_featured=True,
+                )
+            cls.users.append(user)
+        # Сводки риелторов уже построены - кабинет читает их одной строкой
+        rebuild_summaries()
+        cls.realtor = Realtor.objects.get(user=cls.users[0])
+        cls.property = cls.realtor.properties.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_views(self):
+        """Главная, каталог и карточка объекта укладываются в бюджет для анонимного посетителя."""
+        budgets = [
+            (reverse('home'), 2),
+            (reverse('property_list'), 3),
+            (reverse('property_list') + '?pagination=cursor', 2),
+            (reverse('property_detail', args=[self.property.pk]), 3),
+        ]
+        for url, budget in budgets:
+            with self.subTest(url=url), self.assertQueryBudget(budget):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_realtor_views(self):
+        """Страницы риелтора укладываются в бюджет."""
+        self.client.force_login(self.users[0])
+        # Первый запрос сохраняет профиль пользователя в сессию
+        self.client.get(reverse('home'))
+        budgets = [
+            (reverse('realtor_dashboard'), 4),
+            (reverse('property_add'), 2),
+            (reverse('property_edit', args=[self.property.pk]), 3),
+            (reverse('property_delete', args=[self.property.pk]), 3),
+        ]
+        for url, budget in budgets:
+            with self.subTest(url=url), self.assertQueryBudget(budget):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True)
+    def test_detail_view_signed_in(self):
+        """Карточка объекта для вошедшего пользователя: сессия, пользователь, карточка, галерея."""
+        self.client.force_login(self.users[1])
+        self.client.get(reverse('home'))
+        # В строгом режиме превышение бюджета представления - исключение
+        with self.assertQueryBudget(4):
+            self.assertEqual(self.client.get(reverse('property_detail', args=[self.property.pk])).status_code, 200)
+
+    def property_data(self, **overrides):
+        return {
+            'title': 'Новый объект', 'description': '-', 'property_type': 'apartment', 'status': 'for_sale',
+            'address': 'ул. Мира', 'price': 100, 'area': 30, 'bedrooms': 1, 'bathrooms': 1, **overrides,
+        }
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True)
+    def test_realtor_first_visit_and_writes(self):
+        """Первый вход в кабинет без сводки, первый объект риелтора, правка и удаление - в строгом режиме."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        user = User.objects.create_user(username='budget_newcomer', password='pwd')
+        Realtor.objects.create(user=user, license_number='LIC-BNEW')
+        self.client.force_login(user)
+        self.client.get(reverse('home'))
+        self.assertFalse(RealtorPortfolioSummary.objects.filter(realtor__user=user).exists())
+
+        # Сессия, пользователь и бюджет представления
+        with self.assertQueryBudget(2 + 5):
+            self.assertEqual(self.client.get(reverse('realtor_dashboard')).status_code, 200)
+        # Первый объект: создаётся клиентский профиль риелтора
+        with self.assertQueryBudget(2 + 12):
+            response = self.client.post(reverse('property_add'), self.property_data(
+                main_image=make_test_image('main.jpg'), gallery=[make_test_image('g1.jpg'), make_test_image('g2.jpg')],
+            ))
+        self.assertEqual(response.status_code, 302)
+        property_obj = Property.objects.get(realtor__user=user)
+        self.client.get(reverse('home'))
+
+        with self.assertQueryBudget(2 + 10):
+            response = self.client.post(
+                reverse('property_edit', args=[property_obj.pk]),
+                self.property_data(price=200, main_image=make_test_image('new.jpg'), gallery=[make_test_image('g3.jpg')]),
+            )
+        self.assertEqual(response.status_code, 302)
+        with self.assertQueryBudget(2 + 6):
+            response = self.client.post(reverse('property_delete', args=[property_obj.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(RealtorPortfolioSummary.objects.get(realtor__user=user).listing_count, 0)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True, VIEW_COUNT_MAX_PENDING=1)
+    def test_detail_view_flushing_view_counts(self):
+        """Запись буфера просмотров на запросе посетителя не входит в бюджет карточки."""
+        url = reverse('property_detail', args=[self.property.pk])
+        with self.assertQueryBudget(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(view_counter.pending(), {})
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.view_count, 1)
+
+    def test_recorder_detects_repeated_queries(self):
+        """Одинаковые по форме запросы в цикле распознаются как N+1."""
+        with QueryRecorder() as recorder:
+            for realtor in Realtor.objects.all():
+                realtor.user.get_full_name()
+        self.assertEqual(len(recorder.repeated_shapes()), 1)
+        self.assertEqual(
+            query_shape('SELECT 1 FROM t WHERE id IN (%s, %s) AND name = \'x\''),
+            'SELECT ? FROM t WHERE id IN (...) AND name = ?',
+        )
+
+
+class CatalogApiTest(QueryBudgetTestMixin, TestCase):
+    """Тесты JSON API каталога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='api_realtor', password='pwd', first_name='Анна', last_name='Смирнова')
+        cls.realtor = Realtor.objects.create(user=cls.user, license_number='LIC-A1', experience_years=7)
+        client_profile = Client.objects.create(user=cls.user, phone='123')
+        for i in range(5):
+            Property.objects.create(
+                title=f'API {i}', description='Длинное описание', address='ул. Мира', price=1000000 * (i + 1),
+                area=40, property_type='house' if i % 2 else 'apartment',
+                realtor=cls.realtor, client=client_profile,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sparse_fieldset_selects_only_requested_columns(self):
+        """fields= ограничивает и ответ, и столбцы в SQL."""
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse('api_property_list'), {'fields': 'id,price', 'sort': 'price_asc'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(set(results[0]), {'id', 'price'})
+        self.assertEqual([row['price'] for row in results][:2], ['1000000.00', '2000000.00'])
+        self.assertNotIn('description', recorder.queries[0])
+        # Как и HTML-каталог, API читает карточки с их индексами сортировок
+        self.assertIn('"realty_propertycard"', recorder.queries[0])
+
+    def test_cursor_pagination_and_filters(self):
+        """Курсоры next/previous обходят отфильтрованный список."""
+        url = reverse('api_property_list')
+        first = self.client.get(url, {'property_type': 'apartment', 'limit': 2, 'fields': 'title'}).json()
+        self.assertEqual([row['title'] for row in first['results']], ['API 4', 'API 2'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['title'] for row in second['results']], ['API 0'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_etag_revalidation(self):
+        """If-None-Match с актуальным ETag даёт 304 без запросов к БД."""
+        url = reverse('api_property_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        with self.assertQueryBudget(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Property.objects.filter(pk=Property.objects.first().pk).first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_popular_etag_changes_when_view_counts_are_flushed(self):
+        """Запись просмотров меняет порядок popular без новой версии каталога - и его ETag."""
+        url = reverse('api_property_list')
+        popular = self.client.get(url, {'sort': 'popular'})['ETag']
+        newest = self.client.get(url)['ETag']
+
+        view_counter.discard()
+        view_counter.record(Property.objects.order_by('pk').first().pk)
+        flush_view_counts()
+
+        response = self.client.get(url, {'sort': 'popular'}, HTTP_IF_NONE_MATCH=popular)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'API 0')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=newest).status_code, 304)
+
+    def test_realtor_endpoints(self):
+        """Риелторы: поля из связанной модели User и фильтр по опыту."""
+        response = self.client.get(reverse('api_realtor_list'), {'fields': 'id,last_name', 'experience_min': 5})
+        self.assertEqual(response.json()['results'], [{'id': self.realtor.pk, 'last_name': 'Смирнова'}])
+        detail = self.client.get(reverse('api_realtor_detail', args=[self.realtor.pk]), {'fields': 'license_number'})
+        self.assertEqual(detail.json(), {'license_number': 'LIC-A1'})
+
+    def test_unknown_field_is_rejected(self):
+        """Неизвестное поле - ошибка 400."""
+        response = self.client.get(reverse('api_property_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_errors_have_no_etag(self):
+        """Ответы 400 и 404 не получают ETag, 304 повторяет ETag успешного ответа."""
+        response = self.client.get(reverse('api_property_list'), {'fields': 'id,password'})
+        self.assertNotIn('ETag', response)
+        response = self.client.get(reverse('api_property_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', response.json())
+        self.assertNotIn('ETag', response)
+
+        url = reverse('api_property_detail', args=[Property.objects.first().pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+class ImportPropertiesCommandTest(TestCase):
+    """Тесты команды массового импорта import_properties."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='import_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-IMP', phone='555')
+        buyer = User.objects.create_user(username='buyer', password='pwd')
+        self.buyer = Client.objects.create(user=buyer, phone='777')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def write_file(self, name, content):
+        path = f'{self.tmpdir}/{name}'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_properties', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_reports_row_errors_without_aborting_batch(self):
+        """Ошибочные строки попадают в отчёт, остальные строки пачки сохраняются."""
+        path = self.write_file('listings.csv', (
+            'title,description,property_type,status,address,price,area,bedrooms,bathrooms,realtor,client\n'
+            'Дом у озера,Описание,house,for_sale,ул. Озёрная 1,5000000,120,4,2,LIC-IMP,\n'
+            'Без цены,Описание,house,for_sale,ул. Озёрная 2,,120,4,2,LIC-IMP,\n'
+            'Чужой риелтор,Описание,house,for_sale,ул. Озёрная 3,100,120,4,2,NOPE,\n'
+            'Квартира,Описание,apartment,for_rent,ул. Мира 5,30000,45,1,1,LIC-IMP,buyer\n'
+        ))
+        version = get_catalog_version()
+        # Риелторы, клиенты, создание профиля риелтора, один INSERT, карточки
+        # каталога (2 запроса) и пересчёт сводок (3 запроса) - без запросов на строку
+        with QueryRecorder() as recorder:
+            out, err = self.run_import(path, '--batch-size', '10')
+
+        self.assertEqual(len(recorder.queries), 11)
+        self.assertIn('импортировано: 2', out)
+        self.assertIn('Строка 2: price', err)
+        self.assertIn('Строка 3: риелтор', err)
+        house = Property.objects.get(title='Дом у озера')
+        self.assertEqual(house.realtor, self.realtor)
+        self.assertEqual(house.client.user, self.user)
+        self.assertEqual(Property.objects.get(title='Квартира').client, self.buyer)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_jsonl_import_in_several_batches(self):
+        """JSONL читается построчно и сохраняется пачками заданного размера."""
+        rows = [
+            {'title': f'Участок {i}', 'description': 'Описание', 'property_type': 'land', 'status': 'for_sale',
+             'address': 'Поле', 'price': 100000 + i, 'area': 600, 'bedrooms': 0, 'bathrooms': 0, 'realtor': 'LIC-IMP'}
+            for i in range(5)
+        ]
+        path = self.write_file('listings.jsonl', '\n'.join(json.dumps(row) for row in rows))
+        out, err = self.run_import(path, '--batch-size', '2')
+        self.assertEqual(err, '')
+        self.assertIn('Строк: 5, импортировано: 5', out)
+        self.assertEqual(Property.objects.filter(property_type='land').count(), 5)
+        self.assertEqual(Client.objects.filter(user=self.user).count(), 1)
+
+    def test_jsonl_malformed_lines_are_reported_and_skipped(self):
+        """Некорректный JSON и значения, не являющиеся объектами, не прерывают импорт."""
+        row = {'title': 'Участок', 'description': 'Описание', 'property_type': 'land', 'status': 'for_sale',
+               'address': 'Поле', 'price': 100000, 'area': 600, 'bedrooms': 0, 'bathrooms': 0, 'realtor': 'LIC-IMP'}
+        path = self.write_file('listings.jsonl', '\n'.join([
+            json.dumps(row), '{"title": "обрыв', '1', '[]', json.dumps({**row, 'title': 'После ошибок'}),
+        ]))
+        out, err = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Строк: 5, импортировано: 2, с ошибками: 3', out)
+        self.assertIn('Строка 2: некорректный JSON', err)
+        self.assertIn('Строка 3: ожидается JSON-объект', err)
+        self.assertIn('Строка 4: ожидается JSON-объект', err)
+        self.assertTrue(Property.objects.filter(title='После ошибок').exists())
+
+
+class GeoSearchTest(TestCase):
+    """Тесты поиска объектов по расстоянию."""
+
+    CENTER = (55.7558, 37.6173)
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='geo_realtor', password='pwd')
+        cls.realtor = Realtor.objects.create(user=user, license_number='LIC-GEO')
+        cls.client_profile = Client.objects.create(user=user, phone='1')
+        # Сетка точек вокруг центра с шагом ~1 км
+        objects = []
+        for i in range(-10, 11):
+            for j in range(-10, 11):
+                obj = Property(
+                    title=f'Гео {i} {j}', description='-', property_type='apartment', address=f'Точка {i} {j}',
+                    price=1000, area=30, realtor=cls.realtor, client=cls.client_profile,
+                    latitude=cls.CENTER[0] + i * 0.009, longitude=cls.CENTER[1] + j * 0.016,
+                )
+                locate_property(obj)
+                objects.append(obj)
+        Property.objects.bulk_create(objects)
+        refresh_property_cards()
+
+    def test_geohash_encode(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_radius_filter_matches_exact_distance(self):
+        """Префильтр по ячейкам не теряет объекты: результат совпадает с точным расчётом."""
+        lat, lng = self.CENTER
+        for radius in (0.5, 3, 7.5):
+            expected = {
+                obj.pk for obj in Property.objects.all()
+                if haversine_km(lat, lng, obj.latitude, obj.longitude) <= radius
+            }
+            found = set(filter_radius(Property.objects.all(), lat, lng, radius).values_list('pk', flat=True))
+            self.assertEqual(found, expected)
+            self.assertTrue(found)
+
+    def test_radius_query_uses_cell_ranges(self):
+        """Запрос ограничен небольшим числом диапазонов по geo_cell."""
+        queryset = filter_radius(Property.objects.all(), *self.CENTER, 3)
+        sql = str(queryset.query)
+        self.assertIn('geo_cell', sql)
+        self.assertLessEqual(sql.count('"geo_cell" >='), MAX_COVER_CELLS)
+
+    def test_list_view_radius_and_bbox_filters(self):
+        response = self.client.get(reverse('property_list'), {
+            'lat': self.CENTER[0], 'lng': self.CENTER[1], 'radius_km': 1.2,
+        })
+        titles = {obj.title for obj in response.context['properties']}
+        self.assertIn('Гео 0 0', titles)
+        self.assertIn('Гео 1 0', titles)
+        self.assertNotIn('Гео 2 0', titles)
+
+        lat, lng = self.CENTER
+        response = self.client.get(reverse('property_list'), {'bbox': f'{lat - 0.001},{lng - 0.001},{lat + 0.001},{lng + 0.001}'})
+        self.assertEqual([obj.title for obj in response.context['properties']], ['Гео 0 0'])
+
+    @override_settings(
+        GEOCODER='realty.geo.StubGeocoder',
+        GEOCODER_STUB_LOCATIONS={'Москва, Красная площадь, 1': (55.7539, 37.6208)},
+    )
+    def test_geocoding_on_save_and_address_change(self):
+        """Координаты определяются по адресу и пересчитываются при смене адреса в форме."""
+        obj = Property.objects.create(
+            title='Новый', description='-', property_type='house', address='Москва, Красная площадь, 1',
+            price=1, area=1, realtor=self.realtor, client=self.client_profile,
+        )
+        self.assertEqual((obj.latitude, obj.longitude), (55.7539, 37.6208))
+        self.assertEqual(obj.geo_cell, geohash_encode(55.7539, 37.6208))
+
+        data = {
+            'title': 'Новый', 'description': '-', 'property_type': 'house', 'status': 'for_sale',
+            'address': 'Москва, Тверская, 1', 'price': 1, 'area': 1, 'bedrooms': 0, 'bathrooms': 0,
+            'latitude': obj.latitude, 'longitude': obj.longitude, 'client': self.client_profile.pk,
+        }
+        form = PropertyForm(data=data, instance=obj)
+        self.assertTrue(form.is_valid(), form.errors)
+        obj = form.save()
+        self.assertEqual((obj.latitude, obj.longitude), StubGeocoder().geocode('Москва, Тверская, 1'))
+        self.assertNotEqual(obj.geo_cell, geohash_encode(55.7539, 37.6208))
+
+    @override_settings(GEOCODER=None)
+    def test_without_geocoder_coordinates_stay_empty(self):
+        """Без геокодера координаты не выдумываются, и объект не попадает в поиск по расстоянию."""
+        obj = Property.objects.create(
+            title='Без координат', description='-', property_type='house', address='Москва, Тверская, 1',
+            price=1, area=1, realtor=self.realtor, client=self.client_profile,
+        )
+        self.assertIsNone(obj.latitude)
+        self.assertIsNone(obj.longitude)
+        self.assertEqual(obj.geo_cell, '')
+        self.assertFalse(filter_radius(Property.objects.filter(pk=obj.pk), *self.CENTER, 50).exists())
+
+        out, err = StringIO(), StringIO()
+        call_command('geocode_properties', stdout=out, stderr=err)
+        self.assertIn('GEOCODER', err.getvalue())
+        obj.refresh_from_db()
+        self.assertIsNone(obj.latitude)
+
+
+class RealtorPortfolioSummaryTest(TestCase):
+    """Тесты статистики портфеля риелтора и её инкрементального обновления."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-ST')
+        self.client_profile = Client.objects.create(user=self.user, phone='1')
+        other_user = User.objects.create_user(username='stats_other', password='pwd')
+        self.other = Realtor.objects.create(user=other_user, license_number='LIC-ST2')
+
+    def create(self, realtor=None, **kwargs):
+        data = {
+            'title': 'Объект', 'description': '-', 'property_type': 'apartment', 'address': 'ул. Ленина',
+            'price': Decimal('1000000'), 'area': Decimal('50'), 'realtor': realtor or self.realtor,
+            'client': self.client_profile,
+        }
+        data.update(kwargs)
+        return Property.objects.create(**data)
+
+    def assertSummaryMatchesAggregate(self, realtor):
+        summary = RealtorPortfolioSummary.objects.get(realtor=realtor)
+        expected = portfolio_stats(Property.objects.filter(realtor=realtor))
+        for field in SUMMARY_FIELDS:
+            self.assertEqual(getattr(summary, field), getattr(expected, field), field)
+        return summary
+
+    def test_portfolio_stats_single_query(self):
+        self.create(status='for_sale', price=Decimal('3000000'), area=Decimal('60'))
+        self.create(status='sold', price=Decimal('1000000'), area=Decimal('40'))
+        with self.assertNumQueries(1):
+            stats = portfolio_stats(Property.objects.filter(realtor=self.realtor))
+        self.assertEqual(stats.listing_count, 2)
+        self.assertEqual(stats.for_sale_count, 1)
+        self.assertEqual(stats.sold_count, 1)
+        self.assertEqual(stats.average_price, Decimal('2000000.00'))
+        self.assertEqual(stats.price_per_sqm, Decimal('40000.00'))
+
+    def test_first_visit_builds_summary_with_portfolio_stats(self):
+        """Первое обращение: проверка сводки, агрегат portfolio_stats и вставка строки."""
+        self.create(status='sold', price=Decimal('2000000'))
+        self.create(realtor=self.other)
+        realtor = Realtor.objects.get(pk=self.realtor.pk)
+        with self.assertNumQueries(3):
+            summary = get_portfolio_summary(realtor)
+        self.assertEqual((summary.listing_count, summary.sold_count), (1, 1))
+        with self.assertNumQueries(0):
+            self.assertIs(get_portfolio_summary(realtor), summary)
+        self.assertSummaryMatchesAggregate(self.realtor)
+        self.assertFalse(RealtorPortfolioSummary.objects.filter(realtor=self.other).exists())
+
+    def test_signals_update_summary_incrementally(self):
+        first = self.create()
+        self.assertEqual(get_portfolio_summary(self.realtor).listing_count, 1)
+        self.create(status='for_rent', price=Decimal('50000'), area=Decimal('30'))
+        self.assertSummaryMatchesAggregate(self.realtor)
+
+        # Изменение статуса и цены: один UPDATE сводки без агрегации
+        first = Property.objects.get(pk=first.pk)
+        first.status = 'sold'
+        first.price = Decimal('900000')
+        with QueryRecorder() as recorder:
+            first.save()
+        self.assertFalse(any('SUM(' in sql.upper() for sql in recorder.queries))
+        self.assertSummaryMatchesAggregate(self.realtor)
+
+        # Передача объекта другому риелтору
+        first.realtor = self.other
+        first.save()
+        self.assertEqual(self.assertSummaryMatchesAggregate(self.realtor).listing_count, 1)
+        get_portfolio_summary(self.other)
+        first.delete()
+        self.assertEqual(self.assertSummaryMatchesAggregate(self.other).listing_count, 0)
+
+    def test_unknown_previous_state_invalidates_summary(self):
+        obj = self.create()
+        get_portfolio_summary(self.realtor)
+        Property.objects.only('pk', 'title', 'realtor').get(pk=obj.pk).save()
+        self.assertFalse(RealtorPortfolioSummary.objects.filter(realtor=self.realtor).exists())
+        self.assertEqual(get_portfolio_summary(self.realtor).listing_count, 1)
+
+    def test_rebuild_command(self):
+        self.create()
+        self.create(realtor=self.other)
+        Property.objects.update(price=Decimal('5'))
+        call_command('rebuild_portfolio_summaries', stdout=StringIO())
+        self.assertEqual(self.assertSummaryMatchesAggregate(self.realtor).total_price, Decimal('5'))
+        self.assertSummaryMatchesAggregate(self.other)
+
+    def test_dashboard_shows_statistics(self):
+        self.create(price=Decimal('2000000'), area=Decimal('40'))
+        get_portfolio_summary(self.realtor)
+        self.client.login(username='stats_realtor', password='pwd')
+        response = self.client.get(reverse('realtor_dashboard'))
+        self.assertEqual(response.context['portfolio'].price_per_sqm, Decimal('50000.00'))
+        self.assertContains(response, 'Цена за м²')
+
+
+class AsyncCatalogViewsTest(TestCase):
+    """Тесты асинхронных версий страниц каталога."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='async_realtor', password='pwd', first_name='Ольга', last_name='Орлова')
+        cls.realtor = Realtor.objects.create(user=user, license_number='LIC-AS')
+        client_profile = Client.objects.create(user=user, phone='1')
+        cls.properties = [
+            Property.objects.create(
+                title=f'Асинхронный {i}', description='-', property_type='house' if i % 2 else 'apartment',
+                address='ул. Мира', price=1000 * (i + 1), area=40, realtor=cls.realtor, client=client_profile,
+                is_featured=i < 2,
+            )
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_home_matches_sync_view(self):
+        response = await self.async_client.get(reverse('async_home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [obj.pk for obj in response.context['featured_properties']],
+            [obj.pk for obj in self.properties[1::-1]],
+        )
+        self.assertContains(response, 'Ольга')
+
+    async def test_list_filters_and_pagination(self):
+        url = reverse('async_property_list')
+        response = await self.async_client.get(url, {'property_type': 'house', 'sort': 'price_asc'})
+        self.assertEqual(response.context['paginator'].count, 6)
+        self.assertEqual(response.context['properties'][0].title, 'Асинхронный 1')
+        self.assertIn('facets', response.context)
+
+        first = await self.async_client.get(url, {'pagination': 'cursor'})
+        self.assertEqual(len(first.context['properties']), 9)
+        second = await self.async_client.get(url, {'cursor': first.context['page_obj'].next_cursor})
+        self.assertEqual([obj.title for obj in second.context['properties']], [f'Асинхронный {i}' for i in (2, 1, 0)])
+
+        self.assertEqual((await self.async_client.get(url, {'page': 5})).status_code, 404)
+
+    async def test_detail(self):
+        response = await self.async_client.get(reverse('async_property_detail', args=[self.properties[0].pk]))
+        self.assertContains(response, 'Асинхронный 0')
+        missing = await self.async_client.get(reverse('async_property_detail', args=[0]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_page_cache(self):
+        url = reverse('async_home')
+        await self.async_client.get(url)
+        cached = await self.async_client.get(url)
+        # Ответ из кеша отдаётся без отрисовки шаблона
+        self.assertIsNone(cached.context)
+        self.assertContains(cached, 'Асинхронный 0')
+
+    def test_benchmark_summary(self):
+        summary = summarize([0.01] * 98 + [0.5, 1.0], elapsed=2)
+        self.assertEqual(summary['rps'], 50.0)
+        self.assertEqual(summary['p50_ms'], 10.0)
+        self.assertEqual(summary['p99_ms'], 500.0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    """Правила выбора БД роутером (без обращения к реплике)."""
+
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_outside_request_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_public_reads_use_replica_until_write(self):
+        with routing_context() as state:
+            self.assertEqual(self.router.db_for_read(Property), 'replica')
+            self.assertEqual(self.router.db_for_read(Realtor), 'replica')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+            self.assertEqual(self.router.db_for_write(Property), 'default')
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+
+    def test_pinned_context_and_transactions_use_primary(self):
+        with routing_context(pinned=True):
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+        with routing_context():
+            pin_primary()
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+        with routing_context(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaLagCacheTest(SimpleTestCase):
+    """
+    Отставание реплики: промах кеша сразу после изменения каталога читает
+    основную БД, иначе под новой версией сохранились бы старые данные.
+    """
+
+    databases = {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+
+    def read(self):
+        # Реплика «отстаёт»: всё, что прочитано с неё, - старые данные
+        return 'свежие' if self.router.db_for_read(Property) == 'default' else 'старые'
+
+    def test_page_filled_from_primary_after_change(self):
+        from django.contrib.auth.models import AnonymousUser
+        from realty.cache import CATALOG_CHANGED_KEY, bump_catalog_version, cache_catalog_page
+
+        @cache_catalog_page
+        def view(request):
+            return HttpResponse(self.read())
+
+        def get():
+            request = RequestFactory().get('/catalog/')
+            request.user = AnonymousUser()
+            with routing_context():
+                return view(request).content.decode()
+
+        self.assertEqual(get(), 'старые')
+        bump_catalog_version()
+        self.assertEqual(get(), 'свежие')
+        # Из кеша отдаётся страница, прочитанная с основной БД
+        self.assertEqual(get(), 'свежие')
+
+        # Когда реплики догнали, промахи снова читают реплику
+        cache.delete(CATALOG_CHANGED_KEY)
+        cache.clear()
+        self.assertEqual(get(), 'старые')
+
+    def test_facets_filled_from_primary_after_change(self):
+        from realty.cache import bump_catalog_version
+
+        def compute(queryset, filters):
+            return self.read()
+
+        with mock.patch('realty.facets.compute_facets', side_effect=compute):
+            with routing_context():
+                self.assertEqual(get_facets(Property.objects.all(), {}), 'старые')
+            bump_catalog_version()
+            with routing_context():
+                self.assertEqual(get_facets(Property.objects.all(), {}), 'свежие')
+
+
+@skipUnless('replica' in settings.DATABASES, 'нужна вторая БД с алиасом replica')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryReplicaRoutingTest(TransactionTestCase):
+    """
+    Маршрутизация с двумя отдельными БД (например, двумя файлами SQLite):
+    реплика не получает данных, поэтому видно, откуда читает страница.
+    """
+
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='replica_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-RP')
+        self.property = Property.objects.create(
+            title='На основной БД', description='-', property_type='house', address='ул. Мира',
+            price=1, area=1, realtor=self.realtor, client=Client.objects.create(user=self.user, phone='1'),
+        )
+        get_portfolio_summary(self.realtor)
+
+    def list_titles(self):
+        response = self.client.get(reverse('property_list'))
+        return [obj.title for obj in response.context['properties']]
+
+    def test_public_pages_read_from_replica(self):
+        self.assertEqual(self.list_titles(), [])
+        self.assertEqual(self.client.get(reverse('property_detail', args=[self.property.pk])).status_code, 404)
+
+    def test_realtor_sees_own_write_and_edit_views_use_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('realtor_dashboard'))
+        self.assertEqual(len(response.context['properties']), 1)
+
+        response = self.client.post(reverse('property_edit', args=[self.property.pk]), {
+            'title': 'Изменённый', 'description': '-', 'property_type': 'house', 'status': 'for_sale',
+            'address': 'ул. Мира', 'price': 2, 'area': 1, 'bedrooms': 0, 'bathrooms': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('realty_primary', response.cookies)
+        # Cookie закрепляет последующие чтения за основной БД
+        self.assertEqual(self.list_titles(), ['Изменённый'])
+
+        self.client.cookies.pop('realty_primary')
+        self.assertEqual(self.list_titles(), [])
+
+
+class PropertyCardReadModelTest(QueryBudgetTestMixin, TestCase):
+    """Тесты денормализованных карточек объектов."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='card_realtor', password='pwd', first_name='Пётр', last_name='Сидоров', email='p@example.com',
+        )
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-C1', phone='+7 900')
+        self.property = Property.objects.create(
+            title='Карточка', description='Описание', property_type='house', address='ул. Мира',
+            price=500, area=25, realtor=self.realtor, client=Client.objects.create(user=self.user, phone='1'),
+        )
+
+    def test_card_follows_property_realtor_and_user(self):
+        card = PropertyCard.objects.get(pk=self.property.pk)
+        self.assertEqual((card.title, card.realtor_name, card.realtor_phone), ('Карточка', 'Пётр Сидоров', '+7 900'))
+
+        self.property.title = 'Новое название'
+        self.property.save()
+        self.realtor.phone = '+7 911'
+        self.realtor.save()
+        self.user.last_name = 'Петров'
+        self.user.save()
+        card.refresh_from_db()
+        self.assertEqual((card.title, card.realtor_name, card.realtor_phone), ('Новое название', 'Пётр Петров', '+7 911'))
+
+        self.property.delete()
+        self.assertFalse(PropertyCard.objects.exists())
+
+    def test_catalog_reads_cards_without_joins(self):
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse('property_list'), {'property_type': 'house'})
+        self.assertEqual([card.pk for card in response.context['properties']], [self.property.pk])
+        card_queries = [sql for sql in recorder.queries if 'realty_propertycard' in sql]
+        self.assertTrue(card_queries)
+        self.assertFalse([sql for sql in card_queries if 'JOIN' in sql])
+
+    def test_detail_page_shows_realtor_contacts_from_card(self):
+        self.client.force_login(self.user)
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse('property_detail', args=[self.property.pk]))
+        self.assertContains(response, 'Пётр Сидоров')
+        self.assertContains(response, 'mailto:p@example.com')
+        self.assertFalse([sql for sql in recorder.queries if 'realty_propertycard' in sql and 'JOIN' in sql])
+
+    def test_refresh_command_rebuilds_cards(self):
+        Property.objects.update(price=700)
+        call_command('refresh_property_cards', stdout=StringIO())
+        self.assertEqual(PropertyCard.objects.get(pk=self.property.pk).price, 700)
+
+
+class PropertyViewCountTest(TestCase):
+    """Тесты буферизованных счётчиков просмотров."""
+
+    def setUp(self):
+        cache.clear()
+        view_counter.discard()
+        user = User.objects.create_user(username='views_realtor', password='pwd')
+        realtor = Realtor.objects.create(user=user, license_number='LIC-V1', phone='1')
+        client = Client.objects.create(user=user, phone='1')
+        self.properties = [
+            Property.objects.create(
+                title=f'Объект {i}', description='Описание', property_type='apartment', address=f'ул. {i}',
+                price=100 + i, area=30, realtor=realtor, client=client,
+            )
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def view(self, property_obj, times=1):
+        for _ in range(times):
+            self.client.get(reverse('property_detail', args=[property_obj.pk]))
+
+    def test_views_are_buffered_and_flushed_with_one_update_per_increment(self):
+        first, second, third = self.properties
+        with QueryRecorder() as recorder:
+            self.view(first, 2)
+            self.view(second, 2)
+            self.view(third)
+        self.assertFalse([sql for sql in recorder.queries if sql.startswith('UPDATE')])
+        self.assertEqual(view_counter.pending(), {first.pk: 2, second.pk: 2, third.pk: 1})
+
+        with QueryRecorder() as recorder:
+            self.assertEqual(flush_view_counts(), 3)
+        updates = [sql for sql in recorder.queries if sql.startswith('UPDATE')]
+        # Два различных приращения (+1 и +2) для Property и PropertyCard
+        self.assertEqual(len(updates), 4)
+        self.assertEqual(view_counter.pending(), {})
+        self.assertEqual(
+            list(Property.objects.order_by('pk').values_list('view_count', flat=True)), [2, 2, 1],
+        )
+        self.assertEqual(
+            list(PropertyCard.objects.order_by('pk').values_list('view_count', flat=True)), [2, 2, 1],
+        )
+
+    def test_full_buffer_is_flushed_by_request(self):
+        with override_settings(VIEW_COUNT_MAX_PENDING=2):
+            self.view(self.properties[0])
+            self.assertEqual(Property.objects.get(pk=self.properties[0].pk).view_count, 0)
+            self.view(self.properties[1])
+        self.assertEqual(view_counter.pending(), {})
+        self.assertEqual(Property.objects.filter(view_count=1).count(), 2)
+
+    def test_save_does_not_overwrite_flushed_views(self):
+        property_obj = Property.objects.get(pk=self.properties[0].pk)
+        self.view(property_obj, 3)
+        flush_view_counts()
+        property_obj.title = 'Новое название'
+        property_obj.save()
+        self.assertEqual(Property.objects.get(pk=property_obj.pk).view_count, 3)
+        self.assertEqual(PropertyCard.objects.get(pk=property_obj.pk).view_count, 3)
+
+    def test_save_never_writes_counters(self):
+        """Обычное сохранение - UPDATE всех полей, кроме счётчика просмотров (и через форму тоже)."""
+        property_obj = Property.objects.get(pk=self.properties[0].pk)
+        received = []
+
+        def receiver(sender, update_fields, **kwargs):
+            received.append(update_fields)
+
+        post_save.connect(receiver, sender=Property)
+        self.addCleanup(post_save.disconnect, receiver, sender=Property)
+        with QueryRecorder() as recorder:
+            property_obj.save()
+        update, = [sql for sql in recorder.queries if sql.startswith('UPDATE "realty_property"')]
+        self.assertNotIn('view_count', update)
+        self.assertIn('title', received[0])
+        self.assertNotIn('view_count', received[0])
+
+        # Объект формы загружен до сброса буфера просмотров
+        form = PropertyForm(instance=Property.objects.get(pk=property_obj.pk))
+        self.view(property_obj, 2)
+        flush_view_counts()
+        data = {**form.initial, 'title': 'Из формы', 'main_image': '', 'latitude': '', 'longitude': ''}
+        form = PropertyForm(data=data, instance=form.instance)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Property.objects.get(pk=property_obj.pk).view_count, 2)
+
+        # Строку удалили параллельно - как и без защиты счётчика, save() вставляет объект
+        property_obj.refresh_from_db()
+        Property.objects.filter(pk=property_obj.pk).delete()
+        received.clear()
+        property_obj.save()
+        self.assertEqual(Property.objects.get(pk=property_obj.pk).view_count, 2)
+        self.assertEqual(received, [None])
+
+    def test_catalog_sorts_by_popularity(self):
+        first, second, third = self.properties
+        self.view(second, 3)
+        self.view(third)
+        flush_view_counts()
+        response = self.client.get(reverse('property_list'), {'sort': 'popular'})
+        self.assertEqual([card.pk for card in response.context['properties']], [second.pk, third.pk, first.pk])
+
+
+class ScaleBenchmarkCommandsTest(TestCase):
+    """Тесты генератора синтетических данных и замера страниц."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_scale_creates_catalog_with_cards_and_summaries(self):
+        with QueryRecorder() as recorder:
+            call_command('seed_scale', realtors=2, clients=3, properties=25, batch_size=10, seed=1, stdout=StringIO())
+        self.assertEqual(Realtor.objects.count(), 2)
+        # Риелторам создаются собственные клиентские профили
+        self.assertEqual(Client.objects.count(), 5)
+        self.assertEqual(Property.objects.count(), 25)
+        self.assertEqual(PropertyCard.objects.count(), 25)
+        self.assertEqual(
+            sum(RealtorPortfolioSummary.objects.values_list('listing_count', flat=True)), 25,
+        )
+        self.assertFalse(Property.objects.filter(geo_cell='').exists())
+        # Вставка пачками: число запросов не растёт с числом объектов
+        self.assertLess(len(recorder), 40)
+        user = Realtor.objects.first().user
+        self.assertTrue(user.check_password('seed-password'))
+
+    def test_benchmark_views_reports_latency_and_queries(self):
+        call_command('seed_scale', realtors=1, clients=1, properties=5, seed=2, stdout=StringIO())
+        out = StringIO()
+        call_command(
+            'benchmark_views', pages=['home', 'property_detail', 'property_edit', 'api_realtor_detail'],
+            requests=3, concurrency=1, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['properties'], 5)
+        rows = {row['page']: row for row in report['results']}
+        self.assertEqual(set(rows), {'home', 'property_detail', 'property_edit', 'api_realtor_detail'})
+        for row in rows.values():
+            self.assertEqual((row['requests'], row['errors'], row['statuses']), (3, 0, [200]))
+            self.assertGreater(row['queries_max'], 0)
+            self.assertIsNotNone(row['p99_ms'])
+
+    def test_benchmark_views_rejects_unknown_page(self):
+        call_command('seed_scale', realtors=1, clients=0, properties=1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_views', pages=['missing'], stdout=StringIO())
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    """Тесты заголовка Server-Timing и выборочного профилирования."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='timing_realtor', password='pwd')
+        realtor = Realtor.objects.create(user=user, license_number='LIC-T1', phone='1')
+        self.property = Property.objects.create(
+            title='Замер', description='Описание', property_type='house', address='ул. Мира',
+            price=100, area=20, realtor=realtor, client=Client.objects.create(user=user, phone='1'),
+        )
+
+    def metrics(self, response):
+        metrics = {}
+        for item in response['Server-Timing'].split(', '):
+            name, *params = item.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_header_and_log_report_sql_templates_and_total(self):
+        with self.assertLogs('realty.timing', 'INFO') as logs:
+            response = self.client.get(reverse('property_list'))
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'app', 'total'})
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']),
+            float(metrics['db']['dur']) + float(metrics['tpl']['dur']) - 0.1,
+        )
+        record = logs.records[-1]
+        self.assertEqual((record.path, record.status), (reverse('property_list'), 200))
+        self.assertGreater(record.queries, 0)
+        self.assertEqual(metrics['db']['desc'], f'"SQL ({record.queries})"')
+
+    def test_async_view_queries_are_counted(self):
+        with self.assertLogs('realty.timing', 'INFO') as logs:
+            response = self.client.get(reverse('async_property_detail', args=[self.property.pk]))
+        self.assertIn('Server-Timing', response)
+        self.assertGreaterEqual(logs.records[-1].queries, 1)
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_sampled_request_saves_profiles(self):
+        import pstats
+        import tracemalloc
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(SERVER_TIMING_PROFILE_RATE=1, SERVER_TIMING_PROFILE_DIR=directory):
+            with self.assertLogs('realty.timing', 'INFO') as logs:
+                self.client.get(reverse('property_detail', args=[self.property.pk]))
+        profiles = sorted(logs.records[-1].profiles)
+        self.assertEqual([path.rsplit('.', 1)[-1] for path in profiles], ['prof', 'tracemalloc'])
+        self.assertTrue(pstats.Stats(profiles[0]).total_calls)
+        self.assertTrue(tracemalloc.Snapshot.load(profiles[1]).traces)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_unwritable_profile_dir_does_not_break_request(self):
+        """Ошибка записи профиля пишется в журнал, а запрос отвечает как обычно."""
+        import tracemalloc
+
+        descriptor, path = tempfile.mkstemp()
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        # Вместо каталога - обычный файл: mkdir завершается OSError
+        with override_settings(SERVER_TIMING_PROFILE_RATE=1, SERVER_TIMING_PROFILE_DIR=os.path.join(path, 'profiles')):
+            with self.assertLogs('realty.timing', 'ERROR') as logs:
+                response = self.client.get(reverse('property_detail', args=[self.property.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Не удалось сохранить профиль', logs.output[0])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_overlapping_profiles_share_tracemalloc(self):
+        """Первый завершившийся запрос не останавливает трассировку второго."""
+        import tracemalloc
+        from realty.timing import RequestProfiler
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        request = RequestFactory().get('/')
+        with override_settings(SERVER_TIMING_PROFILERS=('tracemalloc',), SERVER_TIMING_PROFILE_DIR=directory):
+            first, second = RequestProfiler(request), RequestProfiler(request)
+            first.__enter__()
+            second.__enter__()
+            first.__exit__(None, None, None)
+            self.assertTrue(tracemalloc.is_tracing())
+            data = [bytearray(1024) for _ in range(10)]
+            second.__exit__(None, None, None)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertTrue(tracemalloc.Snapshot.load(second.paths[0]).traces)
+        del data
+
+
+class SignupPipelineTest(TestCase):
+    """Тесты транзакционной регистрации клиентов и риелторов."""
+
+    def setUp(self):
+        self.existing = User.objects.create_user(username='Taken', email='Taken@Example.com', password='pwd')
+        Realtor.objects.create(user=self.existing, license_number='LIC-TAKEN', phone='1')
+
+    def client_data(self, **overrides):
+        return {
+            'username': 'new_client', 'user_email': 'new@example.com',
+            'password': 'strongpassword123', 'password2': 'strongpassword123',
+            'first_name': 'Иван', 'last_name': 'Иванов', 'phone': '89001234567', **overrides,
+        }
+
+    def realtor_data(self, **overrides):
+        return {
+            'username': 'new_realtor', 'email': 'realtor@example.com',
+            'password1': '13re4a4ltorpwd', 'password2': '13re4a4ltorpwd',
+            'first_name': 'Анна', 'last_name': 'Петрова', 'license_number': 'LIC-NEW', 'phone': '1',
+            **overrides,
+        }
+
+    def writes(self, recorder):
+        return [sql for sql in recorder.queries if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    def test_client_signup_inserts_user_and_client_only(self):
+        form = ClientSignUpForm(data=self.client_data())
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        with QueryRecorder() as recorder:
+            user = form.save()
+        self.assertEqual(len(self.writes(recorder)), 2)
+        self.assertTrue(Client.objects.filter(user=user).exists())
+
+    def test_realtor_signup_inserts_user_and_realtor_only(self):
+        form = RealtorSignUpForm(data=self.realtor_data())
+        self.assertTrue(form.is_valid(), form.errors.as_text())
+        with QueryRecorder() as recorder:
+            user = form.save()
+        self.assertEqual(len(self.writes(recorder)), 2)
+        self.assertEqual(Realtor.objects.get(user=user).license_number, 'LIC-NEW')
+
+    def test_duplicates_are_rejected_by_form_validation(self):
+        form = ClientSignUpForm(data=self.client_data(username='taken', user_email='TAKEN@example.com'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+        self.assertIn('user_email', form.errors)
+
+        form = RealtorSignUpForm(data=self.realtor_data(email='taken@example.COM', license_number='LIC-TAKEN'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+        self.assertIn('license_number', form.errors)
+
+    def test_failed_profile_insert_leaves_no_orphan_user(self):
+        form = ClientSignUpForm(data=self.client_data())
+        self.assertTrue(form.is_valid())
+        with mock.patch('realty.forms.Client.objects.create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                form.save()
+        self.assertFalse(User.objects.filter(username='new_client').exists())
+
+    def test_concurrent_duplicate_is_reported_as_form_error(self):
+        with mock.patch('realty.forms.Realtor.objects.create', side_effect=IntegrityError):
+            response = self.client.post(reverse('realtor_signup'), self.realtor_data())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertFalse(User.objects.filter(username='new_realtor').exists())
+
+    def test_benchmark_signup_command(self):
+        out = StringIO()
+        call_command('benchmark_signup', requests=2, concurrency=1, fast_hasher=True, json=True, stdout=out)
+        rows = {row['kind']: row for row in json.loads(out.getvalue())}
+        self.assertEqual(set(rows), {'client', 'realtor'})
+        for row in rows.values():
+            self.assertEqual((row['requests'], row['errors']), (2, 0))
+            self.assertGreaterEqual(row['writes_avg'], 2)
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+
+
+class RequestProfileTest(TestCase):
+    """Тесты роли и профиля пользователя, хранимых в сессии."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='profile_realtor', password='pwd')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-P1', phone='+7 900')
+        rebuild_summaries([self.realtor.pk])
+
+    def test_profile_is_resolved_once_and_kept_in_session(self):
+        self.client.force_login(self.user)
+        with QueryRecorder() as first:
+            self.client.get(reverse('realtor_dashboard'))
+        with QueryRecorder() as second:
+            response = self.client.get(reverse('realtor_dashboard'))
+        self.assertContains(response, reverse('realtor_dashboard'))
+        profile_queries = [sql for sql in first.queries if 'LEFT OUTER JOIN "realty_client"' in sql]
+        self.assertEqual(len(profile_queries), 1)
+        self.assertFalse([sql for sql in second.queries if 'realty_client' in sql])
+        self.assertEqual(len(second), len(first) - 2)
+
+    def test_profile_change_invalidates_session_copy(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('property_add'))
+        self.assertIsNone(self.client.session['_realty_profile']['client_id'])
+
+        client_profile = Client.objects.create(user=self.user, phone='1')
+        self.client.get(reverse('property_add'))
+        self.assertEqual(self.client.session['_realty_profile']['client_id'], client_profile.pk)
+
+        self.realtor.delete()
+        response = self.client.get(reverse('property_add'))
+        self.assertRedirects(response, reverse('home'))
+
+    def test_non_realtor_is_redirected_with_message(self):
+        user = User.objects.create_user(username='profile_client', password='pwd')
+        Client.objects.create(user=user, phone='1')
+        self.client.force_login(user)
+        response = self.client.get(reverse('property_edit', args=[1]), follow=True)
+        self.assertRedirects(response, reverse('home'))
+        self.assertContains(response, 'У вас нет прав для редактирования объектов.')
+        self.assertNotContains(response, 'Панель Риелтора')
+
+    def test_anonymous_user_is_sent_to_login(self):
+        response = self.client.get(reverse('property_add'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(settings.LOGIN_URL))
+
+    def test_first_property_creates_realtor_client_profile(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('property_add'), {
+            'title': 'Новый', 'description': 'Описание', 'property_type': 'house', 'status': 'for_sale',
+            'address': 'ул. Мира', 'price': '100', 'area': '20', 'bedrooms': '1', 'bathrooms': '1',
+        })
+        self.assertRedirects(response, reverse('realtor_dashboard'))
+        property_obj = Property.objects.get(title='Новый')
+        self.assertEqual(property_obj.realtor, self.realtor)
+        self.assertEqual((property_obj.client.user, property_obj.client.phone), (self.user, '+7 900'))
+
+
+class StaticMediaServingTest(TestCase):
+    """Тесты сборки сжатой статики и отдачи файлов StaticMediaMiddleware."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.media_root = tempfile.mkdtemp()
+        for directory in (self.source, self.static_root, self.media_root):
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+
+        os.makedirs(os.path.join(self.source, 'css'))
+        self.css = b'.card { color: #333; margin: 0 auto; }\n' * 50
+        with open(os.path.join(self.source, 'css', 'site.css'), 'wb') as file:
+            file.write(self.css)
+        with open(os.path.join(self.source, 'logo.png'), 'wb') as file:
+            file.write(b'\x89PNG' + bytes(range(256)) * 4)
+
+        os.makedirs(os.path.join(self.media_root, 'docs'))
+        self.media = bytes(range(256)) * 8
+        with open(os.path.join(self.media_root, 'docs', 'plan.bin'), 'wb') as file:
+            file.write(self.media)
+
+        overrides = override_settings(
+            STATICFILES_DIRS=[self.source], STATIC_ROOT=self.static_root, MEDIA_ROOT=self.media_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'realty.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_collectstatic_fingerprints_and_precompresses(self):
+        import gzip
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        css_name = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(css_name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, css_name + '.gz')))
+        png_name = staticfiles_storage.stored_name('logo.png')
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, png_name + '.gz')))
+
+        url = staticfiles_storage.url('css/site.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.css)
+
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(plain.streaming_content), self.css)
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+
+        # Файл без хеша в имени кешируется ненадолго
+        unhashed = self.client.get('/static/css/site.css')
+        self.assertEqual(unhashed['Cache-Control'], f'public, max-age={settings.STATIC_MAX_AGE}')
+
+    def test_precompressed_file_requested_directly(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        response = self.client.get(staticfiles_storage.url('css/site.css') + '.gz', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_debug_serves_static_from_source(self):
+        """При DEBUG статика берётся из STATICFILES_DIRS, а не из устаревшей копии в STATIC_ROOT."""
+        os.makedirs(os.path.join(self.static_root, 'css'))
+        with open(os.path.join(self.static_root, 'css', 'site.css'), 'wb') as file:
+            file.write(b'/* stale */')
+        with open(os.path.join(self.static_root, 'stale.css'), 'wb') as file:
+            file.write(b'/* stale */')
+        with override_settings(DEBUG=True):
+            response = self.client.get('/static/css/site.css')
+            self.assertEqual(b''.join(response.streaming_content), self.css)
+            self.assertEqual(self.client.get('/static/stale.css').status_code, 404)
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_media_etag_revalidation(self):
+        url = '/media/docs/plan.bin'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.media)
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.MEDIA_MAX_AGE}')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        with self.assertNumQueries(0):
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.client.head(url)['Content-Length'], str(len(self.media)))
+
+    def test_media_ranges(self):
+        url = '/media/docs/plan.bin'
+        size = len(self.media)
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{size}')
+        self.assertEqual(b''.join(response.streaming_content), self.media[10:20])
+
+        suffix = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), self.media[-5:])
+
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={size}-').status_code, 416)
+
+        # Файл изменился (другой ETag) - If-Range отдаёт его целиком
+        stale = self.client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_paths_outside_roots_are_not_served(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/docs/').status_code, 404)
+        self.assertEqual(self.client.get('/media/missing.bin').status_code, 404)
+
+    def test_hidden_files_are_not_served(self):
+        """Временные файлы записи (.upload-*) и прочие скрытые файлы - 404."""
+        os.makedirs(os.path.join(self.media_root, 'images'))
+        with open(os.path.join(self.media_root, 'images', '.upload-x'), 'wb') as file:
+            file.write(b'partial')
+        os.makedirs(os.path.join(self.media_root, '.git'))
+        with open(os.path.join(self.media_root, '.git', 'config'), 'wb') as file:
+            file.write(b'secret')
+        self.assertEqual(self.client.get('/media/images/.upload-x').status_code, 404)
+        self.assertEqual(self.client.get('/media/images/%2Eupload-x').status_code, 404)
+        self.assertEqual(self.client.get('/media/.git/config').status_code, 404)
+
+    async def test_served_under_asgi(self):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().get('/media/docs/plan.bin', headers={'Range': 'bytes=0-3'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-3/{len(self.media)}')
+
+
+class ConditionalDetailTest(TestCase):
+    """Тесты условных GET-запросов к детальной странице объекта."""
+
+    def setUp(self):
+        cache.clear()
+        view_counter.discard()
+        self.user = User.objects.create_user(username='etag_realtor', password='pwd', first_name='Анна')
+        self.realtor = Realtor.objects.create(user=self.user, license_number='LIC-E1', phone='1')
+        client = Client.objects.create(user=self.user, phone='1')
+        self.property = Property.objects.create(
+            title='Объект', description='Описание', property_type='apartment', address='ул. 1',
+            price=100, area=30, realtor=self.realtor, client=client,
+        )
+        self.url = reverse('property_detail', args=[self.property.pk])
+
+    def tearDown(self):
+        view_counter.discard()
+
+    def test_revalidation_answers_304_with_one_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertEqual(view_counter.pending(), {self.property.pk: 2})
+
+        by_date = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_property_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.property.price = 200
+        self.property.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_realtor_profile_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.realtor.phone = '2'
+        self.realtor.save()
+        after_realtor = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(after_realtor.status_code, 200)
+
+        self.user.first_name = 'Мария'
+        self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=after_realtor['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Мария')
+
+    def test_rebuilt_card_takes_new_realtor_version(self):
+        user = User.objects.create_user(username='etag_other', password='pwd')
+        other = Realtor.objects.create(user=user, license_number='LIC-E2', phone='2')
+        self.property.realtor = other
+        self.property.save()
+        card = PropertyCard.objects.get(pk=self.property.pk)
+        self.assertEqual(card.realtor_updated_at, other.updated_at)
+
+    def test_signed_in_user_gets_full_page(self):
+        anonymous = self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=anonymous['ETag'], HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_relogin_renders_fresh_csrf_token(self):
+        """После повторного входа страница с формой выхода не отдаётся из кеша браузера."""
+        self.client.login(username='etag_realtor', password='pwd')
+        first = self.client.get(self.url)
+        self.client.logout()
+        self.client.login(username='etag_realtor', password='pwd')
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600))
+        self.assertEqual(response.status_code, 200)
+        token = response.context['csrf_token']
+        self.assertNotEqual(str(token), str(first.context['csrf_token']))
+        self.assertContains(response, f'value="{token}"')
+        # Выход по форме со страницы проходит проверку CSRF
+        client = self.client_class(enforce_csrf_checks=True)
+        client.cookies = self.client.cookies
+        response = client.post(reverse('logout'), {'csrfmiddlewaretoken': str(token)})
+        self.assertNotEqual(response.status_code, 403)
+        self.assertNotIn('_auth_user_id', client.session)
+
+    def test_missing_property(self):
+        self.assertEqual(self.client.get(reverse('property_detail', args=[0])).status_code, 404)
+
+    async def test_async_detail(self):
+        from django.test import AsyncClient
+
+        url = reverse('async_property_detail', args=[self.property.pk])
+        response = await AsyncClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        revalidated = await AsyncClient().get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class AdminScalabilityTest(TestCase):
+    """Тесты админки для больших таблиц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('site_admin', 'admin@example.com', 'pwd')
+        cls.realtors = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'agent{i}', password='pwd', first_name=f'Агент{i}')
+            realtor = Realtor.objects.create(user=user, license_number=f'LIC-AD{i}', phone=str(i))
+            client = Client.objects.create(user=user, phone=f'+7{i}')
+            cls.realtors.append(realtor)
+            for j in range(4):
+                Property.objects.create(
+                    title=f'Квартира {i}-{j}', description='Просторная квартира', property_type='apartment',
+                    address=f'ул. Садовая, {j}', price=100 + j, area=30, realtor=realtor, client=client,
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_estimated_count_paginator(self):
+        from realty.pagination import EstimatedCountPaginator
+
+        queryset = Property.objects.order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 12)
+        with mock.patch.object(EstimatedCountPaginator, 'exact_count_limit', 5):
+            paginator = EstimatedCountPaginator(queryset, 5)
+            with mock.patch('realty.pagination.estimate_count', return_value=1000):
+                self.assertEqual(paginator.count, 1000)
+            # Без оценки (SQLite) - точный COUNT(*)
+            self.assertEqual(EstimatedCountPaginator(queryset, 5).count, 12)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:realty_property_changelist')
+        self.client.get(url)
+        with QueryRecorder() as recorder:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Агент0')
+        # Сессия, пользователь, ограниченный подсчёт и страница с риелторами (JOIN)
+        self.assertLessEqual(len(recorder), 4)
+
+    def test_search_uses_catalog_search(self):
+        response = self.client.get(reverse('admin:realty_property_changelist'), {'q': 'Квартира 1-2'})
+        self.assertEqual(list(response.context['cl'].result_list), [Property.objects.get(title='Квартира 1-2')])
+
+    def test_change_form_uses_autocomplete(self):
+        property_obj = Property.objects.first()
+        response = self.client.get(reverse('admin:realty_property_change', args=[property_obj.pk]))
+        # Виджеты автодополнения выводят только выбранные значения, а не все строки
+        self.assertContains(response, 'data-ajax--url', count=2)
+        other = next(realtor for realtor in self.realtors if realtor.pk != property_obj.realtor_id)
+        self.assertNotContains(response, str(other))
+
+    def test_autocomplete_searches_by_prefix(self):
+        query = {'app_label': 'realty', 'model_name': 'property', 'field_name': 'realtor'}
+        response = self.client.get(reverse('admin:autocomplete'), {**query, 'term': 'agent1'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [str(self.realtors[1].pk)])
+        # Поиск по началу строки, не по вхождению
+        response = self.client.get(reverse('admin:autocomplete'), {**query, 'term': 'gent'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_user_autocomplete_searches_by_prefix(self):
+        query = {'app_label': 'realty', 'model_name': 'realtor', 'field_name': 'user'}
+        response = self.client.get(reverse('admin:autocomplete'), {**query, 'term': 'agent1'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [str(self.realtors[1].user_id)])
+        response = self.client.get(reverse('admin:autocomplete'), {**query, 'term': 'gent'})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('admin:auth_user_changelist'), {'q': 'admin@'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.admin])
+
+    def test_inline_gallery_images_get_variants(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        property_obj = Property.objects.first()
+        data = {
+            'title': property_obj.title, 'description': property_obj.description,
+            'property_type': property_obj.property_type, 'status': property_obj.status,
+            'address': property_obj.address, 'price': property_obj.price, 'area': property_obj.area,
+            'bedrooms': 0, 'bathrooms': 0, 'realtor': property_obj.realtor_id, 'client': property_obj.client_id,
+            'images-TOTAL_FORMS': 1, 'images-INITIAL_FORMS': 0, 'images-MIN_NUM_FORMS': 0,
+            'images-MAX_NUM_FORMS': 1000, 'images-0-image': make_test_image(), 'images-0-position': 0,
+        }
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(reverse('admin:realty_property_change', args=[property_obj.pk]), data)
+            self.assertEqual(response.status_code, 302)
+            image = property_obj.images.get().image
+            self.assertTrue(image.storage.exists(variant_name(image.name, 'card', 'webp')))
+
+    @override_settings(GEOCODER=None)
+    def test_address_change_clears_stale_coordinates(self):
+        """Новый адрес без новых координат сбрасывает прежние координаты и ячейку geohash."""
+        property_obj = Property.objects.first()
+        Property.objects.filter(pk=property_obj.pk).update(latitude=55.75, longitude=37.61, geo_cell='ucfv0j')
+        data = {
+            'title': property_obj.title, 'description': property_obj.description,
+            'property_type': property_obj.property_type, 'status': property_obj.status,
+            'address': 'ул. Новая, 7', 'price': property_obj.price, 'area': property_obj.area,
+            'latitude': 55.75, 'longitude': 37.61,
+            'bedrooms': 0, 'bathrooms': 0, 'realtor': property_obj.realtor_id, 'client': property_obj.client_id,
+            'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0, 'images-MIN_NUM_FORMS': 0,
+            'images-MAX_NUM_FORMS': 1000,
+        }
+        url = reverse('admin:realty_property_change', args=[property_obj.pk])
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        property_obj.refresh_from_db()
+        self.assertEqual((property_obj.latitude, property_obj.longitude, property_obj.geo_cell), (None, None, ''))
+
+        # Координаты, введённые вместе с адресом, сохраняются
+        data.update(address='ул. Новая, 9', latitude=59.93, longitude=30.31)
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        property_obj.refresh_from_db()
+        self.assertEqual((property_obj.latitude, property_obj.longitude), (59.93, 30.31))
+        self.assertEqual(property_obj.geo_cell, geohash_encode(59.93, 30.31))
+
+    def test_benchmark_admin_command(self):
+        out = StringIO()
+        call_command('benchmark_admin', requests=2, scenarios=['property_changelist', 'realtor_autocomplete'], stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual([row['statuses'] for row in report['results']], [[200], [200]])
+        self.assertFalse(User.objects.filter(username__startswith='bench_admin_').exists())
@@ -0,0 +1,251 @@
+"""Замер времени обработки запроса по составляющим и выборочное профилирование.
+
+ServerTimingMiddleware (realty/middleware.py) создаёт для запроса
+RequestTimings и делает его текущим через ContextVar. Составляющие
+собираются без изменения представлений:
+
+* SQL - обёртка execute_wrapper, которая ставится на каждое новое
+  подключение к БД (сигнал connection_created, см. signals.py). Контекст
+  копируется в потоки sync_to_async, поэтому запросы асинхронных
+  представлений тоже учитываются;
+* шаблоны - бэкенд InstrumentedDjangoTemplates (настройка TEMPLATES);
+  SQL, выполненный при отрисовке, вычитается из времени шаблонов;
+* остальное время - Python (представление, формы, middleware).
+
+Раз в SERVER_TIMING_PROFILE_RATE запросов middleware сохраняет профиль
+cProfile (.prof, открывается pstats или snakeviz) и/или снимок tracemalloc
+(.tracemalloc, tracemalloc.Snapshot.load) в SERVER_TIMING_PROFILE_DIR.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ('cprofile', 'tracemalloc')
+
+_current = ContextVar('realty_request_timings', default=None)
+
+
+class RequestTimings:
+    """Накопленные времена одного запроса (секунды)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.template_db = 0.0
+        self._template_depth = 0
+
+    @contextmanager
+    def template_render(self):
+        self._template_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._template_depth -= 1
+            # Вложенные отрисовки (render_to_string из тега) уже входят во внешнюю
+            if not self._template_depth:
+                self.template += time.perf_counter() - started
+
+    def add_query(self, duration):
+        self.db += duration
+        self.queries += 1
+        if self._template_depth:
+            self.template_db += duration
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def metrics(self):
+        """Составляющие в миллисекундах: SQL, шаблоны без SQL, остальной Python и итог."""
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        template = max(self.template - self.template_db, 0.0)
+        return {
+            'db_ms': round(self.db * 1000, 2),
+            'queries': self.queries,
+            'template_ms': round(template * 1000, 2),
+            'app_ms': round(max(total - self.db - template, 0.0) * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+
+    def header(self):
+        """Значение заголовка Server-Timing (заголовки HTTP - только ASCII)."""
+        metrics = self.metrics()
+        return ', '.join([
+            f'db;dur={metrics["db_ms"]};desc="SQL ({metrics["queries"]})"',
+            f'tpl;dur={metrics["template_ms"]};desc="Templates"',
+            f'app;dur={metrics["app_ms"]};desc="Python"',
+            f'total;dur={metrics["total_ms"]}',
+        ])
+
+
+@contextmanager
+def timing_context():
+    """Делает новый RequestTimings текущим для блока кода."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        timings.finish()
+        _current.reset(token)
+
+
+def current_timings():
+    return _current.get()
+
+
+def timed_execute(execute, sql, params, many, context):
+    """execute_wrapper подключения: время SQL-запроса в текущий RequestTimings."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install_query_timer(connection):
+    if timed_execute not in connection.execute_wrappers:
+        # Первой в списке - время считается вместе с остальными обёртками
+        connection.execute_wrappers.insert(0, timed_execute)
+
+
+class TimedTemplate:
+    """Шаблон бэкенда, отрисовка которого учитывается в текущем RequestTimings."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return self.template.render(context, request)
+        with timings.template_render():
+            return self.template.render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Стандартный бэкенд шаблонов Django с замером времени отрисовки."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def should_profile():
+    rate = getattr(settings, 'SERVER_TIMING_PROFILE_RATE', 0)
+    return bool(rate) and random.randrange(rate) == 0
+
+
+class SharedTracemalloc:
+    """
+    Трассировка tracemalloc общая для процесса: её запускает первый выборочный
+    запрос и останавливает последний завершившийся, чтобы параллельный запрос
+    не остановил трассировку посреди чужого замера. Трассировку, запущенную
+    не нами (python -X tracemalloc), не останавливаем.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._owned = False
+
+    def acquire(self):
+        with self._lock:
+            if not self._users and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owned = True
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if not self._users and self._owned:
+                tracemalloc.stop()
+                self._owned = False
+
+
+shared_tracemalloc = SharedTracemalloc()
+
+
+class RequestProfiler:
+    """
+    Профиль одного запроса. cProfile видит только поток, в котором запущен
+    (у асинхронных представлений - цикл событий, без потоков sync_to_async);
+    tracemalloc общий для процесса, поэтому в снимок попадают и выделения
+    памяти параллельных запросов.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.profilers = getattr(settings, 'SERVER_TIMING_PROFILERS', PROFILERS)
+        self.profile = None
+        self.paths = []
+
+    def __enter__(self):
+        if 'tracemalloc' in self.profilers:
+            shared_tracemalloc.acquire()
+        if 'cprofile' in self.profilers:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Начиная с Python 3.12 профилировщик может быть активен только
+                # один на процесс - параллельный выборочный запрос пропускаем
+                pass
+            else:
+                self.profile = profile
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+        try:
+            directory = Path(getattr(settings, 'SERVER_TIMING_PROFILE_DIR', 'profiles'))
+            directory.mkdir(parents=True, exist_ok=True)
+            base = directory / self.file_stem()
+
+            if self.profile is not None:
+                path = base.with_suffix('.prof')
+                self.profile.dump_stats(path)
+                self.paths.append(path)
+            if 'tracemalloc' in self.profilers:
+                path = base.with_suffix('.tracemalloc')
+                tracemalloc.take_snapshot().dump(path)
+                self.paths.append(path)
+        except OSError:
+            # Профилирование - диагностика: запрос не должен завершаться ошибкой
+            # из-за недоступного или переполненного SERVER_TIMING_PROFILE_DIR
+            logger.exception('Не удалось сохранить профиль запроса %s %s', self.request.method, self.request.path)
+        finally:
+            if 'tracemalloc' in self.profilers:
+                shared_tracemalloc.release()
+
+    def file_stem(self):
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', self.request.path).strip('-') or 'root'
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        return f'{stamp}-{os.getpid()}-{random.randrange(16 ** 6):06x}-{self.request.method}-{slug[:60]}'
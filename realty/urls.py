@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, async_views, views
 from django.contrib.auth import views as auth_views
 from .forms import LoginForm 
 
@@ -26,6 +26,17 @@ urlpatterns = [
     path('property/edit/<int:pk>/', views.property_edit, name='property_edit'),
     path('property/delete/<int:pk>/', views.property_delete, name='property_delete'),
 
+    # Асинхронные (ASGI) версии публичных страниц каталога
+    path('async/', async_views.home, name='async_home'),
+    path('async/properties/', async_views.property_list, name='async_property_list'),
+    path('async/properties/<int:pk>/', async_views.property_detail, name='async_property_detail'),
+
+    # JSON API (только чтение)
+    path('api/properties/', api.property_list_api, name='api_property_list'),
+    path('api/properties/<int:pk>/', api.property_detail_api, name='api_property_detail'),
+    path('api/realtors/', api.realtor_list_api, name='api_realtor_list'),
+    path('api/realtors/<int:pk>/', api.realtor_detail_api, name='api_realtor_detail'),
+
     # path('accounts/login/', auth_views.LoginView.as_view(
     #     template_name='realty/login.html', 
     #     authentication_form=LoginForm # <-- Используем нашу кастомную форму
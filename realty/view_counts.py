@@ -0,0 +1,148 @@
+"""Буферизованные счётчики просмотров объектов.
+
+Просмотр детальной страницы не обновляет БД сразу: счётчик увеличивается в
+памяти процесса, а накопленные значения периодически записываются пачкой -
+один ``UPDATE ... SET view_count = view_count + n WHERE id IN (...)`` на каждое
+различное n. Популярный объект получает одно обновление за период вместо
+обновления на каждый просмотр, поэтому запросы не выстраиваются в очередь за
+блокировкой его строки.
+
+Запись выполняет фоновый поток раз в VIEW_COUNT_FLUSH_INTERVAL секунд, а также
+сам record_view, если в буфере набралось VIEW_COUNT_MAX_PENDING объектов, и
+выход из процесса. Каждый процесс ведёт свой буфер; увеличения через F()
+складываются, поэтому несколько процессов не затирают значения друг друга.
+Кеш страниц каталога из-за просмотров не сбрасывается - сортировка
+«Популярные» может отставать на CATALOG_CACHE_TIMEOUT. ETag API для этой
+сортировки учитывает поколение счётчиков, которое растёт с каждой записью.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .cache import bump_view_counts_version
+from .models import Property, PropertyCard
+from .querybudget import unbudgeted
+from .routers import routing_context
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Буфер просмотров процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._thread = None
+
+    def record(self, property_id):
+        """Учитывает один просмотр объекта; True - буфер заполнен и его пора записать."""
+        with self._lock:
+            self._pending[property_id] += 1
+            size = len(self._pending)
+        return size >= getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self):
+        """Очищает буфер без записи в БД."""
+        with self._lock:
+            self._pending.clear()
+
+    def flush(self):
+        """Записывает накопленные просмотры в БД, возвращает число обновлённых объектов."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        by_increment = defaultdict(list)
+        for property_id, count in pending.items():
+            by_increment[count].append(property_id)
+        try:
+            # Отдельный контекст маршрутизации: запись счётчиков не должна
+            # закреплять посетителя, на чьём запросе переполнился буфер, за
+            # основной БД (см. PrimaryStickinessMiddleware). Запись копится со всего
+            # процесса и в бюджет запросов текущего представления не входит
+            with unbudgeted(), routing_context(pinned=True), transaction.atomic():
+                # Фиксированный порядок строк - без взаимных блокировок между процессами
+                for count, ids in sorted(by_increment.items()):
+                    ids.sort()
+                    Property.objects.filter(pk__in=ids).update(view_count=F('view_count') + count)
+                    PropertyCard.objects.filter(pk__in=ids).update(view_count=F('view_count') + count)
+        except Exception:
+            # Возвращаем просмотры в буфер, чтобы записать их в следующий раз
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        bump_view_counts_version()
+        return len(pending)
+
+    def start(self, interval=None):
+        """Запускает фоновый поток периодической записи (один на процесс)."""
+        if interval is None:
+            interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+        with self._lock:
+            if not interval or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name='realty-view-counter', daemon=True,
+            )
+            self._thread.start()
+        atexit.register(self._flush_on_exit)
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать счётчики просмотров')
+            finally:
+                # Соединение потока не закрывается обработчиком запросов
+                close_old_connections()
+
+    def _flush_on_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Не удалось записать счётчики просмотров при завершении процесса')
+
+
+view_counter = ViewCounter()
+
+
+def record_view(property_id):
+    if view_counter.record(property_id):
+        view_counter.flush()
+
+
+async def arecord_view(property_id):
+    if view_counter.record(property_id):
+        await sync_to_async(view_counter.flush)()
+
+
+def flush_view_counts():
+    return view_counter.flush()
+
+
+def start_view_count_flusher():
+    """
+    Вызывается точкой входа сервера (wsgi.py, asgi.py) - вместе с потоком
+    регистрируется запись буфера при выходе из процесса. Команды manage.py и
+    тесты поток не запускают: их буфер записывается только при переполнении.
+    При загрузке приложения до fork (gunicorn --preload) вызывайте функцию в
+    хуке post_fork - потоки не переживают fork.
+    """
+    view_counter.start()
+
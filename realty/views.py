@@ -1,8 +1,10 @@
 from django.shortcuts import redirect, render, get_object_or_404
 from django.views.generic import ListView, DetailView
 from .models import Property, Realtor
-from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+from django.http import Http404
+from django.utils.decorators import method_decorator
 
 from django.shortcuts import render, redirect
 from django.contrib.auth import login
@@ -11,16 +13,31 @@ from .forms import ClientSignUpForm, RealtorSignUpForm # Импортируем
 from .forms import ClientSignUpForm, RealtorSignUpForm, PropertyForm # Убедитесь, что PropertyForm импортирована
 
 from django.contrib import messages
-from .models import Property, Realtor, Client
+from .models import Property, PropertyCard, Realtor, Client
+from .cache import cache_catalog_page
+from .conditional import (
+    detail_validators, detail_validators_query, not_modified_response, private_response, set_validators,
+)
+from .facets import get_facets
+from .filters import DEFAULT_SORT, SORT_ORDERINGS, apply_filters
+from .forms import PropertyFilterForm
+from .gallery import attach_gallery, gallery_slides
+from .pagination import InvalidCursor, KeysetPaginator
+from .portfolio import get_portfolio_summary
+from .profiles import realtor_required
+from .querybudget import query_budget
+from .routers import use_primary
+from .search import search_properties
+from .view_counts import record_view
 
 
-@login_required # Только для авторизованных пользователей
+@realtor_required() # Только для риелторов (остальных - на главную)
+@use_primary # Кабинет риелтора всегда читает из основной БД
+@query_budget(5) # При первом входе сводка портфеля строится тремя запросами
 def realtor_dashboard(request):
     try:
-        # Проверяем, является ли пользователь риелтором
-        realtor_profile = Realtor.objects.get(user=request.user)
+        realtor_profile = Realtor.objects.select_related('portfolio_summary').get(pk=request.profile.realtor_id)
     except ObjectDoesNotExist:
-        # Если профиля риелтора нет, перенаправляем на ошибку или главную
         return redirect('home') 
 
     # Получаем только те объекты, которые связаны с этим риелтором
@@ -29,13 +46,17 @@ def realtor_dashboard(request):
     context = {
         'realtor': realtor_profile,
         'properties': my_properties,
+        # Статистика из сводной таблицы, без агрегации по всем объектам
+        'portfolio': get_portfolio_summary(realtor_profile),
     }
     return render(request, 'realty/realtor_dashboard.html', context)
 
+@cache_catalog_page
+@query_budget(3)
 def home(request):
     """Главная страница"""
-    featured_properties = Property.objects.all()[:3]
-    realtors = Realtor.objects.all()[:3]
+    featured_properties = PropertyCard.objects.filter(is_featured=True).order_by('-created_at')[:3]
+    realtors = Realtor.objects.select_related('user')[:3]
     
     context = {
         'featured_properties': featured_properties,
@@ -43,49 +64,133 @@ def home(request):
     }
     return render(request, 'realty/home.html', context)
 
+@method_decorator(cache_catalog_page, name='dispatch')
+@method_decorator(query_budget(4), name='dispatch')
 class PropertyListView(ListView):
-    """Список всех объектов недвижимости"""
-    model = Property
+    """Список всех объектов недвижимости (читается из денормализованных карточек)"""
+    model = PropertyCard
     template_name = 'realty/property_list.html'
     context_object_name = 'properties'
     paginate_by = 9
     
+    SORT_ORDERINGS = SORT_ORDERINGS
+    DEFAULT_SORT = DEFAULT_SORT
+    
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in self.SORT_ORDERINGS else None
+    
+    def get_ordering_fields(self):
+        return self.SORT_ORDERINGS[self.get_sort() or self.DEFAULT_SORT]
+    
+    def uses_cursor_pagination(self):
+        """Курсорный режим: явно (pagination=cursor) или при переходе по курсору."""
+        return 'cursor' in self.request.GET or self.request.GET.get('pagination') == 'cursor'
+    
+    def get_filters(self):
+        """Нормализованные фильтры из строки запроса (вычисляются один раз)."""
+        if not hasattr(self, '_filters'):
+            self.filter_form = PropertyFilterForm(self.request.GET)
+            self._filters = self.filter_form.get_filters()
+        return self._filters
+    
     def get_queryset(self):
-        queryset = Property.objects.all()
+        filters = self.get_filters()
         
-        # Фильтрация по типу недвижимости
-        property_type = self.request.GET.get('property_type')
-        if property_type:
-            queryset = queryset.filter(property_type=property_type)
+        # Полнотекстовый поиск без явной сортировки - по релевантности.
+        # В курсорном режиме порядок всегда задаётся полями сортировки.
+        ranked = bool(filters.get('q')) and not self.get_sort() and not self.uses_cursor_pagination()
         
-        # Фильтрация по статусу
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
+        # Фильтрация по типу, статусу и диапазонам цены/площади/комнат
+        queryset = apply_filters(PropertyCard.objects.all(), filters, exclude=('q',) if ranked else ())
         
         # Сортировка
-        sort = self.request.GET.get('sort')
-        if sort == 'price_asc':
-            queryset = queryset.order_by('price')
-        elif sort == 'price_desc':
-            queryset = queryset.order_by('-price')
-        elif sort == 'newest':
-            queryset = queryset.order_by('-created_at')
+        if ranked:
+            queryset = search_properties(queryset, filters['q'])
+        else:
+            queryset = queryset.order_by(*self.get_ordering_fields())
         
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        
+        paginator = KeysetPaginator(queryset, page_size, self.get_ordering_fields())
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Некорректный курсор страницы')
+        return (paginator, page, page.object_list, page.has_other_pages())
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(self.get_catalog_context())
+        return context
+    
+    def get_catalog_context(self):
+        """Контекст боковой панели и ссылок пагинации (не зависит от страницы)."""
+        context = {}
         context['property_types'] = Property.PROPERTY_TYPES
         context['status_choices'] = Property.STATUS_CHOICES
+        context['search_query'] = self.get_filters().get('q', '')
+        context['filter_form'] = self.filter_form
+        context['cursor_pagination'] = self.uses_cursor_pagination()
+        
+        # Параметры фильтров для ссылок пагинации (без номера страницы и курсора)
+        params = self.request.GET.copy()
+        for key in ('page', 'cursor'):
+            params.pop(key, None)
+        context['filter_querystring'] = params.urlencode()
+        
+        # Фасеты боковой панели; ценовые диапазоны - ссылки с текущими фильтрами
+        facets = get_facets(PropertyCard.objects.all(), self.get_filters())
+        for bucket in facets['price']:
+            bucket_params = params.copy()
+            bucket_params['price_min'] = bucket['min']
+            bucket_params['price_max'] = bucket['max']
+            bucket['querystring'] = bucket_params.urlencode()
+        context['facets'] = facets
         return context
 
+@method_decorator(query_budget(3), name='dispatch')
 class PropertyDetailView(DetailView):
-    """Детальная информация об объекте"""
-    model = Property
+    """Детальная информация об объекте (карточка уже содержит контакты риелтора)"""
+    model = PropertyCard
     template_name = 'realty/property_detail.html'
     context_object_name = 'property'
 
+    def get(self, request, *args, **kwargs):
+        # Страница вошедшего пользователя зависит от сессии (см. conditional.py)
+        if request.user.is_authenticated:
+            return private_response(super().get(request, *args, **kwargs))
+        # Лёгкая проверка актуальности до загрузки карточки и отрисовки шаблона
+        pk = self.kwargs['pk']
+        etag, last_modified = detail_validators(pk, detail_validators_query(pk).first())
+        response = not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        else:
+            # Повторный визит - тоже просмотр
+            record_view(pk)
+        return set_validators(response, etag, last_modified)
+
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        record_view(obj.pk)
+        return obj
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Вся галерея - одним запросом
+        attach_gallery([self.object])
+        context['slides'] = gallery_slides(self.object)
+        return context
+
+
+# Проверки в формах прошли, но те же данные только что зарегистрировал другой запрос
+SIGNUP_CONFLICT_MESSAGE = 'Пользователь с такими данными уже зарегистрирован. Проверьте данные и попробуйте ещё раз.'
+
 
 def client_signup(request):
     """
@@ -103,6 +208,8 @@ def client_signup(request):
                 messages.success(request, 'Вы успешно зарегистрированы и вошли в систему как клиент!')
                 return redirect('home') 
                 
+            except IntegrityError:
+                form.add_error(None, SIGNUP_CONFLICT_MESSAGE)
             except Exception as e:
                 messages.error(request, f'Произошла внутренняя ошибка при регистрации: {e}')
 
@@ -117,41 +224,52 @@ def realtor_signup(request):
     if request.method == 'POST':
         form = RealtorSignUpForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            login(request, user)
-            return redirect('home')
+            try:
+                user = form.save()
+            except IntegrityError:
+                form.add_error(None, SIGNUP_CONFLICT_MESSAGE)
+            else:
+                login(request, user)
+                return redirect('home')
     else:
         form = RealtorSignUpForm()
         
     return render(request, 'realty/realtor_signup.html', {'form': form})
 
-@login_required
-def property_add(request): 
-    try:
-        realtor_profile = Realtor.objects.get(user=request.user)
-    except ObjectDoesNotExist:
-        messages.error(request, 'У вас нет прав для добавления объектов.')
-        return redirect('home')
-
-
+def realtor_client_id(request):
+    """
+    id клиентского профиля риелтора; профиль создаётся при первом сохранении
+    объекта (с телефоном риелтора).
+    """
+    if request.profile.client_id is not None:
+        return request.profile.client_id
+    phone = Realtor.objects.filter(pk=request.profile.realtor_id).values_list('phone', flat=True).first() or ''
     client_profile, created = Client.objects.get_or_create(
         user=request.user, 
         defaults={
-            'phone': realtor_profile.phone,
+            'phone': phone,
             'address': 'Не указан',
         }
     )
+    return client_profile.pk
 
+
+@realtor_required('У вас нет прав для добавления объектов.')
+@use_primary
+@query_budget(12) # Первый объект риелтора: клиентский профиль, сводка, карточка, галерея
+def property_add(request): 
     if request.method == 'POST':
         form = PropertyForm(request.POST, request.FILES) 
         if form.is_valid():
             new_property = form.save(commit=False)
             
             # Привязка
-            new_property.realtor = realtor_profile
-            new_property.client = client_profile
+            new_property.realtor_id = request.profile.realtor_id
+            new_property.client_id = realtor_client_id(request)
             
             new_property.save()
+            form.save_m2m()
+            form.save_gallery()
             
             messages.success(request, 'Новый объект успешно добавлен!')
             
@@ -168,17 +286,13 @@ def property_add(request):
     return render(request, 'realty/property_form.html', context)
 
 
-@login_required
+@realtor_required('У вас нет прав для редактирования объектов.')
+@use_primary
+@query_budget(10) # Сохранение со сводкой, карточкой и новыми фотографиями галереи
 def property_edit(request, pk):
-    try:
-        realtor_profile = Realtor.objects.get(user=request.user)
-    except ObjectDoesNotExist:
-        messages.error(request, 'У вас нет прав для редактирования объектов.')
-        return redirect('home')
-    
-    property_instance = get_object_or_404(Property, pk=pk)
+    property_instance = get_object_or_404(Property.objects.select_related('client'), pk=pk)
     
-    if property_instance.realtor != realtor_profile:
+    if property_instance.realtor_id != request.profile.realtor_id:
         messages.error(request, 'У вас нет прав на редактирование этого объекта.')
         return redirect('realtor_dashboard')
 
@@ -187,16 +301,9 @@ def property_edit(request, pk):
         current_client = property_instance.client
     except Client.DoesNotExist: # Перехватываем ошибку, если client_id == NULL
 
-        client_profile, created = Client.objects.get_or_create(
-            user=request.user, 
-            defaults={
-                'phone': realtor_profile.phone,
-                'address': 'Не указан',
-            }
-        )
-        property_instance.client = client_profile
+        property_instance.client_id = realtor_client_id(request)
         property_instance.save() 
-        current_client = client_profile 
+        current_client = property_instance.client
 
     if request.method == 'POST':
         form = PropertyForm(request.POST, request.FILES, instance=property_instance)
@@ -204,10 +311,12 @@ def property_edit(request, pk):
             updated_property = form.save(commit=False)
             
 
-            updated_property.realtor = property_instance.realtor 
+            updated_property.realtor_id = request.profile.realtor_id
             updated_property.client = current_client
             
             updated_property.save() 
+            form.save_m2m()
+            form.save_gallery()
             
             messages.success(request, f'Объект "{updated_property.title}" успешно обновлен.')
             return redirect('realtor_dashboard')
@@ -225,17 +334,13 @@ def property_edit(request, pk):
     return render(request, 'realty/property_form.html', context)
 
 # --- ФУНКЦИЯ УДАЛЕНИЯ ОБЪЕКТА ---
-@login_required
+@realtor_required('У вас нет прав для удаления объектов.')
+@use_primary
+@query_budget(6) # Каскадное удаление галереи и карточки, сводка
 def property_delete(request, pk):
-    try:
-        realtor_profile = Realtor.objects.get(user=request.user)
-    except ObjectDoesNotExist:
-        messages.error(request, 'У вас нет прав для удаления объектов.')
-        return redirect('home')
-
     property_instance = get_object_or_404(Property, pk=pk)
     
-    if property_instance.realtor != realtor_profile:
+    if property_instance.realtor_id != request.profile.realtor_id:
         messages.error(request, 'У вас нет прав на удаление этого объекта.')
         return redirect('realtor_dashboard')
 